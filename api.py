@@ -1,15 +1,62 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
 import utils
 import pandas as pd
 from fastapi.middleware.cors import CORSMiddleware
 from event_service import EventService, PricingAdjustment
-from cdp_service import CDPService
+from cdp_service import AUDIENCE_FORMATS, Q2_BUSINESS_LOCAL, CDPService, SnapshotNotFound
 from email_service import EmailService
+from campaign_jobs import CampaignJobManager, JobNotFound
+from event_prefetch import PrefetchScheduler
+from response_cache import CachedResponse, ResponseCache, etag_matches, make_etag
+from fast_json import FastJSONResponse, dumps
+from executors import BoundedExecutor, ExecutorSaturated
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from model_store import ModelStore
+from prediction_cache import PredictionCache
+from micro_batcher import MicroBatcher
+import os
 
-app = FastAPI(title="Harriot Inc. Experience Engine API")
+# Models are memory-mapped from the model store and loaded lazily on first use.
+# Set WARM_UP_MODELS=1 to load and warm them while the worker starts instead.
+# Every MODEL_WATCH_INTERVAL seconds (0 disables) each worker checks for a new
+# models.pkl or a version another worker published, and swaps it in once warm.
+model_store = ModelStore()
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', 5))
+# Warms EVENT_PREFETCH_CITIES plus the most requested cities; set EVENT_PREFETCH=0 to disable
+EVENT_PREFETCH_ENABLED = os.getenv('EVENT_PREFETCH', '1').lower() not in ('0', 'false', 'no')
+# Repeated profiles skip the models; emptied when models.pkl changes
+prediction_cache = PredictionCache.from_env(model_store.source_path)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv('WARM_UP_MODELS', '0').lower() in ('1', 'true', 'yes'):
+        model_store.warm_up()
+    if MODEL_WATCH_INTERVAL > 0:
+        model_store.start_watching(MODEL_WATCH_INTERVAL)
+    campaign_jobs.recover_interrupted()
+    event_service.start_calendar_refresher()
+    if EVENT_PREFETCH_ENABLED:
+        event_prefetch.start()
+    yield
+    event_prefetch.stop()
+    event_service.stop_calendar_refresher()
+    campaign_jobs.shutdown(wait=False)
+    inference_executor.shutdown(wait=False)
+    model_reload_executor.shutdown(wait=False)
+    campaign_jobs_executor.shutdown(wait=False)
+    campaign_send_executor.shutdown(wait=False)
+    model_store.stop_watching()
+    if predict_batcher is not None:
+        predict_batcher.stop()
+
+# Handlers return FastJSONResponse for data they built themselves: response_model
+# still documents the schema, but the body skips re-validation and the default encoder.
+app = FastAPI(title="Harriot Inc. Experience Engine API", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
 
 # Enable CORS for Angular frontend
 app.add_middleware(
@@ -20,11 +67,34 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load Models and Services on Startup
-model_data = utils.load_models()
+# Handlers are async. Blocking work runs on bounded per-workload pools (inference
+# and campaigns here, event lookups and audience queries inside their services),
+# so slow event providers or email sends can't starve scoring.
+inference_executor = BoundedExecutor('inference', int(os.getenv('INFERENCE_WORKERS', min(4, os.cpu_count() or 1))),
+                                      max_pending=int(os.getenv('INFERENCE_MAX_PENDING', 256)))
+# Loading a new model version never takes an inference worker
+model_reload_executor = BoundedExecutor('model-reload', 1, max_pending=1)
+# Job store reads and writes (SQLite) stay responsive while synchronous sends hold their own pool
+campaign_jobs_executor = BoundedExecutor('campaign-jobs', 4, max_pending=64)
+campaign_send_executor = BoundedExecutor('campaign-send', 2, max_pending=8)
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    return FastJSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+# Services defer their heavy loading until first use
 event_service = EventService()
+# Keeps EVENT_PREFETCH_CITIES (plus the most requested cities) warm in the event cache
+event_prefetch = PrefetchScheduler.from_env(event_service)
 cdp_service = CDPService()
 email_service = EmailService()
+# Serialized bodies of polled GET endpoints, revalidated with ETags
+response_cache = ResponseCache(int(os.getenv('RESPONSE_CACHE_MAX_BYTES', 64 * 2**20)))
+EVENTS_CACHE_CONTROL = "private, max-age=60, must-revalidate"
+AUDIENCE_CACHE_CONTROL = "private, max-age=30, must-revalidate"
+# Bigger audiences are streamed rather than held in the response cache
+RESPONSE_CACHE_MAX_ROWS = 100_000
+campaign_jobs = CampaignJobManager(email_service, db_path=os.getenv('CAMPAIGN_JOBS_DB', 'campaign_jobs.db'))
 
 class TravelerProfile(BaseModel):
     age: int
@@ -40,6 +110,12 @@ class PredictionResponse(BaseModel):
     booking_probability: float
     estimated_ltv: float
 
+class BatchPredictionRequest(BaseModel):
+    profiles: List[TravelerProfile]
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[PredictionResponse]
+
 class OfferRequest(BaseModel):
     segment_label: str
     travel_purpose: str
@@ -54,6 +130,25 @@ class EventPricingRequest(BaseModel):
     check_out_date: str  # ISO format: YYYY-MM-DD
     base_room_rate: float
 
+# Limits keep one grid request to a few seconds of work
+GRID_FORMATS = ('columnar', 'ndjson')
+MAX_GRID_CITIES = 50
+MAX_GRID_CHECK_INS = 366
+MAX_GRID_LENGTH_OF_STAY = 30
+
+def check_in_window():
+    """First and last check-in dates event pricing accepts: today through the event horizon."""
+    today = datetime.now().date()
+    return today, today + timedelta(days=event_service.calendar_horizon_days)
+
+class GridPricingRequest(BaseModel):
+    cities: List[str]
+    start_date: str  # first check-in, YYYY-MM-DD
+    end_date: str  # last check-in, YYYY-MM-DD
+    lengths_of_stay: List[int] = [1]
+    base_rates: List[float] = []
+    format: str = 'columnar'
+
 class EventPricingResponse(BaseModel):
     original_rate: float
     adjusted_rate: float
@@ -64,40 +159,118 @@ class EventPricingResponse(BaseModel):
     peak_event_date: Optional[str]
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"status": "active", "system": "Harriot Inc. Intelligence Engine"}
 
 @app.post("/predict", response_model=PredictionResponse)
-def predict(profile: TravelerProfile):
+async def predict(profile: TravelerProfile):
+    if predict_batcher is None:
+        return await inference_executor.run(score_profile, profile)
+    segment_label, segment_id, prob = await predict_batcher.run(profile.model_dump())
+    return prediction_response(profile, segment_label, segment_id, prob)
+
+def score_profile(profile: TravelerProfile):
+    model_data = model_store.get()
     if not model_data:
         raise HTTPException(status_code=500, detail="Models not loaded")
     
     # Convert Pydantic model to dict for utils
     profile_dict = profile.model_dump()
     
-    segment_label, segment_id = utils.predict_traveler_segment(model_data, profile_dict)
-    prob = utils.predict_booking_prob(model_data, profile_dict, segment_id)
-    
-    # Simple LTV calc
-    ltv = profile.avg_spend * 12 * (1.5 if 'Luxury' in segment_label else 1.0)
+    # Cached per encoded feature row; misses encode once for segmentation and scoring
+    segment_label, segment_id, prob = prediction_cache.predict(model_data, profile_dict)
+    return prediction_response(profile, segment_label, segment_id, prob)
+
+def score_profile_rows(profile_dicts: List[Dict]):
+    """Score a micro-batch of /predict rows as one matrix."""
+    model_data = model_store.get()
+    if not model_data:
+        raise HTTPException(status_code=500, detail="Models not loaded")
+    segment_labels, segment_ids, probs = prediction_cache.predict_batch(model_data, profile_dicts)
+    return list(zip(segment_labels, segment_ids.tolist(), probs.tolist()))
+
+# Concurrent /predict rows are scored together, up to PREDICT_BATCH_MAX_SIZE rows
+# (1 scores each alone). PREDICT_BATCH_WINDOW_MS waits for more rows per batch;
+# the default 0 batches whatever queued while the last batch was scoring.
+# Batches skip inference_executor on purpose: the batcher is itself a bounded,
+# single-thread inference pool (its own thread, INFERENCE_MAX_PENDING queued rows,
+# 503 beyond that), and routing each batch through the pool would only add a hop.
+PREDICT_BATCH_MAX_SIZE = int(os.getenv('PREDICT_BATCH_MAX_SIZE', 256))
+predict_batcher = MicroBatcher(
+    score_profile_rows,
+    max_batch_size=PREDICT_BATCH_MAX_SIZE,
+    max_wait_ms=float(os.getenv('PREDICT_BATCH_WINDOW_MS', 0)),
+    max_pending=int(os.getenv('INFERENCE_MAX_PENDING', 256)),
+    name='predict-batcher',
+) if PREDICT_BATCH_MAX_SIZE > 1 else None
+
+def prediction_response(profile: TravelerProfile, segment_label: str, segment_id: int, prob: float):
+    ltv = utils.estimate_ltv(profile.avg_spend, segment_label)
     
-    return {
+    return FastJSONResponse({
         "segment_label": segment_label,
         "segment_id": int(segment_id),
-        "booking_probability": prob,
-        "estimated_ltv": ltv
-    }
+        "booking_probability": float(prob),
+        "estimated_ltv": float(ltv)
+    })
+
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_batch(req: BatchPredictionRequest):
+    """Score many traveler profiles in one call using vectorized inference."""
+    return await inference_executor.run(score_profiles, req.profiles)
+
+def score_profiles(profiles: List[TravelerProfile]):
+    model_data = model_store.get()
+    if not model_data:
+        raise HTTPException(status_code=500, detail="Models not loaded")
+    
+    profile_dicts = [profile.model_dump() for profile in profiles]
+    
+    segment_labels, segment_ids, probs = prediction_cache.predict_batch(model_data, profile_dicts)
+    
+    predictions = []
+    for profile, segment_label, segment_id, prob in zip(profiles, segment_labels, segment_ids, probs):
+        ltv = utils.estimate_ltv(profile.avg_spend, segment_label)
+        predictions.append({
+            "segment_label": segment_label,
+            "segment_id": int(segment_id),
+            "booking_probability": float(prob),
+            "estimated_ltv": float(ltv)
+        })
+    
+    return FastJSONResponse({"predictions": predictions})
+
+@app.get("/predict/cache/stats")
+async def get_prediction_cache_stats():
+    """Prediction cache hit rate and the scoring time it saved."""
+    return prediction_cache.stats()
+
+@app.get("/predict/batcher/stats")
+async def get_predict_batcher_stats():
+    """Micro-batches dispatched for /predict and their sizes."""
+    return predict_batcher.stats() if predict_batcher is not None else {"enabled": False}
+
+@app.get("/models/version")
+async def get_model_version():
+    """Model version this worker serves, when it was published and loaded, and reload counters."""
+    return model_store.info()
+
+@app.post("/models/reload")
+async def reload_models():
+    """Check for a new model version now in this worker; other workers pick it up on their next watch."""
+    swapped = await model_reload_executor.run(model_store.check_for_update)
+    return {"swapped": swapped, **model_store.info()}
 
 @app.post("/generate-offer", response_model=OfferResponse)
-def generate_offer(req: OfferRequest):
+async def generate_offer(req: OfferRequest):
     copy, offer_name = utils.generate_personalized_copy(req.segment_label, req.travel_purpose)
-    return {
+    return FastJSONResponse({
         "offer_name": offer_name,
         "copy": copy
-    }
+    })
 
 @app.post("/event-pricing", response_model=EventPricingResponse)
-def calculate_event_pricing(req: EventPricingRequest):
+async def calculate_event_pricing(req: EventPricingRequest):
     """Calculate dynamic pricing based on local events and concerts."""
     try:
         # Parse dates
@@ -111,8 +284,12 @@ def calculate_event_pricing(req: EventPricingRequest):
         if (check_out - check_in).days > 30:
             raise HTTPException(status_code=400, detail="Date range cannot exceed 30 days")
         
+        first_check_in, last_check_in = check_in_window()
+        if not first_check_in <= check_in.date() <= last_check_in:
+            raise HTTPException(status_code=400, detail=f"Check-in date must be between {first_check_in} and {last_check_in}")
+        
         # Get pricing adjustment from event service
-        pricing_adjustment = event_service.calculate_pricing_adjustment(
+        pricing_adjustment = await event_service.calculate_pricing_adjustment_async(
             city=req.city,
             check_in_date=check_in,
             check_out_date=check_out
@@ -121,57 +298,123 @@ def calculate_event_pricing(req: EventPricingRequest):
         # Calculate adjusted rate
         adjusted_rate = req.base_room_rate * pricing_adjustment.base_multiplier
         
-        return EventPricingResponse(
-            original_rate=req.base_room_rate,
-            adjusted_rate=round(adjusted_rate, 2),
-            multiplier=round(pricing_adjustment.base_multiplier, 3),
-            reason=pricing_adjustment.reason,
-            events_count=pricing_adjustment.events_count,
-            confidence_score=round(pricing_adjustment.confidence_score, 2),
-            peak_event_date=pricing_adjustment.peak_event_date.isoformat() if pricing_adjustment.peak_event_date else None
-        )
+        return FastJSONResponse({
+            "original_rate": req.base_room_rate,
+            "adjusted_rate": round(adjusted_rate, 2),
+            "multiplier": round(pricing_adjustment.base_multiplier, 3),
+            "reason": pricing_adjustment.reason,
+            "events_count": pricing_adjustment.events_count,
+            "confidence_score": round(pricing_adjustment.confidence_score, 2),
+            "peak_event_date": pricing_adjustment.peak_event_date.isoformat() if pricing_adjustment.peak_event_date else None
+        })
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid date format: {e}")
+    except (HTTPException, ExecutorSaturated):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error calculating event pricing: {e}")
 
+@app.post("/event-pricing/grid")
+async def calculate_event_pricing_grid(req: GridPricingRequest):
+    """
+    Price every city x check-in date x length of stay in one call.
+    'columnar' returns nested arrays indexed [city][check-in][length of stay]
+    (adjusted_rates adds a [base rate] axis); 'ndjson' streams one line per
+    city and check-in date.
+    """
+    try:
+        start = datetime.fromisoformat(req.start_date).date()
+        end = datetime.fromisoformat(req.end_date).date()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date format: {e}")
+    
+    if req.format not in GRID_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(GRID_FORMATS)}")
+    if not req.cities or len(req.cities) > MAX_GRID_CITIES:
+        raise HTTPException(status_code=400, detail=f"Provide between 1 and {MAX_GRID_CITIES} cities")
+    if end < start or (end - start).days >= MAX_GRID_CHECK_INS:
+        raise HTTPException(status_code=400, detail=f"Check-in range must cover 1 to {MAX_GRID_CHECK_INS} days")
+    first_check_in, last_check_in = check_in_window()
+    if start < first_check_in or end > last_check_in:
+        raise HTTPException(status_code=400, detail=f"Check-in dates must be between {first_check_in} and {last_check_in}")
+    if not req.lengths_of_stay or not all(1 <= n <= MAX_GRID_LENGTH_OF_STAY for n in req.lengths_of_stay):
+        raise HTTPException(status_code=400, detail=f"Lengths of stay must be between 1 and {MAX_GRID_LENGTH_OF_STAY} nights")
+    
+    grid = await event_service.price_grid_async(req.cities, start, end, req.lengths_of_stay)
+    if req.format == 'ndjson':
+        return StreamingResponse(grid.iter_ndjson(req.base_rates), media_type="application/x-ndjson")
+    return Response(dumps(grid.columnar(req.base_rates)), media_type="application/json")
+
+@app.get("/executors/stats")
+async def get_executor_stats():
+    """Running, queued and rejected calls for each workload pool."""
+    return {executor.name: executor.stats()
+            for executor in (inference_executor, model_reload_executor, campaign_jobs_executor,
+                             campaign_send_executor, event_service.executor, cdp_service.executor)}
+
+@app.get("/events/cache/stats")
+async def get_event_cache_stats():
+    """Hit/miss counters for the event cache and the HTTP response cache."""
+    return {**event_service.cache.stats(), "response_cache": response_cache.stats()}
+
+@app.get("/events/prefetch/stats")
+async def get_event_prefetch_stats():
+    """Prefetch coverage and lag for the warmed cities."""
+    # Coverage checks can read the SQLite tier, so they run on the event pool
+    return await event_service.executor.run(event_prefetch.stats)
+
+def cached_response(request: Request, cached: CachedResponse, cache_control: str) -> Response:
+    """Serve a serialized body, or 304 Not Modified if the client's ETag matches."""
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control, **cached.headers}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(cached.body, media_type=cached.media_type, headers=headers)
+
 @app.get("/events/{city}")
-def get_city_events(city: str, date: Optional[str] = None):
-    """Get events for a specific city and date (optional)."""
+async def get_city_events(request: Request, city: str, date: Optional[str] = None):
+    """
+    Get events for a specific city and date (optional).
+    Responses are cached until any day in the window is re-fetched.
+    """
+    # Cache checks can read the SQLite tier, so the whole lookup runs on the event pool
+    return await event_service.executor.run(city_events_response, request, city, date)
+
+def city_events_response(request: Request, city: str, date: Optional[str]):
     try:
         if date:
             target_date = datetime.fromisoformat(date)
         else:
-            target_date = datetime.now()
+            # Midnight today, so the cached body is a function of its key and rolls over with the date
+            target_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         
         # Get events for the next 7 days
         end_date = target_date + timedelta(days=7)
-        events = event_service.get_events_for_date_range(city, target_date, end_date)
+        key = ('events', city, target_date.isoformat() if date else ('today', target_date.date().isoformat()))
+        version = event_service.range_version(city, target_date, end_date)
+        cached = response_cache.get(key, version) if version else None
+        if cached is not None:
+            return cached_response(request, cached, EVENTS_CACHE_CONTROL)
         
-        # Convert to serializable format
-        events_data = []
-        for event in events:
-            events_data.append({
-                "id": event.id,
-                "name": event.name,
-                "date": event.date.isoformat(),
-                "venue": event.venue,
-                "category": event.category,
-                "expected_attendance": event.expected_attendance,
-                "impact_level": event.impact_level.value,
-                "distance_km": event.distance_km
-            })
+        events = event_service.get_events_for_date_range(city, target_date, end_date)
         
-        return {
+        # Event dataclasses serialize directly (dates as ISO strings, impact as its value)
+        body = dumps({
             "city": city,
             "date_range": {
-                "start": target_date.isoformat(),
-                "end": end_date.isoformat()
+                "start": target_date,
+                "end": end_date
             },
-            "events": events_data,
-            "total_events": len(events_data)
-        }
+            "events": events,
+            "total_events": len(events)
+        })
+        
+        # Only cache a body known to match its version (no day was fetched or refreshed meanwhile)
+        if version and version == event_service.range_version(city, target_date, end_date):
+            cached = response_cache.put(key, version, body)
+        else:
+            cached = CachedResponse(body, make_etag(body), "application/json", version)
+        return cached_response(request, cached, EVENTS_CACHE_CONTROL)
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid date format: {e}")
@@ -183,28 +426,191 @@ class CampaignRequest(BaseModel):
     body: str
     recipients: list
 
+def audience_response(result, stats, format):
+    """
+    Stream an audience without building per-row dicts.
+    'records' and 'columnar' return {"stats": ..., "audience": ...};
+    'ndjson' streams one traveler per line with the count in a header.
+    """
+    if format not in AUDIENCE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(AUDIENCE_FORMATS)}")
+    
+    if format == 'ndjson':
+        return StreamingResponse(
+            audience_chunks(result, stats, format),
+            media_type="application/x-ndjson",
+            headers={"X-Audience-Count": str(stats["audience_count"])}
+        )
+    return StreamingResponse(audience_chunks(result, stats, format), media_type="application/json")
+
+def audience_chunks(result, stats, format):
+    """JSON text chunks of an audience response body."""
+    if format == 'ndjson':
+        yield from result.iter_json('ndjson')
+        return
+    yield '{"stats":' + dumps(stats).decode() + ',"audience":'
+    yield from result.iter_json(format)
+    yield '}'
+
 @app.get("/campaigns/audiences/q2-business-local")
-def get_q2_business_local_audience():
-    """Get business travelers within 200 miles with no Q2 booking."""
+async def get_q2_business_local_audience(request: Request, format: str = 'records'):
+    """
+    Get business travelers within 200 miles with no Q2 booking.
+    The serialized body is cached per format until the traveler data changes.
+    """
+    return await cdp_service.executor.run(q2_business_local_response, request, format)
+
+def q2_business_local_response(request: Request, format: str):
+    if format not in AUDIENCE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(AUDIENCE_FORMATS)}")
+    key = ('q2-business-local', format)
     try:
-        audience = cdp_service.get_at_risk_business_travelers()
+        cached = response_cache.get(key, cdp_service.store.get().version)
+        if cached is not None:
+            return cached_response(request, cached, AUDIENCE_CACHE_CONTROL)
+        result = cdp_service.query_audience(Q2_BUSINESS_LOCAL)
         stats = cdp_service.get_audience_stats()
-        return {
-            "audience": audience,
-            "stats": stats
-        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    
+    version = result.table.version
+    if result.audience_count > RESPONSE_CACHE_MAX_ROWS:
+        # Serialization is deterministic, so the data version is a strong validator
+        etag = make_etag(repr((key, version)).encode())
+        headers = {"ETag": etag, "Cache-Control": AUDIENCE_CACHE_CONTROL}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        response = audience_response(result, stats, format)
+        response.headers.update(headers)
+        return response
+    
+    body = ''.join(audience_chunks(result, stats, format)).encode()
+    headers = {"X-Audience-Count": str(stats["audience_count"])} if format == 'ndjson' else None
+    media_type = "application/x-ndjson" if format == 'ndjson' else "application/json"
+    cached = response_cache.put(key, version, body, media_type, headers)
+    return cached_response(request, cached, AUDIENCE_CACHE_CONTROL)
+
+class AudienceQueryRequest(BaseModel):
+    definition: Dict[str, Any]
+    include_members: bool = True
+    format: str = 'records'
+
+@app.post("/campaigns/audiences/query")
+async def query_audience(req: AudienceQueryRequest):
+    """
+    Evaluate a declarative audience definition, e.g.
+    {"all": [{"column": "travel_purpose", "op": "in", "value": ["Business"]},
+             {"column": "loyalty_tier", "op": "gte", "value": "Gold"}]}
+    """
+    if req.include_members and req.format not in AUDIENCE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(AUDIENCE_FORMATS)}")
+    try:
+        result = await cdp_service.query_audience_async(req.definition)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not req.include_members:
+        return {"stats": result.stats()}
+    return audience_response(result, result.stats(), req.format)
+
+class AudienceSnapshotRequest(BaseModel):
+    definition: Optional[Dict[str, Any]] = None  # Defaults to the Q2 Business Local audience
+    limit: int = 500
+
+def audience_page_response(page):
+    """Serialize one snapshot page; stats come from the snapshot, not a new query."""
+    snapshot = page.snapshot
+    header = {
+        "snapshot_id": snapshot.snapshot_id,
+        "expires_at": datetime.fromtimestamp(snapshot.expires_at).isoformat(),
+        "stats": snapshot.stats,
+        "offset": page.offset,
+        "count": len(page.indices),
+        "next_cursor": page.next_cursor,
+    }
+    
+    def body():
+        yield dumps(header).decode()[:-1] + ',"audience":'
+        yield from page.iter_json()
+        yield '}'
+    
+    return StreamingResponse(body(), media_type="application/json")
+
+@app.post("/campaigns/audiences/snapshots")
+async def create_audience_snapshot(req: AudienceSnapshotRequest):
+    """Freeze an audience server-side and return its first page with a cursor."""
+    if not 1 <= req.limit <= 5000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 5000")
+    try:
+        snapshot = await cdp_service.create_audience_snapshot_async(req.definition)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorSaturated:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return audience_page_response(cdp_service.get_audience_page(snapshot, 0, req.limit))
+
+@app.get("/campaigns/audiences/pages")
+async def get_audience_page(cursor: str, limit: int = Query(500, ge=1, le=5000)):
+    """Fetch the next page of a snapshot using the cursor from the previous page."""
+    try:
+        page = cdp_service.get_audience_page_by_cursor(cursor, limit)
+    except SnapshotNotFound as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return audience_page_response(page)
 
 @app.post("/campaigns/send")
-def send_campaign(req: CampaignRequest):
-    """Send email campaign to recipients."""
+async def send_campaign(req: CampaignRequest, details: bool = False):
+    """Send email campaign to recipients. Only failures are listed unless details=true."""
     try:
-        result = email_service.send_campaign(req.recipients, req.subject, req.body)
-        return result
+        return await campaign_send_executor.run(email_service.send_campaign, req.recipients, req.subject,
+                                                req.body, include_details=details)
+    except ExecutorSaturated:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/campaigns/jobs", status_code=202)
+async def submit_campaign_job(req: CampaignRequest):
+    """Queue a campaign for background delivery and return its job id."""
+    try:
+        return await campaign_jobs_executor.run(campaign_jobs.submit, req.recipients, req.subject, req.body)
+    except (KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Each recipient needs an email: {e}")
+
+@app.get("/campaigns/jobs/{job_id}")
+async def get_campaign_job(job_id: str):
+    """Poll a campaign job's progress (sent, failed and pending counts)."""
+    try:
+        return await campaign_jobs_executor.run(campaign_jobs.get, job_id)
+    except JobNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/campaigns/jobs/{job_id}/cancel")
+async def cancel_campaign_job(job_id: str):
+    """Stop a campaign job after the chunk in progress."""
+    try:
+        return await campaign_jobs_executor.run(campaign_jobs.cancel, job_id)
+    except JobNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/campaigns/jobs/{job_id}/resume")
+async def resume_campaign_job(job_id: str):
+    """Resume a cancelled, interrupted or failed job from its last checkpoint."""
+    try:
+        return await campaign_jobs_executor.run(campaign_jobs.resume, job_id)
+    except JobNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,699 @@
+#!/usr/bin/env python3
+"""Performance benchmarks for the Experience Engine backend.
+
+Run one benchmark at a time, e.g.:
+    python3 benchmark.py inference
+    python3 benchmark.py startup --workers 4
+    python3 benchmark.py audience --rows 2000000
+    python3 benchmark.py email --recipients 10000 100000
+    python3 benchmark.py events --days 30
+    python3 benchmark.py pricing --events-per-day 3 50
+    python3 benchmark.py burst --requests 100
+    python3 benchmark.py serialization --rows 500000
+    python3 benchmark.py isolation --slow-requests 200
+    python3 benchmark.py prediction-cache --distinct 500
+    python3 benchmark.py batching --clients 1 16 64 --windows-ms 0 0.5 2
+    python3 benchmark.py scoring --rows 2000000 --workers 1 4
+    python3 benchmark.py training --rows 1000000
+    python3 benchmark.py reload --workers 4 --swaps 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import utils
+
+warnings.filterwarnings("ignore")
+
+SAMPLE_PROFILE = {
+    'age': 41,
+    'loyalty_tier': 'Gold',
+    'avg_spend': 800,
+    'last_stay_days_ago': 30,
+    'travel_purpose': 'Business',
+    'preferred_amenities': 'Spa,Dining'
+}
+
+def report(name, timings):
+    """Print p50/p99/max latency for a list of per-call timings in seconds."""
+    timings_us = np.asarray(timings) * 1e6
+    p50, p99 = np.percentile(timings_us, [50, 99])
+    print(f"{name:<28} p50={p50:9.1f}us  p99={p99:9.1f}us  max={timings_us.max():9.1f}us  n={len(timings_us)}")
+
+def bench_inference(args):
+    """Single-profile latency: compiled NumPy engine vs the sklearn models."""
+    model_data = utils.load_models()
+    features = utils.encode_profile(model_data, SAMPLE_PROFILE)
+
+    engine_timings = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        segment_label, segment_id = utils.predict_traveler_segment(model_data, SAMPLE_PROFILE, features=features)
+        utils.predict_booking_prob(model_data, SAMPLE_PROFILE, segment_id, features=features)
+        engine_timings.append(time.perf_counter() - start)
+
+    sklearn_timings = []
+    for _ in range(min(args.iterations, 500)):
+        start = time.perf_counter()
+        segment_id = model_data['kmeans'].predict(model_data['scaler'].transform(features))[0]
+        model_data['rf_model'].predict_proba(np.append(features, [[segment_id]], axis=1))
+        sklearn_timings.append(time.perf_counter() - start)
+
+    print("📈 Single-profile scoring latency")
+    report("numpy engine", engine_timings)
+    report("sklearn", sklearn_timings)
+
+# Runs in a fresh interpreter per simulated worker; prints one JSON line
+STARTUP_CHILD = '''
+import json, time, warnings
+warnings.filterwarnings("ignore")
+start = time.perf_counter()
+import api
+imported = time.perf_counter()
+if {mode!r} == "eager":
+    import utils
+    utils.load_models()
+else:
+    api.model_store.warm_up()
+ready = time.perf_counter()
+memory = {{}}
+for path in ("/proc/self/status", "/proc/self/smaps_rollup"):
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("VmRSS", "Rss", "Pss"):
+                    memory[key] = int(value.split()[0])
+    except OSError:
+        pass
+print(json.dumps({{"import_s": imported - start, "ready_s": ready - start, "memory_kb": memory}}))
+'''
+
+def bench_startup(args):
+    """Worker startup time and RSS/PSS: eager joblib load vs the mmap model store."""
+    print(f"🚀 Worker startup ({args.workers} concurrent workers per mode)")
+    for mode in ("eager", "store"):
+        procs = [
+            subprocess.Popen([sys.executable, "-c", STARTUP_CHILD.format(mode=mode)],
+                             stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            for _ in range(args.workers)
+        ]
+        results = [json.loads(p.communicate()[0].strip().splitlines()[-1]) for p in procs]
+        ready = [r["ready_s"] for r in results]
+        rss = [r["memory_kb"].get("VmRSS", 0) / 1024 for r in results]
+        pss = [r["memory_kb"].get("Pss", 0) / 1024 for r in results]
+        print(f"{mode:<8} import={np.mean([r['import_s'] for r in results]):.2f}s  "
+              f"ready={np.mean(ready):.2f}s (max {max(ready):.2f}s)  "
+              f"RSS/worker={np.mean(rss):.1f}MB  PSS/worker={np.mean(pss):.1f}MB")
+
+def make_traveler_csv(path, rows, seed=0):
+    """Write a synthetic traveler_data.csv-shaped file with the given row count."""
+    rng = np.random.default_rng(seed)
+    cities = np.array(['New York', 'Philadelphia', 'Boston', 'Newark', 'Chicago', 'Miami', 'Seattle', 'Austin'])
+    pd.DataFrame({
+        'age': rng.integers(18, 80, rows),
+        'loyalty_tier': rng.choice(['Member', 'Silver', 'Gold', 'Platinum', 'Titanium'], rows),
+        'avg_spend': rng.integers(100, 3000, rows),
+        'last_stay_days_ago': rng.integers(0, 400, rows),
+        'preferred_amenities': rng.choice(['Spa,Dining', 'Gym', 'Lounge,Golf', 'Pool'], rows),
+        'travel_purpose': rng.choice(['Business', 'Leisure'], rows),
+        'outcome_label': rng.integers(0, 2, rows),
+        'home_city': rng.choice(cities, rows),
+        'distance_miles': rng.integers(1, 1000, rows),
+        'has_q2_booking': rng.integers(0, 2, rows),
+        'email': [f'user{i}@example.com' for i in range(rows)],
+    }).to_csv(path, index=False)
+
+def bench_audience(args):
+    """Audience query latency on a synthetic multi-million-row traveler extract."""
+    from cdp_service import CDPService
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'travelers.csv')
+        print(f"🧪 Generating {args.rows:,} travelers...")
+        make_traveler_csv(path, args.rows)
+
+        cdp = CDPService(path)
+        start = time.perf_counter()
+        cdp.store.get()
+        print(f"Initial load: {time.perf_counter() - start:.2f}s")
+
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            stats = cdp.get_audience_stats()
+            timings.append(time.perf_counter() - start)
+        print(f"👥 Audience: {stats['audience_count']:,} travelers")
+        report("audience stats", timings)
+
+        # Serializing everyone: row dicts + json.dumps vs chunked JSON writers
+        result = cdp.query_audience({'column': 'distance_miles', 'op': 'lt', 'value': 10**9})
+        serializers = [
+            ("dicts + json.dumps", lambda: len(json.dumps(result.records()))),
+            ("records writer", lambda: sum(len(chunk) for chunk in result.iter_json('records'))),
+            ("ndjson stream", lambda: sum(len(chunk) for chunk in result.iter_json('ndjson'))),
+        ]
+        print(f"📦 Serializing {result.audience_count:,} travelers")
+        for name, serialize in serializers:
+            start = time.perf_counter()
+            size = serialize()
+            elapsed = time.perf_counter() - start
+            # Separate traced run so tracemalloc overhead doesn't skew the timing
+            tracemalloc.start()
+            serialize()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:<28} {elapsed:6.2f}s  peak={peak / 2**20:8.1f}MB  body={size / 2**20:.1f}MB")
+
+def bench_email(args):
+    """Campaign delivery throughput against the local email sink."""
+    from email_service import EmailService, HttpEmailProvider
+    from fake_servers import EmailSinkServer
+
+    print(f"📧 Delivery throughput (sink latency {args.latency_ms}ms/request, failure rate {args.failure_rate})")
+    with EmailSinkServer(args.latency_ms, args.failure_rate) as sink:
+        configs = [("sequential, batch=1", 1, 1)] + [(f"{w} workers, batch={args.batch_size}", w, args.batch_size) for w in args.workers]
+        for count in args.recipients:
+            recipients = [{"email": f"user{i}@example.com"} for i in range(count)]
+            for name, workers, batch_size in configs:
+                # The unbatched baseline is only run on a sample to keep the benchmark short
+                sample = recipients[:min(count, 1000)] if batch_size == 1 else recipients
+                service = EmailService(HttpEmailProvider(sink.url, pool_size=workers), max_workers=workers,
+                                       batch_size=batch_size, rate_per_second=args.rate)
+                service.engine.backoff_seconds = 0.01
+                start = time.perf_counter()
+                result = service.send_campaign(sample, "Benchmark", "Body", include_details=False)
+                elapsed = time.perf_counter() - start
+                print(f"{count:>8,} recipients  {name:<24} {len(sample) / elapsed:10,.0f} recipients/s  "
+                      f"sent={result['sent_count']:,} failed={result['failed_count']:,}")
+
+def bench_events(args):
+    """Event lookup latency for a date range against the local fake providers."""
+    from datetime import datetime, timedelta
+    from event_service import EventService
+    from fake_servers import EventProviderServer
+
+    start_date = datetime(2026, 6, 1)
+    end_date = start_date + timedelta(days=args.days - 1)
+    print(f"🎟️  {args.days}-day event lookup (provider latency {args.latency_ms}ms/request)")
+    with EventProviderServer(args.latency_ms) as provider:
+        for concurrency in [1] + args.concurrency:
+            service = EventService(max_concurrency=concurrency, fetch_deadline=600)
+            service.ticketmaster_api_key = service.eventbrite_api_key = 'bench'
+            service.base_url_ticketmaster = provider.ticketmaster_url
+            service.base_url_eventbrite = provider.eventbrite_url
+            provider.requests = provider.max_in_flight = 0
+            start = time.perf_counter()
+            events = service.get_events_for_date_range("Boston", start_date, end_date)
+            elapsed = time.perf_counter() - start
+            name = "sequential" if concurrency == 1 else f"{concurrency} concurrent"
+            print(f"{name:<16} {elapsed:7.2f}s  provider calls={provider.requests}  "
+                  f"peak in flight={provider.max_in_flight}  events={len(events)}")
+
+def bench_pricing(args):
+    """Stay pricing latency from the impact calendar vs scanning the stay's events."""
+    from datetime import datetime, timedelta
+    from event_service import EventService
+    from fake_servers import EventProviderServer
+
+    check_in = datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(days=7)
+    check_out = check_in + timedelta(days=args.nights)
+    print(f"💰 {args.nights}-night stay pricing")
+    for events_per_day in args.events_per_day:
+        with EventProviderServer(events_per_day=events_per_day) as provider:
+            service = EventService()
+            service.ticketmaster_api_key = service.eventbrite_api_key = 'bench'
+            service.base_url_ticketmaster = provider.ticketmaster_url
+            service.base_url_eventbrite = provider.eventbrite_url
+            service.refresh_calendar("Boston")  # builds calendar + cache
+
+            calendar_timings = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                service.calculate_pricing_adjustment("Boston", check_in, check_out)
+                calendar_timings.append(time.perf_counter() - start)
+            scan_timings = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                service.get_events_for_date_range("Boston", check_in, check_out)
+                scan_timings.append(time.perf_counter() - start)
+            report(f"calendar, {events_per_day}/day", calendar_timings)
+            report(f"event scan, {events_per_day}/day", scan_timings)
+
+def bench_burst(args):
+    """Provider calls triggered by a burst of identical cold lookups, without and with single-flight."""
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import datetime, timedelta
+    from event_service import EventService
+    from fake_servers import EventProviderServer
+
+    check_in = datetime.combine(datetime.now().date(), datetime.min.time()) + timedelta(days=3)
+    lookups = [
+        ("/event-pricing", lambda service: service.calculate_pricing_adjustment("Boston", check_in, check_in + timedelta(days=2))),
+        ("/events/{city}", lambda service: service.get_events_for_date_range("Boston", check_in, check_in + timedelta(days=7))),
+    ]
+    print(f"🌊 {args.requests} concurrent identical requests (provider latency {args.latency_ms}ms)")
+    with EventProviderServer(args.latency_ms) as provider:
+        for name, lookup in lookups:
+            for single_flight in (False, True):
+                service = EventService(max_concurrency=64)
+                service.ticketmaster_api_key = service.eventbrite_api_key = 'bench'
+                service.base_url_ticketmaster = provider.ticketmaster_url
+                service.base_url_eventbrite = provider.eventbrite_url
+                service.flights.enabled = single_flight
+                provider.requests = 0
+
+                barrier = threading.Barrier(args.requests)
+                def request(_):
+                    barrier.wait()
+                    lookup(service)
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=args.requests) as executor:
+                    list(executor.map(request, range(args.requests)))
+                elapsed = time.perf_counter() - start
+                label = "single-flight" if single_flight else "no coalescing"
+                print(f"{name:<16} {label:<14} provider calls={provider.requests:5d}  wall={elapsed:6.2f}s")
+
+def bench_serialization(args):
+    """Response serialization per endpoint: FastAPI's default path vs fast_json."""
+    from datetime import datetime, timedelta
+    from fastapi.encoders import jsonable_encoder
+    from api import BatchPredictionResponse
+    from cdp_service import AUDIENCE_COLUMNS, JSON_CHUNK_SIZE, CDPService
+    from event_service import Event, EventImpact
+    import fast_json
+
+    def default_path(model, content):
+        # What FastAPI does with a response_model: validate, encode, json.dumps
+        return json.dumps(jsonable_encoder(model.model_validate(content)), ensure_ascii=False, separators=(',', ':')).encode()
+
+    start_date = datetime(2026, 6, 1, 19, 30)
+    events = [Event(f"ev_{i}", f"Event {i}", start_date + timedelta(hours=i), "Arena", "Music",
+                    1000 + i, EventImpact.MEDIUM, 2.5) for i in range(args.events)]
+    def events_by_hand():
+        # The per-field conversion /events/{city} used before fast_json
+        data = [{"id": event.id, "name": event.name, "date": event.date.isoformat(), "venue": event.venue,
+                 "category": event.category, "expected_attendance": event.expected_attendance,
+                 "impact_level": event.impact_level.value, "distance_km": event.distance_km}
+                for event in events]
+        return json.dumps({"city": "Boston", "events": data, "total_events": len(data)}).encode()
+
+    predictions = {"predictions": [
+        {"segment_label": "Business Elite", "segment_id": i % 4, "booking_probability": 0.42 + i * 1e-6,
+         "estimated_ltv": 9600.0} for i in range(args.predictions)]}
+
+    print(f"🧾 Response serialization (orjson {'on' if fast_json.orjson else 'off'})")
+    cases = [
+        (f"/events, {args.events:,} events", events_by_hand,
+         lambda: fast_json.dumps({"city": "Boston", "events": events, "total_events": len(events)})),
+        (f"/predict/batch, {args.predictions:,}", lambda: default_path(BatchPredictionResponse, predictions),
+         lambda: fast_json.dumps(predictions)),
+    ]
+    for name, default, fast in cases:
+        assert json.loads(default()) == json.loads(fast())
+        for label, serialize in (("default", default), ("fast_json", fast)):
+            timings = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                serialize()
+                timings.append(time.perf_counter() - start)
+            report(f"{name} {label}", timings)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'travelers.csv')
+        make_traveler_csv(path, args.rows)
+        result = CDPService(path).query_audience({'column': 'distance_miles', 'op': 'lt', 'value': 10**9})
+        print(f"📦 Audience of {result.audience_count:,} travelers")
+        for format in ('records', 'columnar', 'ndjson'):
+            for label, writer in (("pandas", result.table._iter_json_pandas), ("fast_json", result.table.iter_json)):
+                start = time.perf_counter()
+                size = sum(len(chunk) for chunk in writer(result.indices, AUDIENCE_COLUMNS, format, JSON_CHUNK_SIZE))
+                print(f"{format + ' ' + label:<28} {time.perf_counter() - start:6.2f}s  body={size / 2**20:.1f}MB")
+
+def bench_isolation(args):
+    """/predict latency while slow event lookups are in flight: sync handlers vs async handlers on bounded pools."""
+    import asyncio
+    from datetime import datetime, timedelta
+    import httpx
+    from fastapi import FastAPI
+    import api
+    from event_service import EventService
+    from fake_servers import EventProviderServer
+
+    def point_at(service, provider):
+        service.ticketmaster_api_key = service.eventbrite_api_key = 'bench'
+        service.base_url_ticketmaster = provider.ticketmaster_url
+        service.base_url_eventbrite = provider.eventbrite_url
+
+    # The previous handler model: plain def routes sharing Starlette's threadpool
+    sync_service = EventService()
+    sync_app = FastAPI()
+
+    @sync_app.get("/events/{city}")
+    def sync_events(city: str):
+        start = datetime(2026, 6, 1)
+        return {"total_events": len(sync_service.get_events_for_date_range(city, start, start + timedelta(days=7)))}
+
+    @sync_app.post("/predict")
+    def sync_predict(profile: api.TravelerProfile):
+        return api.score_profile(profile)
+
+    async def measure(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            slow = [asyncio.ensure_future(client.get(f"/events/City {i}", params={"date": "2026-06-01"}))
+                    for i in range(args.slow_requests)]
+            await asyncio.sleep(0.2)  # let the lookups take their threads
+            timings = []
+            for _ in range(args.predictions):
+                start = time.perf_counter()
+                response = await client.post("/predict", json=SAMPLE_PROFILE)
+                response.raise_for_status()
+                timings.append(time.perf_counter() - start)
+            await asyncio.gather(*slow)
+        return timings
+
+    api.model_store.warm_up()
+    print(f"🚦 /predict during {args.slow_requests} event lookups (provider latency {args.latency_ms}ms)")
+    with EventProviderServer(args.latency_ms) as provider:
+        point_at(sync_service, provider)
+        point_at(api.event_service, provider)
+        report("sync handlers", asyncio.run(measure(sync_app)))
+        report("async + bounded pools", asyncio.run(measure(api.app)))
+
+def bench_prediction_cache(args):
+    """/predict scoring latency with and without the prediction cache on a skewed profile stream."""
+    from prediction_cache import PredictionCache
+
+    model_data = utils.load_models()
+    rng = np.random.default_rng(7)
+    tiers = ['Member', 'Silver', 'Gold', 'Platinum', 'Titanium']
+    purposes = ['Business', 'Leisure', 'Bleisure']
+    distinct = [{
+        'age': int(rng.integers(22, 75)),
+        'loyalty_tier': tiers[rng.integers(len(tiers))],
+        'avg_spend': float(rng.integers(100, 3000)),
+        'last_stay_days_ago': int(rng.integers(1, 365)),
+        'travel_purpose': purposes[rng.integers(len(purposes))],
+    } for _ in range(args.distinct)]
+    # Zipf-like popularity: a few profile combinations dominate, as from the form and campaign tools
+    weights = 1 / np.arange(1, args.distinct + 1)
+    stream = [distinct[i] for i in rng.choice(args.distinct, size=args.requests, p=weights / weights.sum())]
+
+    def uncached(profile):
+        features = utils.encode_profile(model_data, profile)
+        _, segment_id = utils.predict_traveler_segment(model_data, profile, features=features)
+        utils.predict_booking_prob(model_data, profile, segment_id, features=features)
+
+    print(f"🗂️  {args.requests:,} requests over {args.distinct:,} distinct profiles")
+    exact = PredictionCache(source_path=None)
+    bucketed = PredictionCache(spend_bucket=args.spend_bucket, recency_bucket=args.recency_bucket, source_path=None)
+    variants = [
+        ("uncached", uncached, None),
+        ("cached", lambda profile: exact.predict(model_data, profile), exact),
+        (f"cached, buckets {args.spend_bucket:g}/{args.recency_bucket:g}",
+         lambda profile: bucketed.predict(model_data, profile), bucketed),
+    ]
+    for label, predict, cache in variants:
+        timings = []
+        for profile in stream:
+            start = time.perf_counter()
+            predict(profile)
+            timings.append(time.perf_counter() - start)
+        report(label, timings)
+        if cache is not None:
+            stats = cache.stats()
+            print(f"{'':<28} hit_ratio={stats['hit_ratio']}  avg_hit={stats['avg_hit_us']}us  "
+                  f"avg_miss={stats['avg_miss_us']}us  saved={stats['saved_seconds']}s")
+
+def bench_batching(args):
+    """/predict load test: throughput vs latency for per-request scoring and micro-batch windows."""
+    from concurrent.futures import ThreadPoolExecutor
+    from micro_batcher import MicroBatcher
+
+    model_data = utils.load_models()
+    rng = np.random.default_rng(11)
+    profiles = [{**SAMPLE_PROFILE, 'age': int(rng.integers(22, 75)), 'avg_spend': float(rng.integers(100, 3000)),
+                 'last_stay_days_ago': int(rng.integers(1, 365))} for _ in range(1000)]
+
+    def score_one(profile):
+        features = utils.encode_profile(model_data, profile)
+        _, segment_id = utils.predict_traveler_segment(model_data, profile, features=features)
+        return utils.predict_booking_prob(model_data, profile, segment_id, features=features)
+
+    def score_rows(rows):
+        features = utils.encode_profiles(model_data, rows)
+        _, segment_ids = utils.predict_traveler_segments_batch(model_data, rows, features=features)
+        return utils.predict_booking_probs_batch(model_data, rows, segment_ids, features=features)
+
+    def load(score, clients):
+        """Closed loop: each client sends its next request when the last one returns."""
+        stop_at = time.perf_counter() + args.duration
+        def client(offset):
+            timings = []
+            i = offset
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                score(profiles[i % len(profiles)])
+                timings.append(time.perf_counter() - start)
+                i += clients
+            return timings
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            timings = [t for per_client in executor.map(client, range(clients)) for t in per_client]
+        return timings
+
+    print(f"⚙️  /predict scoring under load ({args.duration:g}s per run, max batch {args.max_batch})")
+    for clients in args.clients:
+        variants = [("per-request", score_one, None)]
+        for window in args.windows_ms:
+            batcher = MicroBatcher(score_rows, max_batch_size=args.max_batch, max_wait_ms=window)
+            variants.append((f"batched {window:g}ms", lambda profile, b=batcher: b.submit(profile).result(), batcher))
+        for label, score, batcher in variants:
+            timings = load(score, clients)
+            extra = f"  avg batch={batcher.stats()['avg_batch']}" if batcher else ""
+            print(f"{clients:3d} clients  {label:<14} {len(timings) / args.duration:9.0f} req/s  "
+                  f"p50={np.percentile(timings, 50) * 1e3:6.2f}ms  p99={np.percentile(timings, 99) * 1e3:6.2f}ms{extra}")
+            if batcher:
+                batcher.stop()
+
+def bench_scoring(args):
+    """Bulk scoring throughput and peak memory of score_travelers.py by worker count."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'travelers.csv')
+        print(f"🧪 Generating {args.rows:,} travelers...")
+        # In a child process: Linux keeps peak RSS across fork+exec, which would inflate the runs below
+        subprocess.run([sys.executable, "-c", f"import benchmark; benchmark.make_traveler_csv({path!r}, {args.rows})"],
+                       check=True)
+        print(f"🏷️  Scoring {args.rows:,} rows in chunks of {args.chunk_size:,}")
+        for workers in args.workers:
+            # Fresh process per run so peak RSS is per configuration
+            code = ("import json, score_travelers; print(json.dumps(score_travelers.score_file("
+                    f"{path!r}, {os.path.join(tmp, 'scores.csv')!r}, {workers}, {args.chunk_size})))")
+            stats = json.loads(subprocess.run([sys.executable, "-c", code], check=True,
+                                              capture_output=True, text=True).stdout.splitlines()[-1])
+            print(f"{workers:2d} workers  {stats['seconds']:7.2f}s  {stats['rows_per_second']:>10,} rows/s  "
+                  f"peak RSS={stats['peak_rss_mb']}MB")
+
+def bench_training(args):
+    """train_model.py stage timings and peak memory: in-memory vs --scalable."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'travelers.csv')
+        print(f"🧪 Generating {args.rows:,} travelers...")
+        subprocess.run([sys.executable, "-c", f"import benchmark; benchmark.make_traveler_csv({path!r}, {args.rows})"],
+                       check=True)
+        for label, extra in (("in-memory", []), ("scalable", ["--scalable"])):
+            print(f"\n🏋️  {label}")
+            output = subprocess.run(
+                [sys.executable, "train_model.py", "--data", path, "--output", os.path.join(tmp, 'models.pkl'), *extra],
+                check=True, capture_output=True, text=True).stdout
+            # Just the stage table
+            print(output[output.index("stage"):].rstrip())
+
+# Runs in a fresh interpreter per simulated worker; prints "<version> <time>" on every swap
+RELOAD_CHILD = '''
+import sys, time, warnings
+warnings.filterwarnings("ignore")
+from model_store import ModelStore
+store = ModelStore({source!r}, {store_dir!r})
+store.get()
+store.start_watching({interval})
+version = None
+while True:
+    if store.info()["version"] != version:
+        version = store.info()["version"]
+        print(version, time.time(), flush=True)
+    time.sleep(0.005)
+'''
+
+def retrained_copy(model_data, generation):
+    """model_data with relabelled segments, so every generation is a distinct artifact."""
+    labels = {k: f"{v} #{generation}" for k, v in model_data['segment_labels'].items()}
+    return {**model_data, 'segment_labels': labels}
+
+def bench_reload(args):
+    """Hot model reload: scoring latency while versions swap, and how fast worker processes converge."""
+    import joblib
+    from concurrent.futures import ThreadPoolExecutor
+    from model_store import ModelStore
+
+    model_data = utils.load_models()
+    with tempfile.TemporaryDirectory() as tmp:
+        source, store_dir = os.path.join(tmp, 'models.pkl'), os.path.join(tmp, 'store')
+        joblib.dump(model_data, source)
+        store = ModelStore(source, store_dir)
+        store.warm_up()
+
+        def load(swaps):
+            """Closed-loop scoring from 4 threads, swapping in a new version every duration/swaps seconds."""
+            stop_at = time.perf_counter() + args.duration
+            def client(_):
+                timings, errors = [], 0
+                while time.perf_counter() < stop_at:
+                    start = time.perf_counter()
+                    try:
+                        served = store.get()
+                        _, segment_id = utils.predict_traveler_segment(served, SAMPLE_PROFILE)
+                        utils.predict_booking_prob(served, SAMPLE_PROFILE, segment_id)
+                    except Exception:
+                        errors += 1
+                    timings.append(time.perf_counter() - start)
+                return timings, errors
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                clients = [executor.submit(client, i) for i in range(4)]
+                for generation in range(swaps):
+                    time.sleep(args.duration / (swaps + 1))
+                    joblib.dump(retrained_copy(model_data, generation), source)
+                    store.check_for_update()
+                results = [c.result() for c in clients]
+            return [t for timings, _ in results for t in timings], sum(errors for _, errors in results)
+
+        print(f"🔄 Scoring latency, 4 threads for {args.duration:g}s")
+        for label, swaps in (("no reloads", 0), (f"{args.swaps} hot swaps", args.swaps)):
+            timings, errors = load(swaps)
+            report(label, timings)
+            print(f"{'':<28} errors={errors}")
+        info = store.info()
+        print(f"{'':<28} last build+load+warm {info['load_seconds'] * 1e3:.1f}ms, reloads={info['reloads']}")
+
+        print(f"\n🧑‍🤝‍🧑 {args.workers} worker processes watching every {args.interval:g}s")
+        procs = [subprocess.Popen([sys.executable, "-c", RELOAD_CHILD.format(
+                     source=source, store_dir=store_dir, interval=args.interval)],
+                     stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) for _ in range(args.workers)]
+        try:
+            for proc in procs:
+                proc.stdout.readline()  # serving its first version
+            # Whichever worker builds a version first unpickles models.pkl, paying sklearn's import once
+            for generation in range(args.swaps, 2 * args.swaps):
+                published = time.time()
+                joblib.dump(retrained_copy(model_data, generation), source)
+                swaps = [proc.stdout.readline().split() for proc in procs]
+                lags = [float(at) - published for _, at in swaps]
+                versions = {version for version, _ in swaps}
+                print(f"version {versions.pop() if len(versions) == 1 else versions}: all workers serving after "
+                      f"{max(lags):.2f}s (first {min(lags):.2f}s)")
+        finally:
+            for proc in procs:
+                proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    inference = subparsers.add_parser("inference", help=bench_inference.__doc__)
+    inference.add_argument("--iterations", type=int, default=5000)
+    inference.set_defaults(func=bench_inference)
+
+    startup = subparsers.add_parser("startup", help=bench_startup.__doc__)
+    startup.add_argument("--workers", type=int, default=4)
+    startup.set_defaults(func=bench_startup)
+
+    audience = subparsers.add_parser("audience", help=bench_audience.__doc__)
+    audience.add_argument("--rows", type=int, default=2_000_000)
+    audience.add_argument("--iterations", type=int, default=50)
+    audience.set_defaults(func=bench_audience)
+
+    email = subparsers.add_parser("email", help=bench_email.__doc__)
+    email.add_argument("--recipients", type=int, nargs="+", default=[10_000, 100_000])
+    email.add_argument("--workers", type=int, nargs="+", default=[4, 16])
+    email.add_argument("--batch-size", type=int, default=100)
+    email.add_argument("--latency-ms", type=float, default=20)
+    email.add_argument("--failure-rate", type=float, default=0.01)
+    email.add_argument("--rate", type=float, default=None, help="Token-bucket limit in recipients/s")
+    email.set_defaults(func=bench_email)
+
+    events = subparsers.add_parser("events", help=bench_events.__doc__)
+    events.add_argument("--days", type=int, default=30)
+    events.add_argument("--concurrency", type=int, nargs="+", default=[8, 32])
+    events.add_argument("--latency-ms", type=float, default=100)
+    events.set_defaults(func=bench_events)
+
+    pricing = subparsers.add_parser("pricing", help=bench_pricing.__doc__)
+    pricing.add_argument("--nights", type=int, default=7)
+    pricing.add_argument("--events-per-day", type=int, nargs="+", default=[3, 50])
+    pricing.add_argument("--iterations", type=int, default=500)
+    pricing.set_defaults(func=bench_pricing)
+
+    burst = subparsers.add_parser("burst", help=bench_burst.__doc__)
+    burst.add_argument("--requests", type=int, default=100)
+    burst.add_argument("--latency-ms", type=float, default=200)
+    burst.set_defaults(func=bench_burst)
+
+    serialization = subparsers.add_parser("serialization", help=bench_serialization.__doc__)
+    serialization.add_argument("--events", type=int, default=1000)
+    serialization.add_argument("--predictions", type=int, default=1000)
+    serialization.add_argument("--rows", type=int, default=500_000)
+    serialization.add_argument("--iterations", type=int, default=50)
+    serialization.set_defaults(func=bench_serialization)
+
+    isolation = subparsers.add_parser("isolation", help=bench_isolation.__doc__)
+    isolation.add_argument("--slow-requests", type=int, default=200)
+    isolation.add_argument("--predictions", type=int, default=50)
+    isolation.add_argument("--latency-ms", type=float, default=500)
+    isolation.set_defaults(func=bench_isolation)
+
+    prediction_cache = subparsers.add_parser("prediction-cache", help=bench_prediction_cache.__doc__)
+    prediction_cache.add_argument("--requests", type=int, default=20_000)
+    prediction_cache.add_argument("--distinct", type=int, default=500)
+    prediction_cache.add_argument("--spend-bucket", type=float, default=50)
+    prediction_cache.add_argument("--recency-bucket", type=float, default=7)
+    prediction_cache.set_defaults(func=bench_prediction_cache)
+
+    batching = subparsers.add_parser("batching", help=bench_batching.__doc__)
+    batching.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    batching.add_argument("--windows-ms", type=float, nargs="+", default=[0, 0.5, 2])
+    batching.add_argument("--max-batch", type=int, default=256)
+    batching.add_argument("--duration", type=float, default=3)
+    batching.set_defaults(func=bench_batching)
+
+    scoring = subparsers.add_parser("scoring", help=bench_scoring.__doc__)
+    scoring.add_argument("--rows", type=int, default=2_000_000)
+    scoring.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    scoring.add_argument("--chunk-size", type=int, default=50_000)
+    scoring.set_defaults(func=bench_scoring)
+
+    training = subparsers.add_parser("training", help=bench_training.__doc__)
+    training.add_argument("--rows", type=int, default=1_000_000)
+    training.set_defaults(func=bench_training)
+
+    reload = subparsers.add_parser("reload", help=bench_reload.__doc__)
+    reload.add_argument("--workers", type=int, default=4)
+    reload.add_argument("--swaps", type=int, default=5)
+    reload.add_argument("--duration", type=float, default=5)
+    reload.add_argument("--interval", type=float, default=0.5, help="Watch interval of the worker processes")
+    reload.set_defaults(func=bench_reload)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""Background campaign jobs backed by SQLite.
+
+A submitted campaign is written to a local SQLite database (job row plus one
+row per recipient) and delivered in the background in checkpointed chunks.
+Progress, cancellation and resume all go through the database, so any API
+worker process can poll or control a job, and a job interrupted by a restart
+can be resumed from its last completed chunk.
+
+Each run claims its job with an owner token and heartbeats updated_at while
+it delivers; queued jobs are owned and heartbeated by the manager that queued
+them. Only a job whose heartbeat has stopped is declared interrupted, and
+checkpoints are written only by the run that still owns the job, so a resumed
+copy and a stalled original never both keep sending. On shutdown (including
+interpreter exit) running jobs stop at the next chunk and are marked
+interrupted rather than failed.
+"""
+
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Job states
+PENDING = 'pending'
+RUNNING = 'running'
+CANCELLING = 'cancelling'
+CANCELLED = 'cancelled'
+INTERRUPTED = 'interrupted'
+COMPLETED = 'completed'
+COMPLETED_WITH_ERRORS = 'completed_with_errors'
+FAILED = 'failed'
+
+RESUMABLE_STATES = (CANCELLED, INTERRUPTED, FAILED)
+FINISHED_STATES = (CANCELLED, COMPLETED, COMPLETED_WITH_ERRORS, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaign_jobs (
+    job_id TEXT PRIMARY KEY,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    checkpoint INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    owner TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS campaign_recipients (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    status TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+
+class JobNotFound(LookupError):
+    """Raised for an unknown job id."""
+
+
+_managers = weakref.WeakSet()
+
+
+def _stop_managers_at_exit():
+    for manager in list(_managers):
+        manager._stopping.set()
+
+
+# Runs before concurrent.futures joins pool threads at exit (it registers first, these run in
+# reverse), so jobs stop at a chunk boundary instead of failing on "cannot schedule new futures"
+getattr(threading, '_register_atexit', atexit.register)(_stop_managers_at_exit)
+
+
+class CampaignJobManager:
+    """Submits, runs, cancels and resumes campaign jobs for an EmailService."""
+
+    def __init__(self, email_service, db_path: str = 'campaign_jobs.db',
+                 chunk_size: int = 500, max_concurrent_jobs: int = 2, heartbeat_interval: float = 30):
+        self.email_service = email_service
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.heartbeat_interval = heartbeat_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix='campaign-job')
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        # Owner of the jobs this manager has queued but not started
+        self.instance_id = uuid.uuid4().hex
+        self._stopping = threading.Event()
+        self._queue_heartbeat: Optional[threading.Thread] = None
+        _managers.add(self)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            if not self._schema_ready:
+                with self._schema_lock:
+                    if not self._schema_ready:
+                        conn.execute('PRAGMA journal_mode=WAL')
+                        conn.executescript(SCHEMA)
+                        columns = {row['name'] for row in conn.execute('PRAGMA table_info(campaign_jobs)')}
+                        if 'owner' not in columns:  # databases created before runs had owners
+                            conn.execute('ALTER TABLE campaign_jobs ADD COLUMN owner TEXT')
+                        self._schema_ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def submit(self, recipients: List[Dict], subject: str, body: str) -> Dict:
+        """Persist a campaign and start delivering it in the background."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO campaign_jobs (job_id, subject, body, status, total, owner, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, subject, body, PENDING, len(recipients), self.instance_id, now, now)
+            )
+            conn.executemany(
+                'INSERT INTO campaign_recipients (job_id, position, email) VALUES (?, ?, ?)',
+                ((job_id, position, r['email']) for position, r in enumerate(recipients))
+            )
+        self._start(job_id, from_states=(PENDING,))
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Dict:
+        """Progress of a job: status plus sent, failed and pending counts."""
+        with self._connect() as conn:
+            row = conn.execute('SELECT * FROM campaign_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            raise JobNotFound(f"Campaign job {job_id} not found")
+        return {
+            "job_id": row["job_id"],
+            "subject": row["subject"],
+            "status": row["status"],
+            "total": row["total"],
+            "sent": row["sent"],
+            "failed": row["failed"],
+            "pending": row["total"] - row["sent"] - row["failed"],
+            "checkpoint": row["checkpoint"],
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def cancel(self, job_id: str) -> Dict:
+        """Ask a job to stop after its current chunk. Jobs that haven't started stop immediately."""
+        with self._connect() as conn:
+            self._set_status(conn, job_id, CANCELLED, from_states=(PENDING,))
+            self._set_status(conn, job_id, CANCELLING, from_states=(RUNNING,))
+        return self.get(job_id)
+
+    def resume(self, job_id: str) -> Dict:
+        """Restart a cancelled, interrupted or failed job from its last checkpoint."""
+        self.recover_interrupted()
+        job = self.get(job_id)
+        if job["status"] not in RESUMABLE_STATES:
+            raise ValueError(f"Job {job_id} is {job['status']} and cannot be resumed")
+        self._start(job_id, from_states=RESUMABLE_STATES)
+        return self.get(job_id)
+
+    def recover_interrupted(self, stale_after: float = 300) -> int:
+        """
+        Mark running or queued jobs whose heartbeat stopped stale_after seconds
+        ago as interrupted, e.g. because the worker that ran or queued them was
+        restarted. They can then be resumed from their checkpoint. A stalled job
+        that was being cancelled becomes cancelled. stale_after must stay well
+        above heartbeat_interval.
+        """
+        cutoff = time.time() - stale_after
+        with self._connect() as conn:
+            recovered = 0
+            for status, from_state in ((INTERRUPTED, RUNNING), (INTERRUPTED, PENDING), (CANCELLED, CANCELLING)):
+                recovered += conn.execute(
+                    'UPDATE campaign_jobs SET status = ?, owner = NULL, updated_at = ? '
+                    'WHERE status = ? AND updated_at < ?',
+                    (status, time.time(), from_state, cutoff)
+                ).rowcount
+            return recovered
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop running jobs at their next chunk and mark them and queued jobs interrupted."""
+        self._stopping.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'UPDATE campaign_jobs SET status = ?, owner = NULL, updated_at = ? WHERE owner = ? AND status = ?',
+                    (INTERRUPTED, time.time(), self.instance_id, PENDING)
+                )
+        except sqlite3.Error as e:
+            logger.warning(f"Could not mark queued campaign jobs interrupted: {e}")
+        if wait:
+            self._executor.shutdown(wait=True)
+
+    def _set_status(self, conn, job_id, status, from_states, error=None) -> bool:
+        placeholders = ','.join('?' * len(from_states))
+        cursor = conn.execute(
+            f'UPDATE campaign_jobs SET status = ?, error = ?, updated_at = ? '
+            f'WHERE job_id = ? AND status IN ({placeholders})',
+            (status, error, time.time(), job_id, *from_states)
+        )
+        return cursor.rowcount == 1
+
+    def _start(self, job_id, from_states) -> None:
+        if self._queue_heartbeat is None:
+            self._queue_heartbeat = threading.Thread(target=self._heartbeat_queued, daemon=True,
+                                                     name='campaign-queue-heartbeat')
+            self._queue_heartbeat.start()
+        self._executor.submit(self._run, job_id, from_states)
+
+    def _heartbeat_queued(self) -> None:
+        """Refresh updated_at of the jobs this manager has queued, so a long queue doesn't look dead."""
+        while not self._stopping.wait(self.heartbeat_interval):
+            try:
+                with self._connect() as conn:
+                    conn.execute('UPDATE campaign_jobs SET updated_at = ? WHERE owner = ? AND status = ?',
+                                 (time.time(), self.instance_id, PENDING))
+            except sqlite3.Error as e:
+                logger.warning(f"Campaign queue heartbeat failed: {e}")
+
+    def _interrupt(self, conn, job_id: str, owner: str) -> None:
+        """Give up a job this run owns: running becomes interrupted, cancelling becomes cancelled."""
+        for status, from_state in ((INTERRUPTED, RUNNING), (CANCELLED, CANCELLING)):
+            conn.execute(
+                'UPDATE campaign_jobs SET status = ?, owner = NULL, updated_at = ? '
+                'WHERE job_id = ? AND owner = ? AND status = ?',
+                (status, time.time(), job_id, owner, from_state)
+            )
+
+    def _claim(self, conn, job_id, from_states, owner) -> bool:
+        placeholders = ','.join('?' * len(from_states))
+        cursor = conn.execute(
+            f'UPDATE campaign_jobs SET status = ?, owner = ?, error = NULL, updated_at = ? '
+            f'WHERE job_id = ? AND status IN ({placeholders})',
+            (RUNNING, owner, time.time(), job_id, *from_states)
+        )
+        return cursor.rowcount == 1
+
+    @contextmanager
+    def _heartbeat(self, job_id: str, owner: str):
+        """Refresh updated_at while this run owns the job, so slow chunks don't look stalled."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.heartbeat_interval):
+                try:
+                    with self._connect() as conn:
+                        conn.execute(
+                            'UPDATE campaign_jobs SET updated_at = ? WHERE job_id = ? AND owner = ? '
+                            'AND status IN (?, ?)', (time.time(), job_id, owner, RUNNING, CANCELLING)
+                        )
+                except sqlite3.Error as e:
+                    logger.warning(f"Campaign job {job_id} heartbeat failed: {e}")
+
+        thread = threading.Thread(target=beat, daemon=True, name=f'campaign-heartbeat-{job_id[:8]}')
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _run(self, job_id: str, from_states) -> None:
+        # Claiming the job atomically stops two workers from running it at once
+        owner = uuid.uuid4().hex
+        with self._connect() as conn:
+            if not self._claim(conn, job_id, from_states, owner):
+                return
+        try:
+            with self._heartbeat(job_id, owner):
+                self._deliver_all(job_id, owner)
+        except Exception as e:
+            if self._stopping.is_set():
+                # Shutting down mid-chunk (e.g. the email pool is gone); the chunk wasn't checkpointed
+                logger.warning(f"Campaign job {job_id} interrupted by shutdown: {e}")
+                with self._connect() as conn:
+                    self._interrupt(conn, job_id, owner)
+                return
+            logger.error(f"Campaign job {job_id} failed: {e}")
+            with self._connect() as conn:
+                conn.execute(
+                    'UPDATE campaign_jobs SET status = ?, error = ?, updated_at = ? '
+                    'WHERE job_id = ? AND owner = ? AND status IN (?, ?)',
+                    (FAILED, str(e), time.time(), job_id, owner, RUNNING, CANCELLING)
+                )
+
+    def _deliver_all(self, job_id: str, owner: str) -> None:
+        while True:
+            with self._connect() as conn:
+                job = conn.execute('SELECT * FROM campaign_jobs WHERE job_id = ?', (job_id,)).fetchone()
+                if job["owner"] != owner or job["status"] not in (RUNNING, CANCELLING):
+                    # Declared interrupted while stalled; a resume owns the job now
+                    return
+                if job["status"] == CANCELLING:
+                    self._set_status(conn, job_id, CANCELLED, from_states=(CANCELLING,))
+                    return
+                if self._stopping.is_set():
+                    self._interrupt(conn, job_id, owner)
+                    return
+                checkpoint = job["checkpoint"]
+                rows = conn.execute(
+                    'SELECT position, email FROM campaign_recipients '
+                    'WHERE job_id = ? AND position >= ? ORDER BY position LIMIT ?',
+                    (job_id, checkpoint, self.chunk_size)
+                ).fetchall()
+
+            if not rows:
+                with self._connect() as conn:
+                    final = COMPLETED_WITH_ERRORS if job["failed"] else COMPLETED
+                    conn.execute(
+                        'UPDATE campaign_jobs SET status = ?, updated_at = ? '
+                        'WHERE job_id = ? AND owner = ? AND status IN (?, ?)',
+                        (final, time.time(), job_id, owner, RUNNING, CANCELLING)
+                    )
+                return
+
+            if not self._deliver_chunk(job, rows, owner):
+                logger.warning(f"Campaign job {job_id} was taken over by another run; stopping")
+                return
+
+    def _deliver_chunk(self, job, rows, owner: str) -> bool:
+        """Send one chunk and checkpoint it. False if this run no longer owns the job."""
+        positions_by_email: Dict[str, List[int]] = {}
+        for row in rows:
+            positions_by_email.setdefault(row["email"], []).append(row["position"])
+
+        results = []
+        self.email_service.engine.deliver(
+            [{"email": row["email"]} for row in rows], job["subject"], job["body"], on_result=results.append
+        )
+
+        # Recipient results, counters and the checkpoint commit together
+        updates = []
+        sent = failed = 0
+        for result in results:
+            positions = positions_by_email.get(result["email"], [])
+            if positions:
+                updates.append((result["status"], result.get("error"), job["job_id"], positions.pop()))
+                if result["status"] == "sent":
+                    sent += 1
+                else:
+                    failed += 1
+        with self._connect() as conn:
+            # A cancel during the chunk still records it; a takeover does not
+            cursor = conn.execute(
+                'UPDATE campaign_jobs SET sent = sent + ?, failed = failed + ?, checkpoint = ?, updated_at = ? '
+                'WHERE job_id = ? AND owner = ? AND status IN (?, ?)',
+                (sent, failed, rows[-1]["position"] + 1, time.time(), job["job_id"], owner, RUNNING, CANCELLING)
+            )
+            if cursor.rowcount == 0:
+                return False
+            conn.executemany(
+                'UPDATE campaign_recipients SET status = ?, error = ? WHERE job_id = ? AND position = ?', updates
+            )
+        return True
@@ -1,9 +1,543 @@
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 
+from executors import BoundedExecutor
+
+try:
+    import orjson
+except ImportError:  # optional speedup for audience serialization
+    orjson = None
+
+# Low-cardinality string columns stored as integer codes
+CATEGORICAL_COLUMNS = ['travel_purpose', 'loyalty_tier', 'home_city']
+
+# Fields returned for each traveler in an audience
+AUDIENCE_COLUMNS = ['email', 'loyalty_tier', 'home_city', 'distance_miles', 'last_stay_days_ago', 'avg_spend']
+
+# Rows serialized per chunk when writing audiences as JSON
+JSON_CHUNK_SIZE = 10000
+
+# Output formats for audience members
+AUDIENCE_FORMATS = ('records', 'columnar', 'ndjson')
+
+# Numeric columns kept with a sorted index for range predicates
+SORTED_INDEX_COLUMNS = ['distance_miles']
+
+# Loyalty tiers from lowest to highest, for ordered comparisons like tier >= Gold
+LOYALTY_TIER_ORDER = ['Member', 'Silver', 'Gold', 'Platinum', 'Titanium']
+
+COMPARISON_OPS = {
+    'eq': np.equal,
+    'ne': np.not_equal,
+    'lt': np.less,
+    'lte': np.less_equal,
+    'gt': np.greater,
+    'gte': np.greater_equal,
+}
+SET_OPS = ('in', 'not_in')
+GROUP_OPS = ('all', 'any')
+
+# The Q2 Business Local campaign audience as an audience definition
+Q2_BUSINESS_LOCAL = {
+    'all': [
+        {'column': 'travel_purpose', 'op': 'eq', 'value': 'Business'},
+        {'column': 'distance_miles', 'op': 'lt', 'value': 200},
+        {'column': 'has_q2_booking', 'op': 'eq', 'value': 0},
+    ]
+}
+
+class TravelerTable:
+    """
+    Immutable columnar snapshot of one version of the traveler file.
+    Categoricals are integer codes; distance has a sorted index and
+    has_q2_booking a precomputed mask so audience filters are pure array ops.
+    """
+
+    def __init__(self, df, version):
+        self.df = df
+        self.version = version
+        self.row_count = len(df)
+
+        self.columns = {}
+        self.categories = {}
+        for name in df.columns:
+            if name in CATEGORICAL_COLUMNS:
+                self.columns[name] = df[name].cat.codes.to_numpy()
+                # Trailing None decodes the -1 code pandas uses for missing values
+                self.categories[name] = np.append(df[name].cat.categories.to_numpy(dtype=object), None)
+            else:
+                self.columns[name] = df[name].to_numpy()
+
+        self.sorted_indexes = {}
+        for name in SORTED_INDEX_COLUMNS:
+            order = np.argsort(self.columns[name], kind='stable')
+            self.sorted_indexes[name] = (order, self.columns[name][order])
+        self.no_q2_booking = self.columns['has_q2_booking'] == 0
+
+        # Rank of each loyalty_tier code in LOYALTY_TIER_ORDER (-1 if unranked)
+        tier_rank = {tier: rank for rank, tier in enumerate(LOYALTY_TIER_ORDER)}
+        self.loyalty_ranks = np.array(
+            [tier_rank.get(tier, -1) for tier in self.categories['loyalty_tier'][:-1]] + [-1]
+        )
+
+        self._encoded_categories = {}
+
+    def category_mask(self, column, values):
+        """
+        Boolean mask of rows where a categorical column is any of values,
+        compared on the integer codes. Not cached: values come from requests.
+        """
+        codes = np.flatnonzero(np.isin(self.categories[column][:-1], list(values)))
+        if not len(codes):
+            return np.zeros(self.row_count, dtype=bool)
+        if len(codes) == 1:
+            return self.columns[column] == codes[0]
+        return np.isin(self.columns[column], codes)
+
+    def distance_below(self, limit):
+        """Boolean mask of rows with distance_miles < limit, via the sorted index."""
+        return self.range_mask('distance_miles', high=limit)
+
+    def range_mask(self, column, low=None, high=None, low_inclusive=True, high_inclusive=False):
+        """Boolean mask for low <(=) column <(=) high, using the sorted index when there is one."""
+        if column not in self.sorted_indexes:
+            mask = np.ones(self.row_count, dtype=bool)
+            values = self.columns[column]
+            if low is not None:
+                mask &= (values >= low) if low_inclusive else (values > low)
+            if high is not None:
+                mask &= (values <= high) if high_inclusive else (values < high)
+            return mask
+
+        order, sorted_values = self.sorted_indexes[column]
+        start = 0
+        end = self.row_count
+        if low is not None:
+            start = np.searchsorted(sorted_values, low, side='left' if low_inclusive else 'right')
+        if high is not None:
+            end = np.searchsorted(sorted_values, high, side='right' if high_inclusive else 'left')
+        mask = np.zeros(self.row_count, dtype=bool)
+        mask[order[start:max(start, end)]] = True
+        return mask
+
+    def column_values(self, column, indices):
+        """Decoded values of a column for the given rows, as Python objects."""
+        values = self.columns[column][indices]
+        if column in self.categories:
+            values = self.categories[column][values]
+        return values.tolist()
+
+    def records(self, indices, columns=AUDIENCE_COLUMNS):
+        """Materialize the selected rows as dicts of native Python values."""
+        values = [self.column_values(column, indices) for column in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+    def iter_json(self, indices, columns=AUDIENCE_COLUMNS, fmt='records', chunk_size=JSON_CHUNK_SIZE):
+        """
+        Serialize the selected rows straight to JSON text, one chunk at a time.
+        'records' yields a JSON array of objects, 'columnar' an object of
+        column arrays and 'ndjson' one object per line. Each chunk is encoded
+        in C (orjson if installed, else pandas), so memory stays bounded by
+        chunk_size whatever the audience size.
+        """
+        if fmt not in AUDIENCE_FORMATS:
+            raise ValueError(f"Unknown audience format '{fmt}', expected one of {AUDIENCE_FORMATS}")
+        if orjson is not None:
+            return self._iter_json_orjson(indices, columns, fmt, chunk_size)
+        return self._iter_json_pandas(indices, columns, fmt, chunk_size)
+
+    def _iter_json_orjson(self, indices, columns, fmt, chunk_size):
+        starts = range(0, len(indices), chunk_size)
+        if fmt == 'columnar':
+            # Whole decoded columns go to orjson as lists, with no row objects at all
+            for column_number, column in enumerate(columns):
+                yield ('{' if column_number == 0 else '],') + json.dumps(column) + ':['
+                for i, start in enumerate(starts):
+                    values = self.column_values(column, indices[start:start + chunk_size])
+                    yield (',' if i else '') + orjson.dumps(values)[1:-1].decode()
+            yield ']}' if columns else '{}'
+            return
+
+        # Rows are spliced from per-column JSON fragments into a fixed template,
+        # so no per-row dict is built and each column is encoded in one pass
+        template = ('{' + ','.join(json.dumps(column).replace('%', '%%') + ':%b' for column in columns) + '}').encode()
+        separator = b',' if fmt == 'records' else b'\n'
+        if fmt == 'records':
+            yield '['
+        for i, start in enumerate(starts):
+            fragments = [self._json_fragments(column, indices[start:start + chunk_size]) for column in columns]
+            rows = separator.join([template % row for row in zip(*fragments)])
+            if fmt == 'records':
+                yield (',' if i else '') + rows.decode()
+            else:
+                yield (rows + b'\n').decode()
+        if fmt == 'records':
+            yield ']'
+
+    def _json_fragments(self, column, indices):
+        """Encoded JSON value of a column for each of the given rows."""
+        values = self.columns[column][indices]
+        if column in self.categories:
+            # Each category is encoded once; rows just pick theirs by code
+            encoded = self._encoded_categories.get(column)
+            if encoded is None:
+                encoded = np.array([orjson.dumps(c) for c in self.categories[column].tolist()], dtype=object)
+                self._encoded_categories[column] = encoded
+            return encoded[values]
+        if values.dtype.kind in 'iub' or values.dtype == np.float64:
+            # Numbers never contain commas, so one array encode splits cleanly
+            # (float32 is left to tolist(), whose widened repr the other writers emit)
+            return orjson.dumps(values, option=orjson.OPT_SERIALIZE_NUMPY)[1:-1].split(b',') if len(values) else []
+        return list(map(orjson.dumps, values.tolist()))
+
+    def _iter_json_pandas(self, indices, columns, fmt, chunk_size):
+        positions = [self.df.columns.get_loc(column) for column in columns]
+
+        def frames():
+            for start in range(0, len(indices), chunk_size):
+                yield self.df.iloc[indices[start:start + chunk_size], positions]
+
+        if fmt == 'ndjson':
+            for frame in frames():
+                yield frame.to_json(orient='records', lines=True, double_precision=15).rstrip('\n') + '\n'
+        elif fmt == 'records':
+            yield '['
+            for i, frame in enumerate(frames()):
+                # Strip the chunk's own brackets and splice it into one array
+                yield (',' if i else '') + frame.to_json(orient='records', double_precision=15)[1:-1]
+            yield ']'
+        else:
+            for column_number, column in enumerate(columns):
+                yield ('{' if column_number == 0 else '],') + json.dumps(column) + ':['
+                for i, frame in enumerate(frames()):
+                    chunk = frame.iloc[:, column_number].to_json(orient='values', double_precision=15)[1:-1]
+                    if chunk:
+                        yield (',' if i else '') + chunk
+            yield ']}' if columns else '{}'
+
+def normalize_definition(definition, table=None):
+    """
+    Validate an audience definition and return its canonical form.
+    A definition is either a predicate {'column', 'op', 'value'} or a group
+    {'all': [...]}, {'any': [...]} or {'not': definition}. Group members and
+    set values are sorted so equivalent definitions share a cache key.
+    With a table, each predicate's column, operator and value types are also
+    checked against that table's columns.
+    """
+    if not isinstance(definition, dict):
+        raise ValueError(f"Audience definition must be an object, got {definition!r}")
+
+    groups = [op for op in GROUP_OPS + ('not',) if op in definition]
+    if groups:
+        if len(definition) != 1:
+            raise ValueError(f"Group must have exactly one key, got {sorted(definition)}")
+        op = groups[0]
+        if op == 'not':
+            return {'not': normalize_definition(definition['not'], table)}
+        members = definition[op]
+        if not isinstance(members, list) or not members:
+            raise ValueError(f"'{op}' must be a non-empty list")
+        return {op: sorted((normalize_definition(m, table) for m in members), key=_definition_key)}
+
+    if set(definition) != {'column', 'op', 'value'}:
+        raise ValueError(f"Predicate needs 'column', 'op' and 'value', got {sorted(definition)}")
+    column, op, value = definition['column'], definition['op'], definition['value']
+    if op in COMPARISON_OPS:
+        if isinstance(value, (list, dict)):
+            raise ValueError(f"'{op}' expects a single value for {column}")
+    elif op in SET_OPS:
+        if not isinstance(value, list) or not value or any(isinstance(v, (list, dict)) for v in value):
+            raise ValueError(f"'{op}' expects a non-empty list of values for {column}")
+        value = sorted(set(value), key=repr)
+    elif op == 'between':
+        if not isinstance(value, list) or len(value) != 2:
+            raise ValueError(f"'between' expects [low, high] for {column}")
+    else:
+        raise ValueError(f"Unknown operator '{op}'")
+    if table is not None:
+        _check_predicate_types(table, column, op, value)
+    return {'column': column, 'op': op, 'value': value}
+
+def _check_predicate_types(table, column, op, value):
+    """Reject predicates whose operator or values don't fit the column's type."""
+    if column not in table.columns:
+        raise ValueError(f"Unknown column '{column}'")
+    values = value if isinstance(value, list) else [value]
+
+    if column in table.categories:
+        if not all(isinstance(v, str) for v in values):
+            raise ValueError(f"Column '{column}' holds text values, got {value!r}")
+        if op in SET_OPS or op in ('eq', 'ne'):
+            return
+        # Ordered comparisons only make sense for loyalty tiers
+        if column != 'loyalty_tier':
+            raise ValueError(f"Operator '{op}' is not supported for column '{column}'")
+        for tier in values:
+            if tier not in LOYALTY_TIER_ORDER:
+                raise ValueError(f"Unknown loyalty tier '{tier}'")
+    elif table.columns[column].dtype.kind in 'iufb':
+        # bool is an int subclass, but true/false is never a meaningful number here
+        if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+            raise ValueError(f"Column '{column}' is numeric, got {value!r}")
+    elif not all(isinstance(v, str) for v in values):
+        raise ValueError(f"Column '{column}' holds text values, got {value!r}")
+
+def _definition_key(definition):
+    return json.dumps(definition, sort_keys=True, default=str)
+
+def evaluate_definition(table, definition):
+    """Compile a normalized definition into vectorized mask operations on a table."""
+    if 'all' in definition:
+        mask = evaluate_definition(table, definition['all'][0])
+        for member in definition['all'][1:]:
+            mask = mask & evaluate_definition(table, member)
+        return mask
+    if 'any' in definition:
+        mask = evaluate_definition(table, definition['any'][0])
+        for member in definition['any'][1:]:
+            mask = mask | evaluate_definition(table, member)
+        return mask
+    if 'not' in definition:
+        return ~evaluate_definition(table, definition['not'])
+
+    # Column, operator and value types were checked by normalize_definition(definition, table)
+    column, op, value = definition['column'], definition['op'], definition['value']
+    if column in table.categories:
+        return _evaluate_categorical(table, column, op, value)
+
+    if op == 'eq' and column == 'has_q2_booking' and value in (0, 1):
+        return table.no_q2_booking if value == 0 else ~table.no_q2_booking
+    if op in ('lt', 'lte'):
+        return table.range_mask(column, high=value, high_inclusive=(op == 'lte'))
+    if op in ('gt', 'gte'):
+        return table.range_mask(column, low=value, low_inclusive=(op == 'gte'))
+    if op == 'between':
+        return table.range_mask(column, low=value[0], high=value[1], high_inclusive=True)
+    if op in SET_OPS:
+        mask = np.isin(table.columns[column], value)
+        return mask if op == 'in' else ~mask
+    return COMPARISON_OPS[op](table.columns[column], value)
+
+def _evaluate_categorical(table, column, op, value):
+    if op in ('eq', 'ne', 'in', 'not_in'):
+        mask = table.category_mask(column, value if op in SET_OPS else [value])
+        return mask if op in ('eq', 'in') else ~mask
+
+    # Ordered comparisons: loyalty tiers by rank
+    ranks = table.loyalty_ranks[table.columns[column]]
+    ranked = ranks >= 0
+    if op == 'between':
+        low, high = (LOYALTY_TIER_ORDER.index(t) for t in value)
+        return ranked & (ranks >= low) & (ranks <= high)
+    return ranked & COMPARISON_OPS[op](ranks, LOYALTY_TIER_ORDER.index(value))
+
+@dataclass
+class AudienceResult:
+    """Selected rows of one table version plus aggregates computed with them."""
+    table: TravelerTable
+    indices: np.ndarray
+    audience_count: int
+    potential_revenue: float
+    avg_spend: float
+    loyalty_tiers: dict
+
+    def records(self, columns=AUDIENCE_COLUMNS):
+        return self.table.records(self.indices, columns)
+
+    def iter_json(self, fmt='records', columns=AUDIENCE_COLUMNS):
+        return self.table.iter_json(self.indices, columns, fmt)
+
+    def stats(self):
+        return {
+            "audience_count": self.audience_count,
+            "potential_revenue": self.potential_revenue,
+            "avg_spend": self.avg_spend,
+            "loyalty_tiers": self.loyalty_tiers,
+        }
+
+class SnapshotNotFound(LookupError):
+    """Raised when a cursor refers to a snapshot that expired or was evicted."""
+
+@dataclass
+class AudienceSnapshot:
+    """A frozen audience result that cursor pages are served from."""
+    snapshot_id: str
+    result: AudienceResult
+    stats: dict
+    created_at: float
+    expires_at: float
+
+@dataclass
+class AudiencePage:
+    """One page of a snapshot plus the cursor for the next page (None at the end)."""
+    snapshot: AudienceSnapshot
+    offset: int
+    indices: np.ndarray
+    next_cursor: Optional[str]
+
+    def iter_json(self, fmt='records', columns=AUDIENCE_COLUMNS):
+        return self.snapshot.result.table.iter_json(self.indices, columns, fmt)
+
+def encode_cursor(snapshot_id, offset):
+    return base64.urlsafe_b64encode(f"{snapshot_id}:{offset}".encode()).decode()
+
+def decode_cursor(cursor):
+    """Return (snapshot_id, offset) for a cursor, raising ValueError if malformed."""
+    try:
+        snapshot_id, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Malformed cursor")
+    if offset < 0:
+        raise ValueError("Malformed cursor")
+    return snapshot_id, offset
+
+class SnapshotStore:
+    """
+    Server-side audience snapshots, so every page of a cursor comes from the
+    same result. Snapshots expire ttl_seconds after their last access and the
+    least recently used one is evicted beyond max_snapshots.
+    """
+
+    def __init__(self, ttl_seconds=600, max_snapshots=32):
+        self.ttl_seconds = ttl_seconds
+        self.max_snapshots = max_snapshots
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, result, stats):
+        now = time.time()
+        snapshot = AudienceSnapshot(
+            snapshot_id=uuid.uuid4().hex,
+            result=result,
+            stats=stats,
+            created_at=now,
+            expires_at=now + self.ttl_seconds,
+        )
+        with self._lock:
+            self._purge_expired(now)
+            self._snapshots[snapshot.snapshot_id] = snapshot
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot
+
+    def get(self, snapshot_id):
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            snapshot = self._snapshots.get(snapshot_id)
+            if snapshot is None:
+                raise SnapshotNotFound(f"Audience snapshot {snapshot_id} expired or does not exist")
+            snapshot.expires_at = now + self.ttl_seconds
+            self._snapshots.move_to_end(snapshot_id)
+            return snapshot
+
+    def _purge_expired(self, now):
+        for snapshot_id in [k for k, v in self._snapshots.items() if v.expires_at <= now]:
+            del self._snapshots[snapshot_id]
+
+class TravelerStore:
+    """In-memory traveler table that re-reads the CSV only when its mtime or size changes."""
+
+    def __init__(self, data_path):
+        self.data_path = data_path
+        self._table = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Return the current TravelerTable, reloading if the file changed."""
+        stat = os.stat(self.data_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        table = self._table
+        if table is None or table.version != version:
+            with self._lock:
+                table = self._table
+                if table is None or table.version != version:
+                    df = pd.read_csv(self.data_path, dtype={c: 'category' for c in CATEGORICAL_COLUMNS})
+                    table = TravelerTable(df, version)
+                    self._table = table
+        return table
+
 class CDPService:
-    def __init__(self, data_path='traveler_data.csv'):
+    def __init__(self, data_path='traveler_data.csv', audience_cache_bytes=None):
         self.data_path = data_path
-        self.df = pd.read_csv(data_path)
+        # Loaded on first query rather than at API import time
+        self.store = TravelerStore(data_path)
+        # LRU of AudienceResult keyed by (normalized definition, table version), bounded by
+        # the total size of the cached index arrays
+        self.audience_cache_bytes = (audience_cache_bytes if audience_cache_bytes is not None
+                                     else int(os.getenv('AUDIENCE_CACHE_MAX_BYTES', 64 * 2**20)))
+        self._audience_cache = OrderedDict()
+        self._audience_cache_used = 0
+        self._cache_lock = threading.Lock()
+        self.snapshots = SnapshotStore()
+        # Pool behind the *_async methods; loads and large queries don't hold API threads
+        self.executor = BoundedExecutor('audience', int(os.getenv('AUDIENCE_WORKERS', 4)))
+
+    @property
+    def df(self):
+        return self.store.get().df
+
+    def query_audience(self, definition):
+        """
+        Evaluate a declarative audience definition (see normalize_definition).
+        Results are cached per normalized definition and dataset version.
+        Raises ValueError for invalid definitions.
+        """
+        table = self.store.get()
+        definition = normalize_definition(definition, table)
+        key = (_definition_key(definition), table.version)
+
+        with self._cache_lock:
+            result = self._audience_cache.get(key)
+            if result is not None:
+                self._audience_cache.move_to_end(key)
+                return result
+
+        indices = np.flatnonzero(evaluate_definition(table, definition))
+        spend = table.columns['avg_spend'][indices]
+        tier_codes = table.columns['loyalty_tier'][indices]
+        tier_counts = np.bincount(tier_codes[tier_codes >= 0], minlength=len(table.categories['loyalty_tier']) - 1)
+        result = AudienceResult(
+            table=table,
+            indices=indices,
+            audience_count=len(indices),
+            potential_revenue=spend.sum().item(),
+            avg_spend=float(spend.mean()) if len(indices) else 0.0,
+            loyalty_tiers={
+                tier: int(count)
+                for tier, count in zip(table.categories['loyalty_tier'][:-1], tier_counts) if count
+            },
+        )
+
+        if result.indices.nbytes > self.audience_cache_bytes:
+            return result
+        with self._cache_lock:
+            # Results for older versions of the file can never be hit again
+            for stale_key in [k for k in self._audience_cache if k[1] != table.version]:
+                self._audience_cache_used -= self._audience_cache.pop(stale_key).indices.nbytes
+            previous = self._audience_cache.pop(key, None)
+            if previous is not None:
+                self._audience_cache_used -= previous.indices.nbytes
+            self._audience_cache[key] = result
+            self._audience_cache_used += result.indices.nbytes
+            while self._audience_cache_used > self.audience_cache_bytes:
+                _, evicted = self._audience_cache.popitem(last=False)
+                self._audience_cache_used -= evicted.indices.nbytes
+        return result
+
+    async def query_audience_async(self, definition):
+        return await self.executor.run(self.query_audience, definition)
 
     def get_at_risk_business_travelers(self):
         """
@@ -13,34 +547,41 @@ class CDPService:
         2. distance_miles < 200
         3. has_q2_booking == 0
         """
-        # Reload data to ensure freshness if modified
-        self.df = pd.read_csv(self.data_path)
-        
-        filtered_df = self.df[
-            (self.df['travel_purpose'] == 'Business') &
-            (self.df['distance_miles'] < 200) &
-            (self.df['has_q2_booking'] == 0)
-        ]
-        
-        results = []
-        for _, row in filtered_df.iterrows():
-            results.append({
-                "email": row['email'],
-                "loyalty_tier": row['loyalty_tier'],
-                "home_city": row['home_city'],
-                "distance_miles": row['distance_miles'],
-                "last_stay_days_ago": row['last_stay_days_ago'],
-                "avg_spend": row['avg_spend']
-            })
-            
-        return results
+        # The store reloads automatically if the file was modified
+        return self.query_audience(Q2_BUSINESS_LOCAL).records()
 
     def get_audience_stats(self):
-        at_risk = self.get_at_risk_business_travelers()
-        total_potential_revenue = sum([p['avg_spend'] for p in at_risk])
+        return self._q2_stats(self.query_audience(Q2_BUSINESS_LOCAL))
+
+    def create_audience_snapshot(self, definition=None):
+        """Freeze an audience (the Q2 Business Local one by default) for cursor paging."""
+        if definition is None:
+            result = self.query_audience(Q2_BUSINESS_LOCAL)
+            stats = self._q2_stats(result)
+        else:
+            result = self.query_audience(definition)
+            stats = result.stats()
+        return self.snapshots.create(result, stats)
+
+    async def create_audience_snapshot_async(self, definition=None):
+        return await self.executor.run(self.create_audience_snapshot, definition)
+
+    def get_audience_page(self, snapshot, offset=0, limit=500):
+        """Slice a page of up to limit travelers out of a snapshot."""
+        indices = snapshot.result.indices[offset:offset + limit]
+        end = offset + len(indices)
+        next_cursor = encode_cursor(snapshot.snapshot_id, end) if end < snapshot.result.audience_count else None
+        return AudiencePage(snapshot=snapshot, offset=offset, indices=indices, next_cursor=next_cursor)
+
+    def get_audience_page_by_cursor(self, cursor, limit=500):
+        """Resume paging from a cursor. Raises ValueError or SnapshotNotFound."""
+        snapshot_id, offset = decode_cursor(cursor)
+        return self.get_audience_page(self.snapshots.get(snapshot_id), offset, limit)
+
+    def _q2_stats(self, result):
         return {
-            "audience_count": len(at_risk),
-            "potential_revenue": total_potential_revenue,
+            "audience_count": result.audience_count,
+            "potential_revenue": result.potential_revenue,
             "segments": ["Business", "Local"],
             "criteria": "Business Travelers < 200 miles without Q2 Booking"
         }
@@ -1,31 +1,174 @@
+import os
+import random
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rate_limit import TokenBucket
+
+class SimulatedEmailProvider:
+    """Accepts every message instantly. Used when no provider URL is configured."""
+
+    def send_batch(self, messages):
+        now = time.time()
+        return [{"email": m["email"], "status": "sent", "timestamp": now} for m in messages]
+
+class HttpEmailProvider:
+    """
+    Posts batches to an HTTP email API (or the local sink in fake_servers.py).
+    Request body: {"messages": [{"email", "subject", "body"}, ...]}
+    Response body: {"results": [{"email", "status", "error"?}, ...]}
+    """
+
+    def __init__(self, url, pool_size=16, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def send_batch(self, messages):
+        response = self.session.post(self.url, json={"messages": messages}, timeout=self.timeout)
+        response.raise_for_status()
+        now = time.time()
+        results = response.json()["results"]
+        for result in results:
+            result.setdefault("timestamp", now)
+        return results
+
+class DeliveryEngine:
+    """
+    Delivers a campaign through a provider with a bounded worker pool,
+    token-bucket rate limiting, batched provider calls and per-recipient
+    retries with exponential backoff.
+    """
+
+    def __init__(self, provider, max_workers=8, batch_size=100, rate_per_second=None,
+                 max_retries=3, backoff_seconds=0.5):
+        self.provider = provider
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.rate_limiter = TokenBucket(rate_per_second, max(rate_per_second, batch_size)) if rate_per_second else None
+
+    def _send_with_retries(self, messages):
+        """Send one batch, retrying only the recipients that failed. Returns final results."""
+        final = []
+        pending = messages
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire(len(pending))
+            try:
+                results = self.provider.send_batch(pending)
+            except Exception as e:
+                # Whole-batch failure (timeout, 5xx...): every recipient is retried
+                results = [{"email": m["email"], "status": "failed", "error": str(e)} for m in pending]
+
+            by_email = {r["email"]: r for r in results}
+            retry = []
+            for message in pending:
+                result = by_email.get(message["email"], {"email": message["email"], "status": "failed", "error": "missing result"})
+                if result["status"] == "sent" or attempt == self.max_retries:
+                    result["attempts"] = attempt + 1
+                    final.append(result)
+                else:
+                    retry.append(message)
+            if not retry:
+                break
+            pending = retry
+            time.sleep(self.backoff_seconds * (2 ** attempt) * (0.5 + random.random()))
+        return final
+
+    def deliver(self, recipients, subject, body, on_result=None):
+        """
+        Deliver to all recipients. on_result(result) is called for every final
+        per-recipient result as batches complete. Returns (sent_count, failed_count).
+        """
+        sent = 0
+        failed = 0
+
+        def batches():
+            for start in range(0, len(recipients), self.batch_size):
+                yield [
+                    {"email": r["email"], "subject": subject, "body": body}
+                    for r in recipients[start:start + self.batch_size]
+                ]
+
+        # Keep a bounded number of batches in flight so memory stays flat
+        max_in_flight = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = set()
+            batch_iter = batches()
+            exhausted = False
+            while in_flight or not exhausted:
+                while not exhausted and len(in_flight) < max_in_flight:
+                    batch = next(batch_iter, None)
+                    if batch is None:
+                        exhausted = True
+                    else:
+                        in_flight.add(executor.submit(self._send_with_retries, batch))
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        if result["status"] == "sent":
+                            sent += 1
+                        else:
+                            failed += 1
+                        if on_result:
+                            on_result(result)
+        return sent, failed
 
 class EmailService:
-    def __init__(self):
-        pass
+    def __init__(self, provider=None, max_workers=8, batch_size=100, rate_per_second=None, max_retries=3):
+        if provider is None:
+            # EMAIL_PROVIDER_URL points at a real batch API or the local sink
+            provider_url = os.getenv('EMAIL_PROVIDER_URL')
+            provider = HttpEmailProvider(provider_url, pool_size=max_workers) if provider_url else SimulatedEmailProvider()
+        if rate_per_second is None and os.getenv('EMAIL_RATE_PER_SECOND'):
+            rate_per_second = float(os.getenv('EMAIL_RATE_PER_SECOND'))
+        self.engine = DeliveryEngine(
+            provider,
+            max_workers=max_workers,
+            batch_size=batch_size,
+            rate_per_second=rate_per_second,
+            max_retries=max_retries,
+        )
 
-    def send_campaign(self, recipients, subject, body):
+    def send_campaign(self, recipients, subject, body, include_details=True):
         """
-        Simulate sending emails to a list of recipients.
-        In a real app, this would use SMTP or an API like SendGrid.
+        Send a campaign through the delivery engine.
+        With include_details=False only failed recipients are kept in the
+        response, so its size doesn't grow with the audience.
         """
-        results = []
         print(f"📧 STARTING CAMPAIGN: {subject}")
         print(f"👥 Recipients: {len(recipients)}")
-        
-        for recipient in recipients:
-            # Simulate network delay
-            # time.sleep(0.1) 
-            print(f"   -> Sending to {recipient['email']}...")
-            results.append({
-                "email": recipient['email'],
-                "status": "sent",
-                "timestamp": time.time()
-            })
-            
-        print("✅ CAMPAIGN COMPLETE")
-        return {
-            "sent_count": len(results),
-            "status": "completed",
-            "details": results
+
+        details = []
+        failures = []
+
+        def collect(result):
+            if include_details:
+                details.append(result)
+            elif result["status"] != "sent":
+                failures.append(result)
+
+        start = time.time()
+        sent, failed = self.engine.deliver(recipients, subject, body, on_result=collect)
+        duration = time.time() - start
+
+        print(f"✅ CAMPAIGN COMPLETE: {sent} sent, {failed} failed in {duration:.2f}s")
+        response = {
+            "sent_count": sent,
+            "failed_count": failed,
+            "status": "completed" if not failed else "completed_with_errors",
+            "duration_seconds": round(duration, 3),
         }
+        if include_details:
+            response["details"] = details
+        else:
+            response["failures"] = failures
+        return response
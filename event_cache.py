@@ -0,0 +1,176 @@
+"""TTL cache for provider event lookups.
+
+Entries are fresh for their TTL and can then be served stale for a grace
+window while the caller refreshes them in the background. An optional SQLite
+file adds a second tier shared by every API worker on the host.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+STALE = 'stale'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS event_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    stale_until REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+    stale_until: float
+
+
+class EventCache:
+    """
+    In-memory LRU with per-entry TTL, stale-while-revalidate and an optional
+    SQLite tier. Values must be JSON-serializable when db_path is set.
+    """
+
+    def __init__(self, ttl: float = 3600, negative_ttl: float = 300, stale_ttl: float = 600,
+                 max_entries: int = 2000, db_path: Optional[str] = None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._revalidating = set()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._metrics = {'hits': 0, 'stale_hits': 0, 'disk_hits': 0, 'misses': 0,
+                         'evictions': 0, 'revalidations': 0, 'disk_errors': 0}
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            if not self._schema_ready:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(SCHEMA)
+                self._schema_ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """Return (value, FRESH or STALE), or (None, None) on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now >= entry.stale_until:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        # A stale memory entry may have been refreshed on disk by another worker
+        if (entry is None or now >= entry.expires_at) and self.db_path:
+            stored = self._disk_get(key, now)
+            if stored is not None and (entry is None or stored.expires_at > entry.expires_at):
+                entry = stored
+                with self._lock:
+                    self._metrics['disk_hits'] += 1
+                    self._store(key, entry)
+
+        with self._lock:
+            if entry is None:
+                self._metrics['misses'] += 1
+                return None, None
+            if now < entry.expires_at:
+                self._metrics['hits'] += 1
+                return entry.value, FRESH
+            self._metrics['stale_hits'] += 1
+            return entry.value, STALE
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Cache a value for ttl seconds (default self.ttl), then stale for stale_ttl more."""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        entry = CacheEntry(value, now + ttl, now + ttl + self.stale_ttl)
+        with self._lock:
+            self._store(key, entry)
+        if self.db_path:
+            # The in-memory entry still serves this worker if the shared tier is locked or unwritable
+            try:
+                with self._connect() as conn:
+                    conn.execute('INSERT OR REPLACE INTO event_cache VALUES (?, ?, ?, ?)',
+                                 (key, json.dumps(value), entry.expires_at, entry.stale_until))
+            except sqlite3.Error as e:
+                with self._lock:
+                    self._metrics['disk_errors'] += 1
+                logger.warning(f"Event cache write of {key} to {self.db_path} failed: {e}")
+
+    def expires_at(self, key: str) -> Optional[float]:
+        """When the key's entry stops being fresh, or None if it isn't cached. Not counted in metrics."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None and self.db_path:
+            entry = self._disk_get(key, time.time())
+        return entry.expires_at if entry is not None else None
+
+    def start_revalidation(self, key: str) -> bool:
+        """Claim a stale key for refreshing. False if another caller already has it."""
+        with self._lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+            self._metrics['revalidations'] += 1
+            return True
+
+    def finish_revalidation(self, key: str) -> None:
+        with self._lock:
+            self._revalidating.discard(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._metrics)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 4) if lookups else None
+        return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute('DELETE FROM event_cache')
+
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        # Caller holds self._lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._metrics['evictions'] += 1
+
+    def _disk_get(self, key: str, now: float) -> Optional[CacheEntry]:
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT value, expires_at, stale_until FROM event_cache WHERE key = ?',
+                                   (key,)).fetchone()
+        except sqlite3.Error:
+            with self._lock:
+                self._metrics['disk_errors'] += 1
+            return None
+        if row is None or now >= row[2]:
+            return None
+        return CacheEntry(json.loads(row[0]), row[1], row[2])
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Background prefetching of event data for top markets.
+
+PrefetchScheduler keeps a rolling horizon of city-days warm in the event
+cache so user-facing lookups rarely pay provider latency. Each sweep refreshes
+days that are missing or about to expire, in windows (one provider query each),
+nearest dates and most requested cities first, under a provider rate limit.
+
+It runs inside the API process (unless EVENT_PREFETCH=0) or standalone,
+sharing the SQLite cache tier with the API workers via EVENT_CACHE_DB:
+    EVENT_CACHE_DB=events.db python3 event_prefetch.py --cities "New York" Boston
+"""
+
+import argparse
+import logging
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from event_service import EventService
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchScheduler:
+    """
+    Refreshes configured cities, plus the most requested ones, across a
+    rolling horizon. rate_per_second limits provider calls (two per window).
+    """
+
+    def __init__(self, event_service: EventService, cities: Optional[List[str]] = None,
+                 horizon_days: int = 30, interval_seconds: float = 60, rate_per_second: float = 5,
+                 top_requested: int = 10, window_days: int = 14):
+        self.event_service = event_service
+        self.cities = list(cities or [])
+        self.horizon_days = horizon_days
+        self.interval_seconds = interval_seconds
+        self.top_requested = top_requested
+        self.window_days = window_days
+        self.rate_limiter = TokenBucket(rate_per_second, max(rate_per_second, 2))
+        self.started_at = time.time()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._metrics = {'sweeps': 0, 'windows_fetched': 0, 'errors': 0,
+                         'last_sweep_seconds': None, 'last_sweep_at': None}
+
+    @classmethod
+    def from_env(cls, event_service: EventService) -> 'PrefetchScheduler':
+        cities = [c.strip() for c in os.getenv('EVENT_PREFETCH_CITIES', '').split(',') if c.strip()]
+        return cls(
+            event_service,
+            cities=cities,
+            horizon_days=int(os.getenv('EVENT_PREFETCH_HORIZON_DAYS', 30)),
+            interval_seconds=float(os.getenv('EVENT_PREFETCH_INTERVAL_SECONDS', 60)),
+            rate_per_second=float(os.getenv('EVENT_PREFETCH_RATE', 5)),
+        )
+
+    def target_cities(self) -> Dict[str, int]:
+        """Cities to keep warm, with their observed request counts."""
+        counts = self.event_service.request_counts
+        targets = {city: counts.get(city, 0) for city in self.cities}
+        for city, count in self.event_service.most_requested(self.top_requested):
+            targets.setdefault(city, count)
+        return targets
+
+    def plan(self) -> List[Tuple[float, str, date, date]]:
+        """
+        Windows to refresh as (priority, city, start, end), highest priority
+        first. A day needs refreshing when it is missing or expires before the
+        next sweep plus one more interval of slack.
+        """
+        cache = self.event_service.cache
+        refresh_before = time.time() + 2 * self.interval_seconds
+        today = date.today()
+
+        windows = []
+        for city, requests in self.target_cities().items():
+            run_start = None
+            for offset in range(self.horizon_days + 1):
+                day = today + timedelta(days=offset)
+                stale = offset < self.horizon_days and (
+                    (cache.expires_at(self.event_service._cache_key(city, day.isoformat())) or 0) < refresh_before
+                )
+                if stale and run_start is None:
+                    run_start = offset
+                # Close a window at the first fresh day, the horizon end or the window size
+                if run_start is not None and (not stale or offset - run_start == self.window_days):
+                    # Near dates and busy cities first
+                    priority = (1 + requests) / (1 + run_start / 7)
+                    windows.append((priority, city, today + timedelta(days=run_start),
+                                    today + timedelta(days=offset - 1)))
+                    run_start = offset if stale else None
+        windows.sort(key=lambda window: -window[0])
+        return windows
+
+    def run_once(self) -> int:
+        """Run one sweep. Returns the number of windows refreshed."""
+        started = time.perf_counter()
+        fetched = 0
+        for _, city, start, end in self.plan():
+            if self._stop.is_set():
+                break
+            self.rate_limiter.acquire(2)  # one query per provider
+            try:
+                self.event_service.refresh_days(city, start, end)
+                fetched += 1
+            except Exception as e:
+                self._metrics['errors'] += 1
+                logger.warning(f"Prefetch of {city} {start}..{end} failed: {e}")
+        self._metrics['sweeps'] += 1
+        self._metrics['windows_fetched'] += fetched
+        self._metrics['last_sweep_seconds'] = round(time.perf_counter() - started, 3)
+        self._metrics['last_sweep_at'] = time.time()
+        return fetched
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, daemon=True, name='event-prefetch')
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread = None
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Prefetch sweep failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def stats(self) -> Dict:
+        """
+        Sweep counters plus coverage of the horizon. lag_seconds is how long the
+        most overdue target city-day has been expired (or missing, counted from
+        scheduler start); 0 means every target is fresh.
+        """
+        cache = self.event_service.cache
+        now = time.time()
+        today = date.today()
+        targets = self.target_cities()
+        fresh = 0
+        lag = 0.0
+        for city in targets:
+            for offset in range(self.horizon_days):
+                key = self.event_service._cache_key(city, (today + timedelta(days=offset)).isoformat())
+                expires_at = cache.expires_at(key)
+                if expires_at is not None and expires_at > now:
+                    fresh += 1
+                else:
+                    lag = max(lag, now - (expires_at or self.started_at))
+        total = len(targets) * self.horizon_days
+        return {
+            **self._metrics,
+            "cities": list(targets),
+            "horizon_days": self.horizon_days,
+            "target_days": total,
+            "fresh_days": fresh,
+            "coverage": round(fresh / total, 4) if total else None,
+            "lag_seconds": round(lag, 3),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cities", nargs="+", required=True)
+    parser.add_argument("--horizon-days", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=60, help="Seconds between sweeps")
+    parser.add_argument("--rate", type=float, default=5, help="Provider calls per second")
+    args = parser.parse_args()
+
+    if not os.getenv('EVENT_CACHE_DB'):
+        logger.warning("EVENT_CACHE_DB is not set; prefetched events stay in this process only")
+    scheduler = PrefetchScheduler(EventService(), args.cities, args.horizon_days, args.interval, args.rate)
+    try:
+        while True:
+            fetched = scheduler.run_once()
+            stats = scheduler.stats()
+            logger.info(f"Sweep refreshed {fetched} windows; coverage {stats['coverage']}, lag {stats['lag_seconds']}s")
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
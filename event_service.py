@@ -5,18 +5,33 @@ and calculate dynamic pricing adjustments based on event impact.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 import os
-from functools import lru_cache
+
+import numpy as np
+
+from event_cache import STALE, EventCache
+from executors import BoundedExecutor
+from fast_json import dumps
+from single_flight import SingleFlight
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Page sizes and a safety cap for windowed provider queries
+TICKETMASTER_PAGE_SIZE = 200  # API maximum
+MAX_PROVIDER_PAGES = 20
+
 class EventImpact(Enum):
     """Event impact levels for pricing adjustments."""
     LOW = "low"
@@ -36,6 +51,17 @@ class Event:
     impact_level: EventImpact
     distance_km: float
 
+# Demand uplift contributed by one event of each impact level
+IMPACT_WEIGHTS = {
+    EventImpact.LOW: 0.05,
+    EventImpact.MEDIUM: 0.15,
+    EventImpact.HIGH: 0.35,
+    EventImpact.CRITICAL: 0.75
+}
+IMPACT_LEVELS = list(EventImpact)  # ordered by weight
+LEVEL_WEIGHTS = np.array([IMPACT_WEIGHTS[level] for level in IMPACT_LEVELS])
+HIGH_IMPACT_LEVELS = [IMPACT_LEVELS.index(EventImpact.HIGH), IMPACT_LEVELS.index(EventImpact.CRITICAL)]
+
 @dataclass
 class PricingAdjustment:
     """Data class for pricing adjustment recommendations."""
@@ -45,86 +71,276 @@ class PricingAdjustment:
     peak_event_date: Optional[datetime]
     confidence_score: float
 
+class ImpactCalendar:
+    """
+    Daily event impact for one city, stored as per-level event counts with
+    prefix sums. The pricing inputs for any stay inside the calendar (summed
+    impact, high-impact count, event count and peak event) are a constant-time
+    range query, independent of how many events the stay overlaps.
+    """
+
+    def __init__(self, city: str, start_date: date, days_events: List[List[Event]]):
+        self.city = city
+        self.start_date = start_date
+        self.days = len(days_events)
+        self.built_at = time.time()
+
+        n_levels = len(IMPACT_LEVELS)
+        level_index = {level: i for i, level in enumerate(IMPACT_LEVELS)}
+        counts = np.zeros((n_levels, self.days), dtype=np.int64)
+        # First event date per (level, day), for the peak event lookup
+        self.first_dates = np.empty((n_levels, self.days), dtype=object)
+        for day, events in enumerate(days_events):
+            for event in events:
+                level = level_index[event.impact_level]
+                if counts[level, day] == 0:
+                    self.first_dates[level, day] = event.date
+                counts[level, day] += 1
+
+        self.counts = counts
+        self.cum_counts = np.zeros((n_levels, self.days + 1), dtype=np.int64)
+        np.cumsum(counts, axis=1, out=self.cum_counts[:, 1:])
+        # next_day[level, i]: first day >= i with an event of that level (self.days if none)
+        self.next_day = np.full((n_levels, self.days + 1), self.days, dtype=np.int64)
+        positions = np.arange(self.days)
+        for level in range(n_levels):
+            event_days = np.append(np.flatnonzero(counts[level]), self.days)
+            self.next_day[level, :self.days] = event_days[np.searchsorted(event_days, positions)]
+
+    @property
+    def end_date(self) -> date:
+        return self.start_date + timedelta(days=self.days - 1)
+
+    def covers(self, start: date, end: date) -> bool:
+        return self.start_date <= start and end <= self.end_date
+
+    def stay_stats(self, start: date, end: date) -> Tuple[float, int, int, Optional[datetime]]:
+        """(total impact, high-impact events, events, peak event date) for days start..end inclusive."""
+        first = (start - self.start_date).days
+        last = (end - self.start_date).days
+        level_counts = self.cum_counts[:, last + 1] - self.cum_counts[:, first]
+        total_impact = float(LEVEL_WEIGHTS @ level_counts)
+        peak_date = None
+        present = np.flatnonzero(level_counts)
+        if len(present):
+            # Earliest event of the highest level present
+            level = present[-1]
+            peak_date = self.first_dates[level, self.next_day[level, first]]
+        return total_impact, int(level_counts[HIGH_IMPACT_LEVELS].sum()), int(level_counts.sum()), peak_date
+
+    def stay_multipliers(self, start: date, check_ins: int, lengths_of_stay: List[int]) -> np.ndarray:
+        """
+        Pricing multipliers for every check-in from start (check_ins days) and
+        length of stay, as a (check_ins, len(lengths_of_stay)) array. Each column
+        is one vectorized sliding-window difference over the prefix counts.
+        """
+        first = (start - self.start_date).days
+        starts = np.arange(first, first + check_ins)
+        multipliers = np.empty((check_ins, len(lengths_of_stay)))
+        for column, nights in enumerate(lengths_of_stay):
+            # A stay covers check-in through check-out day inclusive, as in calculate_pricing_adjustment
+            level_counts = self.cum_counts[:, starts + nights + 1] - self.cum_counts[:, starts]
+            multipliers[:, column] = np.minimum(1.0 + LEVEL_WEIGHTS @ level_counts, 3.0)
+        return multipliers
+
+@dataclass
+class PricingGrid:
+    """Multipliers for cities x check-in dates x lengths of stay."""
+    cities: List[str]
+    start_date: date
+    lengths_of_stay: List[int]
+    multipliers: np.ndarray  # (cities, check-in dates, lengths of stay)
+
+    @property
+    def check_in_dates(self) -> List[str]:
+        return [(self.start_date + timedelta(days=i)).isoformat() for i in range(self.multipliers.shape[1])]
+
+    def adjusted_rates(self, base_rates: List[float]) -> np.ndarray:
+        """(cities, check-in dates, lengths of stay, base rates) array of adjusted rates."""
+        return np.round(self.multipliers[..., np.newaxis] * np.asarray(base_rates, dtype=float), 2)
+
+    def columnar(self, base_rates: Optional[List[float]] = None) -> Dict:
+        grid = {
+            "cities": self.cities,
+            "check_in_dates": self.check_in_dates,
+            "lengths_of_stay": self.lengths_of_stay,
+            "multipliers": np.round(self.multipliers, 3).tolist(),
+        }
+        if base_rates:
+            grid["base_rates"] = base_rates
+            grid["adjusted_rates"] = self.adjusted_rates(base_rates).tolist()
+        return grid
+
+    def iter_ndjson(self, base_rates: Optional[List[float]] = None) -> Iterator[bytes]:
+        """One line per city and check-in date, one city at a time."""
+        dates = self.check_in_dates
+        for c, city in enumerate(self.cities):
+            multipliers = np.round(self.multipliers[c], 3).tolist()
+            rates = np.round(self.multipliers[c][..., np.newaxis] * np.asarray(base_rates, dtype=float), 2).tolist() if base_rates else None
+            lines = []
+            for d, check_in in enumerate(dates):
+                row = {"city": city, "check_in_date": check_in, "multipliers": multipliers[d]}
+                if rates is not None:
+                    row["adjusted_rates"] = rates[d]
+                lines.append(dumps(row))
+            yield b"\n".join(lines) + b"\n"
+
 class EventService:
     """Service for fetching and analyzing local events data."""
     
-    def __init__(self):
-        """Initialize the Event Service with API configuration."""
+    def __init__(self, max_concurrency: Optional[int] = None, fetch_deadline: Optional[float] = None,
+                 request_timeout: float = 10):
+        """
+        Initialize the Event Service with API configuration.
+
+        max_concurrency caps in-flight provider calls across all requests
+        (EVENT_FETCH_CONCURRENCY); fetch_deadline bounds how long one lookup
+        waits for providers before falling back (EVENT_FETCH_DEADLINE).
+        The *_async methods run lookups on their own bounded pool
+        (EVENT_REQUEST_WORKERS), so slow providers only tie up that pool.
+        Set EVENT_CACHE_DB to share cached events across workers through SQLite.
+        """
         # In production, use environment variables for API keys
         self.ticketmaster_api_key = os.getenv('TICKETMASTER_API_KEY', 'demo_key')
         self.eventbrite_api_key = os.getenv('EVENTBRITE_API_KEY', 'demo_key')
-        self.base_url_ticketmaster = "https://app.ticketmaster.com/discovery/v2/events"
-        self.base_url_eventbrite = "https://www.eventbriteapi.com/v3/events/search/"
+        # Overridable so the fake provider in fake_servers.py can stand in
+        self.base_url_ticketmaster = os.getenv('TICKETMASTER_API_URL', "https://app.ticketmaster.com/discovery/v2/events")
+        self.base_url_eventbrite = os.getenv('EVENTBRITE_API_URL', "https://www.eventbriteapi.com/v3/events/search/")
         
-        # Cache for API responses to avoid rate limiting
+        # Cache for API responses to avoid rate limiting, one entry per city-day.
+        # Empty days and mock fallbacks are kept for a shorter time than real events.
         self._cache_duration = 3600  # 1 hour
+        self._negative_cache_duration = 300
+        self.cache = EventCache(
+            ttl=self._cache_duration,
+            negative_ttl=self._negative_cache_duration,
+            db_path=os.getenv('EVENT_CACHE_DB')
+        )
+
+        self.max_concurrency = max_concurrency or int(os.getenv('EVENT_FETCH_CONCURRENCY', 16))
+        self.fetch_deadline = fetch_deadline or float(os.getenv('EVENT_FETCH_DEADLINE', 15))
+        self.request_timeout = request_timeout
+
+        # One keep-alive session shared by all provider calls
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Provider calls run on a bounded pool: the global concurrency cap
+        self._provider_executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='event-provider')
+        # Stale cache entries are refreshed off the request path
+        self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='event-refresh')
+        # Calendars for multi-city pricing grids and background calendar builds, shared by all requests
+        self._calendar_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='pricing-grid')
+        # Async callers' lookups, isolated from the API's other work
+        self.executor = BoundedExecutor('event-request', int(os.getenv('EVENT_REQUEST_WORKERS', 32)))
+
+        # Per-city impact calendars over [today, today + horizon), rebuilt from the cache. Kept for
+        # the max_calendars most recently used cities; the default keeps all of their days in the event cache
+        self.calendar_horizon_days = int(os.getenv('EVENT_CALENDAR_HORIZON_DAYS', 120))
+        self.calendar_refresh_seconds = float(os.getenv('EVENT_CALENDAR_REFRESH_SECONDS', 300))
+        self.max_calendars = int(os.getenv('EVENT_MAX_CALENDARS', 16))
+        self._calendars: "OrderedDict[str, ImpactCalendar]" = OrderedDict()
+        self._calendar_builds = set()
+        self._calendar_lock = threading.Lock()
+
+        # Concurrent identical day fetches, calendar builds and stay pricings share one computation
+        self.flights = SingleFlight()
+
+        # Lookups per city from user-facing calls, used to prioritize prefetching.
+        # Halved whenever more than max_tracked_cities are tracked, so old traffic fades
+        self.request_counts: Counter = Counter()
+        self.max_tracked_cities = int(os.getenv('EVENT_MAX_TRACKED_CITIES', 1000))
+        self._request_lock = threading.Lock()
+        self._calendar_stop = threading.Event()
+        self._calendar_refresher: Optional[threading.Thread] = None
         
-    @lru_cache(maxsize=100)
     def _get_cached_events(self, city: str, date_str: str) -> List[Dict]:
         """Get cached events data to avoid excessive API calls."""
-        return self._fetch_events_from_apis(city, date_str)
+        day = datetime.strptime(date_str, '%Y-%m-%d')
+        return self._fetch_days(city, day, day)[0]
+
+    @staticmethod
+    def _cache_key(city: str, date_str: str) -> str:
+        return f"{city}:{date_str}"
     
-    def _fetch_events_from_apis(self, city: str, date_str: str) -> List[Dict]:
-        """Fetch events from multiple APIs with error handling."""
+    def _fetch_events_from_apis(self, city: str, start_date_str: str, end_date_str: str) -> Tuple[List[Dict], bool]:
+        """
+        Fetch events between two dates (inclusive) from multiple APIs in parallel with error handling.
+        Returns (events, live) where live means at least one configured provider answered.
+        """
         events = []
+        live = False
         
-        try:
-            # Fetch from Ticketmaster (concerts, sports, theater)
-            ticketmaster_events = self._fetch_ticketmaster_events(city, date_str)
-            events.extend(ticketmaster_events)
-        except Exception as e:
-            logger.warning(f"Failed to fetch Ticketmaster events: {e}")
-            
-        try:
-            # Fetch from Eventbrite (local events, conferences)
-            eventbrite_events = self._fetch_eventbrite_events(city, date_str)
-            events.extend(eventbrite_events)
-        except Exception as e:
-            logger.warning(f"Failed to fetch Eventbrite events: {e}")
-            
-        # If APIs fail, return mock data for demo purposes
-        if not events:
-            events = self._get_mock_events(city, date_str)
+        providers = [
+            ('Ticketmaster', self._fetch_ticketmaster_events),  # concerts, sports, theater
+            ('Eventbrite', self._fetch_eventbrite_events),  # local events, conferences
+        ]
+        futures = [(name, self._provider_executor.submit(fetch, city, start_date_str, end_date_str))
+                   for name, fetch in providers]
+        wait([future for _, future in futures], timeout=self.fetch_deadline)
+
+        for name, future in futures:
+            if not future.done():
+                future.cancel()
+                logger.warning(f"{name} events for {city} from {start_date_str} to {end_date_str} "
+                               f"missed the {self.fetch_deadline}s deadline")
+                continue
+            try:
+                provider_events = future.result()
+            except Exception as e:
+                logger.warning(f"Failed to fetch {name} events: {e}")
+                continue
+            if provider_events is not None:
+                live = True
+                events.extend(provider_events)
             
-        return events
+        return events, live
     
-    def _fetch_ticketmaster_events(self, city: str, date_str: str) -> List[Dict]:
-        """Fetch events from Ticketmaster API."""
+    def _fetch_ticketmaster_events(self, city: str, start_date_str: str, end_date_str: str) -> Optional[List[Dict]]:
+        """Fetch events from Ticketmaster API: one windowed query, paged."""
         if self.ticketmaster_api_key == 'demo_key':
-            return []  # Skip API call in demo mode
+            return None  # Skip API call in demo mode
             
         params = {
             'apikey': self.ticketmaster_api_key,
             'city': city,
-            'startDateTime': f"{date_str}T00:00:00Z",
-            'endDateTime': f"{date_str}T23:59:59Z",
-            'size': 50,
+            'startDateTime': f"{start_date_str}T00:00:00Z",
+            'endDateTime': f"{end_date_str}T23:59:59Z",
+            'size': TICKETMASTER_PAGE_SIZE,
             'sort': 'date,asc'
         }
         
-        response = requests.get(self.base_url_ticketmaster, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
         events = []
-        
-        if '_embedded' in data and 'events' in data['_embedded']:
-            for event in data['_embedded']['events']:
-                events.append({
-                    'id': event['id'],
-                    'name': event['name'],
-                    'date': event['dates']['start']['dateTime'],
-                    'venue': event['_embedded']['venues'][0]['name'] if event.get('_embedded', {}).get('venues') else 'Unknown',
-                    'category': event['classifications'][0]['segment']['name'] if event.get('classifications') else 'General',
-                    'source': 'ticketmaster'
-                })
+        for page in range(MAX_PROVIDER_PAGES):
+            params['page'] = page
+            response = self.session.get(self.base_url_ticketmaster, params=params, timeout=self.request_timeout)
+            response.raise_for_status()
+            
+            data = response.json()
+            if '_embedded' in data and 'events' in data['_embedded']:
+                for event in data['_embedded']['events']:
+                    events.append({
+                        'id': event['id'],
+                        'name': event['name'],
+                        'date': event['dates']['start']['dateTime'],
+                        'venue': event['_embedded']['venues'][0]['name'] if event.get('_embedded', {}).get('venues') else 'Unknown',
+                        'category': event['classifications'][0]['segment']['name'] if event.get('classifications') else 'General',
+                        'source': 'ticketmaster'
+                    })
+
+            if page + 1 >= data.get('page', {}).get('totalPages', 0):
+                break
+        else:
+            logger.warning(f"Ticketmaster results for {city} truncated at {MAX_PROVIDER_PAGES} pages")
                 
         return events
     
-    def _fetch_eventbrite_events(self, city: str, date_str: str) -> List[Dict]:
-        """Fetch events from Eventbrite API."""
+    def _fetch_eventbrite_events(self, city: str, start_date_str: str, end_date_str: str) -> Optional[List[Dict]]:
+        """Fetch events from Eventbrite API: one windowed query, paged."""
         if self.eventbrite_api_key == 'demo_key':
-            return []  # Skip API call in demo mode
+            return None  # Skip API call in demo mode
             
         headers = {
             'Authorization': f'Bearer {self.eventbrite_api_key}'
@@ -132,27 +348,37 @@ class EventService:
         
         params = {
             'location.address': city,
-            'start_date.range_start': f"{date_str}T00:00:00",
-            'start_date.range_end': f"{date_str}T23:59:59",
+            'start_date.range_start': f"{start_date_str}T00:00:00",
+            'start_date.range_end': f"{end_date_str}T23:59:59",
             'expand': 'venue'
         }
         
-        response = requests.get(self.base_url_eventbrite, headers=headers, params=params, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json()
         events = []
-        
-        if 'events' in data:
-            for event in data['events']:
-                events.append({
-                    'id': event['id'],
-                    'name': event['name']['text'],
-                    'date': event['start']['utc'],
-                    'venue': event.get('venue', {}).get('name', 'Unknown'),
-                    'category': event.get('category', {}).get('name', 'General'),
-                    'source': 'eventbrite'
-                })
+        for page in range(1, MAX_PROVIDER_PAGES + 1):
+            params['page'] = page
+            response = self.session.get(self.base_url_eventbrite, headers=headers, params=params,
+                                        timeout=self.request_timeout)
+            response.raise_for_status()
+            
+            data = response.json()
+            if 'events' in data:
+                for event in data['events']:
+                    events.append({
+                        'id': event['id'],
+                        'name': event['name']['text'],
+                        'date': event['start']['utc'],
+                        'venue': event.get('venue', {}).get('name', 'Unknown'),
+                        'category': event.get('category', {}).get('name', 'General'),
+                        'source': 'eventbrite'
+                    })
+
+            pagination = data.get('pagination', {})
+            if not pagination.get('has_more_items'):
+                break
+            if pagination.get('continuation'):
+                params['continuation'] = pagination['continuation']
+        else:
+            logger.warning(f"Eventbrite results for {city} truncated at {MAX_PROVIDER_PAGES} pages")
                 
         return events
     
@@ -213,100 +439,277 @@ class EventService:
     def get_events_for_date_range(self, city: str, start_date: datetime, 
                                   end_date: datetime) -> List[Event]:
         """Get all events for a specific date range."""
+        self._record_request(city)
         events = []
+        for daily_events in self._fetch_days(city, start_date, end_date):
+            events.extend(self._to_events(daily_events))
+        return events
+
+    async def get_events_for_date_range_async(self, city: str, start_date: datetime,
+                                              end_date: datetime) -> List[Event]:
+        return await self.executor.run(self.get_events_for_date_range, city, start_date, end_date)
+
+    def range_version(self, city: str, start_date: datetime, end_date: datetime) -> Optional[Tuple[float, ...]]:
+        """
+        Version of the cached events for a range: each day's expiry time, which
+        changes whenever the day is re-fetched. None if any day is missing or stale.
+        """
+        now = time.time()
+        versions = []
         current_date = start_date
-        
         while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            daily_events = self._get_cached_events(city, date_str)
-            
-            for event_data in daily_events:
-                try:
-                    event_date = datetime.fromisoformat(
-                        event_data['date'].replace('Z', '+00:00')
-                    )
-                    
-                    impact = self._calculate_event_impact(event_data)
-                    
-                    event = Event(
-                        id=event_data['id'],
-                        name=event_data['name'],
-                        date=event_date,
-                        venue=event_data['venue'],
-                        category=event_data['category'],
-                        expected_attendance=event_data.get('expected_attendance', 1000),
-                        impact_level=impact,
-                        distance_km=2.5  # Assume events are nearby for demo
-                    )
-                    events.append(event)
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to process event {event_data.get('name', 'Unknown')}: {e}")
-                    
+            expires_at = self.cache.expires_at(self._cache_key(city, current_date.strftime('%Y-%m-%d')))
+            if expires_at is None or expires_at <= now:
+                return None
+            versions.append(expires_at)
             current_date += timedelta(days=1)
+        return tuple(versions)
+
+    def _record_request(self, city: str) -> None:
+        with self._request_lock:
+            self.request_counts[city] += 1
+            if len(self.request_counts) > self.max_tracked_cities:
+                self.request_counts = Counter({
+                    name: count // 2 for name, count in self.request_counts.items() if count > 1
+                })
+
+    def most_requested(self, n: int) -> List[Tuple[str, int]]:
+        """The n most looked-up cities with their (decayed) request counts."""
+        with self._request_lock:
+            return self.request_counts.most_common(n)
+
+    def refresh_days(self, city: str, start_date: date, end_date: date) -> None:
+        """
+        Fetch and cache start_date..end_date now, whether or not they are cached.
+        Days a user lookup is already fetching are awaited rather than fetched twice.
+        """
+        days = (end_date - start_date).days + 1
+        self._fetch_coalesced(city, [(start_date + timedelta(days=i)).isoformat() for i in range(days)])
+
+    def _to_events(self, daily_events: List[Dict]) -> List[Event]:
+        """Parse and classify raw provider events, skipping malformed ones."""
+        events = []
+        for event_data in daily_events:
+            try:
+                event_date = datetime.fromisoformat(
+                    event_data['date'].replace('Z', '+00:00')
+                )
+                
+                impact = self._calculate_event_impact(event_data)
+                
+                event = Event(
+                    id=event_data['id'],
+                    name=event_data['name'],
+                    date=event_date,
+                    venue=event_data['venue'],
+                    category=event_data['category'],
+                    expected_attendance=event_data.get('expected_attendance', 1000),
+                    impact_level=impact,
+                    distance_km=2.5  # Assume events are nearby for demo
+                )
+                events.append(event)
+                
+            except Exception as e:
+                logger.warning(f"Failed to process event {event_data.get('name', 'Unknown')}: {e}")
             
         return events
+
+    def _fetch_days(self, city: str, start_date: datetime, end_date: datetime) -> List[List[Dict]]:
+        """
+        Raw events for each day of the range, in order. Days missing from the
+        cache are fetched with one windowed query per provider covering all of
+        them, then split into per-day buckets and cached. Days another caller is
+        already fetching are awaited rather than fetched again. Stale days are
+        served as-is and refreshed in the background.
+        """
+        date_strs = []
+        current_date = start_date
+        while current_date <= end_date:
+            date_strs.append(current_date.strftime('%Y-%m-%d'))
+            current_date += timedelta(days=1)
+
+        days = {}
+        missing = []
+        stale = []
+        for date_str in date_strs:
+            events, state = self.cache.get(self._cache_key(city, date_str))
+            if state is None:
+                missing.append(date_str)
+                continue
+            days[date_str] = events
+            if state == STALE and self.cache.start_revalidation(self._cache_key(city, date_str)):
+                stale.append(date_str)
+
+        if missing:
+            days.update(self._fetch_coalesced(city, missing))
+        if stale:
+            self._refresh_executor.submit(self._revalidate, city, stale)
+        return [days[date_str] for date_str in date_strs]
+
+    def _fetch_coalesced(self, city: str, date_strs: List[str]) -> Dict[str, List[Dict]]:
+        """_fetch_and_cache the days no other caller is fetching, and await the rest."""
+        fetched = self.flights.do_many(
+            [('day', city, date_str) for date_str in date_strs],
+            lambda keys: {('day', city, date_str): events for date_str, events
+                          in self._fetch_and_cache(city, [key[2] for key in keys]).items()}
+        )
+        return {key[2]: events for key, events in fetched.items()}
+
+    def _fetch_and_cache(self, city: str, date_strs: List[str]) -> Dict[str, List[Dict]]:
+        """Fetch the window spanning date_strs and cache each of those days."""
+        events, live = self._fetch_events_from_apis(city, date_strs[0], date_strs[-1])
+        buckets: Dict[str, List[Dict]] = {}
+        for event in events:
+            buckets.setdefault(event['date'][:10], []).append(event)
+
+        days = {}
+        for date_str in date_strs:
+            if date_str in buckets:
+                days[date_str] = buckets[date_str]
+                self.cache.put(self._cache_key(city, date_str), buckets[date_str])
+            elif live:
+                # A provider answered and the day is quiet: cache the empty result briefly
+                days[date_str] = []
+                self.cache.put(self._cache_key(city, date_str), [], ttl=self._negative_cache_duration)
+            else:
+                # If APIs fail, return mock data for demo purposes, but only cache it briefly
+                days[date_str] = self._get_mock_events(city, date_str)
+                self.cache.put(self._cache_key(city, date_str), days[date_str], ttl=self._negative_cache_duration)
+        return days
+
+    def _revalidate(self, city: str, date_strs: List[str]) -> None:
+        try:
+            self._fetch_and_cache(city, date_strs)
+        except Exception as e:
+            logger.warning(f"Failed to refresh events for {city}: {e}")
+        finally:
+            for date_str in date_strs:
+                self.cache.finish_revalidation(self._cache_key(city, date_str))
     
+    def get_impact_calendar(self, city: str, start: date, end: date) -> ImpactCalendar:
+        """
+        An impact calendar covering start..end: the city's horizon calendar when
+        it is current and covers the range, otherwise one over just these days.
+        A missing or outdated horizon calendar is rebuilt in the background, so
+        a cold request never fetches the whole horizon and days outside it
+        never widen the shared calendar.
+        """
+        with self._calendar_lock:
+            calendar = self._calendars.get(city)
+            if calendar is not None:
+                self._calendars.move_to_end(city)
+        if self._calendar_is_current(calendar, start, end):
+            return calendar
+        if not self._calendar_is_fresh(calendar) and start < self._horizon_end():
+            self._build_calendar_later(city)
+        return self._range_calendar(city, start, end)
+
+    def refresh_calendar(self, city: str) -> ImpactCalendar:
+        """Build the city's calendar over the rolling horizon now and keep it."""
+        return self.flights.do(('calendar', city), lambda: self._build_calendar(city))
+
+    def _horizon_end(self) -> date:
+        return date.today() + timedelta(days=self.calendar_horizon_days)
+
+    def _calendar_is_fresh(self, calendar: Optional[ImpactCalendar]) -> bool:
+        return (calendar is not None and calendar.start_date == date.today()
+                and time.time() - calendar.built_at <= 2 * self.calendar_refresh_seconds)
+
+    def _calendar_is_current(self, calendar: Optional[ImpactCalendar], start: date, end: date) -> bool:
+        return self._calendar_is_fresh(calendar) and calendar.covers(start, end)
+
+    def _build_calendar(self, city: str) -> ImpactCalendar:
+        today = date.today()
+        calendar = self._range_calendar(city, today, today + timedelta(days=self.calendar_horizon_days - 1))
+        with self._calendar_lock:
+            self._calendars[city] = calendar
+            self._calendars.move_to_end(city)
+            while len(self._calendars) > self.max_calendars:
+                self._calendars.popitem(last=False)
+        return calendar
+
+    def _build_calendar_later(self, city: str) -> None:
+        with self._calendar_lock:
+            if city in self._calendar_builds:
+                return
+            self._calendar_builds.add(city)
+
+        def build():
+            try:
+                self.refresh_calendar(city)
+            except Exception as e:
+                logger.warning(f"Failed to build impact calendar for {city}: {e}")
+            finally:
+                with self._calendar_lock:
+                    self._calendar_builds.discard(city)
+
+        self._calendar_executor.submit(build)
+
+    def _range_calendar(self, city: str, start: date, end: date) -> ImpactCalendar:
+        days = self._fetch_days(city, datetime.combine(start, datetime.min.time()),
+                                datetime.combine(end, datetime.min.time()))
+        return ImpactCalendar(city, start, [self._to_events(day) for day in days])
+
+    def price_grid(self, cities: List[str], start: date, end: date, lengths_of_stay: List[int]) -> PricingGrid:
+        """
+        Pricing multipliers for every city, check-in date in start..end and
+        length of stay. Cities without a current horizon calendar read their
+        days in parallel; the rest is prefix-sum work done inline.
+        """
+        for city in cities:
+            self._record_request(city)
+        check_ins = (end - start).days + 1
+        last_day = end + timedelta(days=max(lengths_of_stay))
+        with self._calendar_lock:
+            cold = [city for city in cities if not self._calendar_is_current(self._calendars.get(city), start, last_day)]
+        built = {}
+        if len(cold) > 1:
+            built = dict(zip(cold, self._calendar_executor.map(
+                lambda city: self.get_impact_calendar(city, start, last_day), cold)))
+        calendars = [built.get(city) or self.get_impact_calendar(city, start, last_day) for city in cities]
+        multipliers = np.stack([
+            calendar.stay_multipliers(start, check_ins, lengths_of_stay) for calendar in calendars
+        ])
+        return PricingGrid(cities, start, lengths_of_stay, multipliers)
+
+    async def price_grid_async(self, cities: List[str], start: date, end: date,
+                               lengths_of_stay: List[int]) -> PricingGrid:
+        return await self.executor.run(self.price_grid, cities, start, end, lengths_of_stay)
+
+    def start_calendar_refresher(self) -> None:
+        """Rebuild every kept city's calendar from the cache in the background."""
+        if self._calendar_refresher is None:
+            self._calendar_stop.clear()
+            self._calendar_refresher = threading.Thread(
+                target=self._refresh_calendars, daemon=True, name='impact-calendar'
+            )
+            self._calendar_refresher.start()
+
+    def stop_calendar_refresher(self) -> None:
+        self._calendar_stop.set()
+        self._calendar_refresher = None
+
+    def _refresh_calendars(self) -> None:
+        while not self._calendar_stop.wait(self.calendar_refresh_seconds):
+            with self._calendar_lock:
+                cities = list(self._calendars)
+            for city in cities:
+                try:
+                    # Rolls the horizon forward to start today
+                    self.refresh_calendar(city)
+                except Exception as e:
+                    logger.warning(f"Failed to refresh impact calendar for {city}: {e}")
+
     def calculate_pricing_adjustment(self, city: str, check_in_date: datetime, 
                                    check_out_date: datetime) -> PricingAdjustment:
-        """Calculate pricing adjustment based on local events."""
+        """Calculate pricing adjustment based on local events, read from the city's impact calendar."""
         try:
-            events = self.get_events_for_date_range(city, check_in_date, check_out_date)
-            
-            if not events:
-                return PricingAdjustment(
-                    base_multiplier=1.0,
-                    reason="No significant events found",
-                    events_count=0,
-                    peak_event_date=None,
-                    confidence_score=0.8
-                )
-            
-            # Calculate impact score
-            total_impact = 0
-            high_impact_events = 0
-            peak_event = None
-            max_impact = 0
-            
-            impact_weights = {
-                EventImpact.LOW: 0.05,
-                EventImpact.MEDIUM: 0.15,
-                EventImpact.HIGH: 0.35,
-                EventImpact.CRITICAL: 0.75
-            }
-            
-            for event in events:
-                weight = impact_weights[event.impact_level]
-                total_impact += weight
-                
-                if event.impact_level in [EventImpact.HIGH, EventImpact.CRITICAL]:
-                    high_impact_events += 1
-                    
-                if weight > max_impact:
-                    max_impact = weight
-                    peak_event = event
-            
-            # Calculate multiplier (cap at 3.0x for extreme cases)
-            base_multiplier = min(1.0 + total_impact, 3.0)
-            
-            # Generate reason
-            if high_impact_events > 0:
-                reason = f"High-impact events detected: {high_impact_events} major events"
-            elif len(events) > 3:
-                reason = f"Multiple events period: {len(events)} events"
-            else:
-                reason = f"Moderate event activity: {len(events)} events"
-            
-            # Confidence based on data quality and event proximity
-            confidence = min(0.9, 0.6 + (len(events) * 0.1))
-            
-            return PricingAdjustment(
-                base_multiplier=base_multiplier,
-                reason=reason,
-                events_count=len(events),
-                peak_event_date=peak_event.date if peak_event else None,
-                confidence_score=confidence
-            )
+            # Same days as get_events_for_date_range: check-in plus every whole day up to check-out
+            start = check_in_date.date()
+            end = start + timedelta(days=(check_out_date - check_in_date).days)
+            self._record_request(city)
+            # Identical concurrent stays wait for one computation
+            return self.flights.do(('pricing', city, start, end), lambda: self._price_stay(city, start, end))
             
         except Exception as e:
             logger.error(f"Failed to calculate pricing adjustment: {e}")
@@ -317,3 +720,42 @@ class EventService:
                 peak_event_date=None,
                 confidence_score=0.3
             )
+
+    async def calculate_pricing_adjustment_async(self, city: str, check_in_date: datetime,
+                                                 check_out_date: datetime) -> PricingAdjustment:
+        return await self.executor.run(self.calculate_pricing_adjustment, city, check_in_date, check_out_date)
+
+    def _price_stay(self, city: str, start: date, end: date) -> PricingAdjustment:
+        calendar = self.get_impact_calendar(city, start, end)
+        total_impact, high_impact_events, events_count, peak_event_date = calendar.stay_stats(start, end)
+        
+        if not events_count:
+            return PricingAdjustment(
+                base_multiplier=1.0,
+                reason="No significant events found",
+                events_count=0,
+                peak_event_date=None,
+                confidence_score=0.8
+            )
+        
+        # Calculate multiplier (cap at 3.0x for extreme cases)
+        base_multiplier = min(1.0 + total_impact, 3.0)
+        
+        # Generate reason
+        if high_impact_events > 0:
+            reason = f"High-impact events detected: {high_impact_events} major events"
+        elif events_count > 3:
+            reason = f"Multiple events period: {events_count} events"
+        else:
+            reason = f"Moderate event activity: {events_count} events"
+        
+        # Confidence based on data quality and event proximity
+        confidence = min(0.9, 0.6 + (events_count * 0.1))
+        
+        return PricingAdjustment(
+            base_multiplier=base_multiplier,
+            reason=reason,
+            events_count=events_count,
+            peak_event_date=peak_event_date,
+            confidence_score=confidence
+        )
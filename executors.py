@@ -0,0 +1,73 @@
+"""Bounded executors that let async handlers run blocking work off the event loop.
+
+Each workload (model inference, event lookups, audience queries) gets its own
+pool, so a slow upstream can only exhaust its own workers and never the ones
+scoring traffic runs on. Work beyond max_pending is rejected rather than queued
+without limit, and the API turns that into a 503.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class ExecutorSaturated(RuntimeError):
+    pass
+
+
+class BoundedExecutor:
+    """A named thread pool with a cap on running plus queued calls."""
+
+    def __init__(self, name: str, max_workers: int, max_pending: Optional[int] = None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending if max_pending is not None else max_workers * 8
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._metrics = {'completed': 0, 'cancelled': 0, 'rejected': 0}
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run fn(*args, **kwargs) on the pool and await it. Raises ExecutorSaturated when full."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._metrics['rejected'] += 1
+                raise ExecutorSaturated(f"{self.name} executor is saturated ({self._pending} calls pending)")
+            self._pending += 1
+        try:
+            future = self._executor.submit(functools.partial(self._call, fn, *args, **kwargs))
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        # Released when the work itself is done (or cancelled before it started), not when the
+        # awaiting handler goes away: a cancelled await leaves the call running on the pool
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._metrics['cancelled' if future.cancelled() else 'completed'] += 1
+
+    def _call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._metrics, max_workers=self.max_workers, max_pending=self.max_pending,
+                        running=self._running, queued=self._pending - self._running)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""Local stand-in servers for offline benchmarking.
+
+EmailSinkServer accepts the batch format used by HttpEmailProvider, with
+configurable per-request latency and per-recipient failure rate, and counts
+what it receives.
+
+EventProviderServer answers Ticketmaster- and Eventbrite-shaped event
+searches with deterministic synthetic events, with configurable latency, and
+records request counts and peak concurrency.
+
+Run standalone:
+    python3 fake_servers.py email-sink --port 8025 --latency-ms 20
+    python3 fake_servers.py event-provider --port 8026 --latency-ms 100
+"""
+
+import argparse
+import json
+import random
+import socket
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real provider
+
+    def setup(self):
+        super().setup()
+        # Headers and body go out as separate writes; don't let Nagle delay the body
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _write_json(self, payload, status=200):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeServer:
+    """Runs a ThreadingHTTPServer on a background thread."""
+
+    def __init__(self, handler_class, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), handler_class)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _EmailSinkHandler(_QuietHandler):
+    def do_POST(self):
+        sink = self.server.fake
+        messages = self._read_json().get("messages", [])
+        if sink.latency_seconds:
+            time.sleep(sink.latency_seconds)
+
+        results = []
+        for message in messages:
+            if random.random() < sink.failure_rate:
+                results.append({"email": message["email"], "status": "failed", "error": "transient"})
+            else:
+                results.append({"email": message["email"], "status": "sent"})
+        with sink.lock:
+            sink.requests += 1
+            sink.received += len(messages)
+            sink.delivered += sum(1 for r in results if r["status"] == "sent")
+        self._write_json({"results": results})
+
+
+class EmailSinkServer(FakeServer):
+    """Stand-in for an email provider's batch send API."""
+
+    def __init__(self, latency_ms=0, failure_rate=0.0, host="127.0.0.1", port=0):
+        super().__init__(_EmailSinkHandler, host, port)
+        self.latency_seconds = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.received = 0
+        self.delivered = 0
+
+
+EVENT_CATEGORIES = ["Music", "Sports", "Business", "Arts & Theatre"]
+
+class _EventProviderHandler(_QuietHandler):
+    def do_GET(self):
+        provider = self.server.fake
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        with provider.lock:
+            provider.requests += 1
+            provider.in_flight += 1
+            provider.max_in_flight = max(provider.max_in_flight, provider.in_flight)
+        try:
+            if provider.latency_seconds:
+                time.sleep(provider.latency_seconds)
+            if url.path.startswith("/ticketmaster"):
+                self._write_json(self._ticketmaster(provider, params))
+            elif url.path.startswith("/eventbrite"):
+                self._write_json(self._eventbrite(provider, params))
+            else:
+                self._write_json({"error": "not found"}, status=404)
+        finally:
+            with provider.lock:
+                provider.in_flight -= 1
+
+    def _ticketmaster(self, provider, params):
+        events = provider.events_between(params.get("city", ""), params["startDateTime"], params["endDateTime"])
+        size = int(params.get("size", 20))
+        number = int(params.get("page", 0))
+        page = events[number * size:(number + 1) * size]
+        return {
+            "_embedded": {"events": [{
+                "id": f"tm_{event['id']}",
+                "name": event["name"],
+                "dates": {"start": {"dateTime": event["date"]}},
+                "_embedded": {"venues": [{"name": event["venue"]}]},
+                "classifications": [{"segment": {"name": event["category"]}}],
+            } for event in page]},
+            "page": {"size": size, "totalElements": len(events),
+                     "totalPages": -(-len(events) // size), "number": number},
+        }
+
+    def _eventbrite(self, provider, params):
+        events = provider.events_between(params.get("location.address", ""),
+                                         params["start_date.range_start"], params["start_date.range_end"])
+        size = 50
+        number = int(params.get("page", 1))
+        page = events[(number - 1) * size:number * size]
+        page_count = -(-len(events) // size)
+        return {
+            "events": [{
+                "id": f"eb_{event['id']}",
+                "name": {"text": event["name"]},
+                "start": {"utc": event["date"]},
+                "venue": {"name": event["venue"]},
+                "category": {"name": event["category"]},
+            } for event in page],
+            "pagination": {"object_count": len(events), "page_number": number, "page_size": size,
+                           "page_count": page_count, "has_more_items": number < page_count},
+        }
+
+
+class EventProviderServer(FakeServer):
+    """
+    Stand-in for the Ticketmaster and Eventbrite search APIs, served under
+    /ticketmaster and /eventbrite. Each city-day has events_per_day events.
+    """
+
+    def __init__(self, latency_ms=0, events_per_day=3, host="127.0.0.1", port=0):
+        super().__init__(_EventProviderHandler, host, port)
+        self.latency_seconds = latency_ms / 1000
+        self.events_per_day = events_per_day
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @property
+    def ticketmaster_url(self):
+        return f"{self.url}/ticketmaster/discovery/v2/events"
+
+    @property
+    def eventbrite_url(self):
+        return f"{self.url}/eventbrite/v3/events/search/"
+
+    def events_between(self, city, start, end):
+        """Synthetic events whose start falls in [start, end], ordered by time."""
+        start = datetime.fromisoformat(start.rstrip("Z"))
+        end = datetime.fromisoformat(end.rstrip("Z"))
+        events = []
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day <= end:
+            date_str = day.strftime("%Y-%m-%d")
+            seed = zlib.crc32(f"{city}:{date_str}".encode())
+            for i in range(self.events_per_day):
+                when = day + timedelta(hours=9 + (seed + i * 5) % 13)
+                if start <= when <= end:
+                    events.append({
+                        "id": f"{seed:08x}_{i}",
+                        "name": f"{city} Event {date_str} #{i + 1}",
+                        "date": when.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                        "venue": f"{city} Venue {i + 1}",
+                        "category": EVENT_CATEGORIES[(seed + i) % len(EVENT_CATEGORIES)],
+                    })
+            day += timedelta(days=1)
+        events.sort(key=lambda event: event["date"])
+        return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="server", required=True)
+
+    email_sink = subparsers.add_parser("email-sink", help="Fake batch email provider")
+    email_sink.add_argument("--port", type=int, default=8025)
+    email_sink.add_argument("--latency-ms", type=float, default=20)
+    email_sink.add_argument("--failure-rate", type=float, default=0.0)
+
+    event_provider = subparsers.add_parser("event-provider", help="Fake Ticketmaster/Eventbrite search APIs")
+    event_provider.add_argument("--port", type=int, default=8026)
+    event_provider.add_argument("--latency-ms", type=float, default=100)
+    event_provider.add_argument("--events-per-day", type=int, default=3)
+
+    args = parser.parse_args()
+    if args.server == "email-sink":
+        server = EmailSinkServer(args.latency_ms, args.failure_rate, host="0.0.0.0", port=args.port)
+    elif args.server == "event-provider":
+        server = EventProviderServer(args.latency_ms, args.events_per_day, host="0.0.0.0", port=args.port)
+        print(f"TICKETMASTER_API_URL={server.ticketmaster_url}")
+        print(f"EVENTBRITE_API_URL={server.eventbrite_url}")
+    print(f"Listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
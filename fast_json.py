@@ -0,0 +1,52 @@
+"""Fast JSON encoding for API responses.
+
+Uses orjson when it is installed; it serializes dataclasses, enums, datetimes
+and numpy arrays natively and is several times faster than the json module.
+Without it the standard library is used with equivalent conversions, so the
+output is the same JSON either way.
+"""
+
+import dataclasses
+import json
+from datetime import date, datetime
+from enum import Enum
+from typing import Any
+
+import numpy as np
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if dataclasses.is_dataclass(obj):
+        return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered with dumps(). Returning one from a handler also
+    skips FastAPI's response_model validation and jsonable_encoder pass, so
+    use it for data the service built itself.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -83,12 +83,34 @@ export interface CampaignResponse {
     stats: AudienceStats;
 }
 
+export interface AudiencePage {
+    snapshot_id: string;
+    expires_at: string;
+    stats: AudienceStats;
+    offset: number;
+    count: number;
+    next_cursor: string | null;
+    audience: AudienceMember[];
+}
+
 export interface CampaignSendRequest {
     subject: string;
     body: string;
     recipients: AudienceMember[];
 }
 
+export interface CampaignJob {
+    job_id: string;
+    subject: string;
+    status: string;
+    total: number;
+    sent: number;
+    failed: number;
+    pending: number;
+    checkpoint: number;
+    error: string | null;
+}
+
 @Injectable({
     providedIn: 'root'
 })
@@ -124,7 +146,24 @@ export class ApiService {
         return this.http.get<CampaignResponse>(`${this.apiUrl}/campaigns/audiences/q2-business-local`);
     }
 
+    createAudienceSnapshot(limit = 500): Observable<AudiencePage> {
+        return this.http.post<AudiencePage>(`${this.apiUrl}/campaigns/audiences/snapshots`, { limit });
+    }
+
+    getAudiencePage(cursor: string, limit = 500): Observable<AudiencePage> {
+        const params = new HttpParams().set('cursor', cursor).set('limit', limit);
+        return this.http.get<AudiencePage>(`${this.apiUrl}/campaigns/audiences/pages`, { params });
+    }
+
     sendCampaign(request: CampaignSendRequest): Observable<any> {
         return this.http.post<any>(`${this.apiUrl}/campaigns/send`, request);
     }
+
+    submitCampaignJob(request: CampaignSendRequest): Observable<CampaignJob> {
+        return this.http.post<CampaignJob>(`${this.apiUrl}/campaigns/jobs`, request);
+    }
+
+    getCampaignJob(jobId: string): Observable<CampaignJob> {
+        return this.http.get<CampaignJob>(`${this.apiUrl}/campaigns/jobs/${jobId}`);
+    }
 }
@@ -1,7 +1,7 @@
 import { Component } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { FormsModule } from '@angular/forms';
-import { ApiService, TravelerProfile, PredictionResponse, OfferResponse, EventPricingRequest, EventPricingResponse, EventsResponse, AudienceStats, AudienceMember, CampaignSendRequest } from './api.service';
+import { ApiService, TravelerProfile, PredictionResponse, OfferResponse, EventPricingRequest, EventPricingResponse, EventsResponse, AudienceStats, AudienceMember, AudiencePage, CampaignSendRequest, CampaignJob } from './api.service';
 
 @Component({
   selector: 'app-root',
@@ -167,18 +167,25 @@ export class App {
   // Smart Campaigns Methods
   campaignStats: AudienceStats | null = null;
   campaignAudience: AudienceMember[] = [];
+  // Set once the last snapshot page has arrived; sending before then would reach only part of the audience
+  audienceComplete = false;
+  private audienceLoad = 0;
   campaignOffer: OfferResponse | null = null;
-  campaignResult: any = null;
+  campaignResult: CampaignJob | null = null;
   loadingCampaign = false;
   sendingCampaign = false;
 
   loadAudience() {
     this.loadingCampaign = true;
-    this.api.getCampaignAudience().subscribe({
-      next: (res) => {
-        this.campaignStats = res.stats;
-        this.campaignAudience = res.audience;
+    this.campaignAudience = [];
+    this.audienceComplete = false;
+    const load = ++this.audienceLoad;
+    // The first page carries the stats; remaining pages stream in from the same snapshot
+    this.api.createAudienceSnapshot().subscribe({
+      next: (page) => {
+        this.campaignStats = page.stats;
         this.loadingCampaign = false;
+        this.appendAudiencePage(page, load);
       },
       error: (err) => {
         console.error('Failed to load audience', err);
@@ -187,6 +194,21 @@ export class App {
     });
   }
 
+  private appendAudiencePage(page: AudiencePage, load: number) {
+    // Pages of a snapshot replaced by a refresh are dropped
+    if (load !== this.audienceLoad) return;
+    this.campaignAudience.push(...page.audience);
+    if (!page.next_cursor) {
+      this.audienceComplete = true;
+      return;
+    }
+
+    this.api.getAudiencePage(page.next_cursor).subscribe({
+      next: (next) => this.appendAudiencePage(next, load),
+      error: (err) => console.error('Failed to load audience page', err)
+    });
+  }
+
   generateCampaignOffer() {
     this.loadingOffer = true;
     // Hardcoded for "Business" segment for this specific campaign type
@@ -203,7 +225,7 @@ export class App {
   }
 
   sendCampaign() {
-    if (!this.campaignOffer || !this.campaignAudience.length) return;
+    if (!this.campaignOffer || !this.audienceComplete || !this.campaignAudience.length) return;
 
     this.sendingCampaign = true;
     const req: CampaignSendRequest = {
@@ -212,15 +234,30 @@ export class App {
       recipients: this.campaignAudience
     };
 
-    this.api.sendCampaign(req).subscribe({
-      next: (res) => {
-        this.campaignResult = res;
-        this.sendingCampaign = false;
-      },
+    this.campaignResult = null;
+    this.api.submitCampaignJob(req).subscribe({
+      next: (job) => this.pollCampaignJob(job),
       error: (err) => {
         console.error('Failed to send campaign', err);
         this.sendingCampaign = false;
       }
     });
   }
+
+  private pollCampaignJob(job: CampaignJob) {
+    this.campaignResult = job;
+    if (!['pending', 'running', 'cancelling'].includes(job.status)) {
+      this.sendingCampaign = false;
+      return;
+    }
+    setTimeout(() => {
+      this.api.getCampaignJob(job.job_id).subscribe({
+        next: (update) => this.pollCampaignJob(update),
+        error: (err) => {
+          console.error('Failed to poll campaign job', err);
+          this.sendingCampaign = false;
+        }
+      });
+    }, 1000);
+  }
 }
@@ -0,0 +1,142 @@
+"""Native NumPy inference engine for the trained models.
+
+The scaler, K-Means and Random Forest artifacts from train_model.py are
+compiled into plain arrays (mean/scale vectors, a centroid matrix and packed
+tree tables) so single-profile scoring skips sklearn's input validation and
+per-estimator Python overhead. All trees are traversed at once, level by level.
+
+The arithmetic mirrors sklearn step for step (float32 inputs for the trees,
+per-leaf normalization, tree-ordered averaging, gemm-style centroid distances)
+so the outputs match the sklearn models exactly.
+"""
+
+import numpy as np
+from typing import Dict
+
+TREE_LEAF = -1
+
+# A single row evaluates every split of the forest up front when the forest has
+# at most this many nodes per level of depth: a few passes over all nodes then
+# cost less than the per-level NumPy call overhead they replace.
+DENSE_ROW_NODES_PER_LEVEL = 1000
+
+# Arrays produced by compile_arrays (and stored as .npy files by the model store)
+ENGINE_ARRAYS = (
+    'scaler_mean', 'scaler_scale', 'centroids',
+    'feature', 'threshold', 'left', 'right', 'value', 'roots', 'max_depth',
+)
+
+
+class InferenceEngine:
+    """Scores encoded traveler features without calling into sklearn."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.scaler_mean = arrays['scaler_mean']
+        self.scaler_scale = arrays['scaler_scale']
+        self.centroids = arrays['centroids']
+        self.centroid_sq_norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.n_trees = len(self.roots)
+        self.max_depth = int(arrays['max_depth'])
+
+    @classmethod
+    def from_model_data(cls, model_data: Dict) -> 'InferenceEngine':
+        """Compile the sklearn objects in a models.pkl dict."""
+        return cls(compile_arrays(model_data))
+
+    def scale(self, features: np.ndarray) -> np.ndarray:
+        """StandardScaler.transform equivalent."""
+        return (np.asarray(features, dtype=np.float64) - self.scaler_mean) / self.scaler_scale
+
+    def predict_segment(self, features: np.ndarray) -> np.ndarray:
+        """KMeans.predict on unscaled (N, 5) segmentation features."""
+        scaled = self.scale(features)
+        distances = self.centroid_sq_norms - 2.0 * (scaled @ self.centroids.T)
+        return np.argmin(distances, axis=1)
+
+    def predict_proba(self, features: np.ndarray) -> np.ndarray:
+        """RandomForestClassifier.predict_proba on (N, 6) features."""
+        # sklearn trees split on float32 inputs compared against float64 thresholds
+        X = np.asarray(features, dtype=np.float32).astype(np.float64)
+        if X.shape[0] == 1:
+            return self._predict_proba_row(X[0])[np.newaxis]
+        rows = np.arange(X.shape[0])
+
+        # (n_trees, N) node cursor; leaves point to themselves so a fixed
+        # number of steps lands every row on its leaf in every tree
+        nodes = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        # Accumulate in tree order, as the forest does, before averaging
+        proba = np.add.reduce(self.value[nodes], axis=0)
+        proba /= self.n_trees
+        return proba
+
+    def _predict_proba_row(self, x: np.ndarray) -> np.ndarray:
+        """predict_proba for one row: 1-D gathers instead of the (n_trees, N) matrix path."""
+        if len(self.feature) <= DENSE_ROW_NODES_PER_LEVEL * self.max_depth:
+            # Each node's successor for this row, then one gather per level
+            successor = np.where(x.take(self.feature) <= self.threshold, self.left, self.right)
+            nodes = self.roots
+            for _ in range(self.max_depth):
+                nodes = successor.take(nodes)
+        else:
+            nodes = self.roots
+            for _ in range(self.max_depth):
+                go_left = x.take(self.feature.take(nodes)) <= self.threshold.take(nodes)
+                nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+        proba = np.add.reduce(self.value.take(nodes, axis=0), axis=0)
+        proba /= self.n_trees
+        return proba
+
+
+def compile_arrays(model_data: Dict) -> Dict[str, np.ndarray]:
+    """Flatten the scaler, KMeans and forest into packed NumPy arrays."""
+    scaler = model_data['scaler']
+    n_features = scaler.n_features_in_
+    scaler_mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scaler_scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model_data['rf_model'].estimators_:
+        tree = estimator.tree_
+        node_ids = np.arange(tree.node_count)
+        is_leaf = tree.children_left == TREE_LEAF
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+        # Same per-leaf normalization as DecisionTreeClassifier.predict_proba
+        proba = tree.value[:, 0, :estimator.n_classes_].astype(np.float64)
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        values.append(proba / normalizer)
+
+        roots.append(offset)
+        offset += tree.node_count
+
+    return {
+        'scaler_mean': np.asarray(scaler_mean, dtype=np.float64),
+        'scaler_scale': np.asarray(scaler_scale, dtype=np.float64),
+        'centroids': np.asarray(model_data['kmeans'].cluster_centers_, dtype=np.float64),
+        'feature': np.concatenate(features).astype(np.intp),
+        'threshold': np.concatenate(thresholds).astype(np.float64),
+        'left': np.concatenate(lefts).astype(np.intp),
+        'right': np.concatenate(rights).astype(np.intp),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.intp),
+        'max_depth': np.asarray(max(e.tree_.max_depth for e in model_data['rf_model'].estimators_)),
+    }
+
+
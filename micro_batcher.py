@@ -0,0 +1,123 @@
+"""Dynamic micro-batching for single-row inference requests.
+
+Concurrent /predict calls each scoring one row leave the vectorized engine
+mostly idle. MicroBatcher queues rows from any number of callers and scores
+whatever arrives within a short window (or up to a batch size) as one matrix,
+then hands each caller its own result.
+"""
+
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from executors import ExecutorSaturated
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    score_batch(items) must return one result per item, in order. A batch is
+    dispatched when max_batch_size items are queued or max_wait_ms after its
+    first item arrived, whichever comes first. With max_wait_ms=0 a batch is
+    whatever queued up while the previous one was scoring, so an idle
+    batcher adds no delay and batches grow with load.
+    """
+
+    def __init__(self, score_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 256,
+                 max_wait_ms: float = 0, max_pending: int = 4096, name: str = 'micro-batcher'):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._metrics = {'batches': 0, 'items': 0, 'max_batch': 0, 'rejected': 0}
+
+    def submit(self, item: Any) -> Future:
+        """Queue one item; the future resolves to its result. Raises ExecutorSaturated when full."""
+        if self._queue.qsize() >= self.max_pending:
+            with self._lock:
+                self._metrics['rejected'] += 1
+            raise ExecutorSaturated(f"{self.name} has {self.max_pending} items pending")
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    async def run(self, item: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(item))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics['avg_batch'] = round(metrics['items'] / metrics['batches'], 2) if metrics['batches'] else None
+        metrics['pending'] = self._queue.qsize()
+        return metrics
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, daemon=True, name=self.name)
+                    self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            stopping = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            try:
+                self._dispatch(batch)
+            except Exception:
+                # The loop is the only consumer; losing it would hang every later caller
+                logger.exception(f"{self.name} failed to dispatch a batch of {len(batch)}")
+            if stopping:
+                return
+
+    def _dispatch(self, batch: List) -> None:
+        # Drop callers that gave up (e.g. a disconnected client cancelled its await);
+        # the rest can no longer be cancelled, so setting their results is safe
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            results = self.score_batch([item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        with self._lock:
+            self._metrics['batches'] += 1
+            self._metrics['items'] += len(batch)
+            self._metrics['max_batch'] = max(self._metrics['max_batch'], len(batch))
@@ -0,0 +1,303 @@
+"""Lazy, memory-mapped, versioned model store for the API.
+
+models.pkl is unpickled once to build a version directory holding the
+compiled inference arrays as uncompressed .npy files plus a small JSON
+manifest. Workers open the arrays with ``np.load(mmap_mode='r')`` so every
+uvicorn process shares the same page-cache pages instead of holding its own
+copy, and nothing is loaded until the first prediction (or an explicit
+warm-up).
+
+Versions are named by the content hash of models.pkl and published by
+atomically rewriting ``CURRENT``. With watching enabled, each worker polls
+models.pkl and ``CURRENT``; the first to see a new artifact builds it (under a
+file lock, so it is built once) and every worker then loads and warms the new
+version in the background and swaps it in. Requests already holding the old
+model_data finish on it.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+import utils
+from inference_engine import ENGINE_ARRAYS, InferenceEngine, compile_arrays
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; concurrent builds then just duplicate work
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+CURRENT_NAME = 'CURRENT'
+LOCK_NAME = '.build.lock'
+# Versions kept on disk besides the current one, for workers still mapping them
+KEEP_VERSIONS = 2
+
+
+@dataclass
+class LoadedModel:
+    model_data: Dict
+    version: str
+    published_at: float
+    loaded_at: float
+    load_seconds: float  # building (if this process did), mapping and warming
+
+
+class ModelStore:
+    """Serves model_data built from memory-mapped arrays, loaded on first use."""
+
+    def __init__(self, source_path: str = 'models.pkl', store_dir: str = 'model_store'):
+        self.source_path = source_path
+        self.store_dir = store_dir
+        # Swapped as a single reference, so readers see the old or the new model, never a mix
+        self._active: Optional[LoadedModel] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._watch_stop = threading.Event()
+        self._failed_signature: Optional[Tuple[int, int]] = None
+        self._last_error: Optional[str] = None
+        self._metrics = {'reloads': 0, 'failed_reloads': 0}
+
+    def get(self) -> Optional[Dict]:
+        """Return the serving model_data, loading it on first call."""
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._active = self._load()
+                    self._loaded = True
+        active = self._active
+        return active.model_data if active else None
+
+    def warm_up(self) -> bool:
+        """Load the store and score a sample profile so pages are faulted in."""
+        model_data = self.get()
+        if not model_data:
+            return False
+        _warm(model_data)
+        return True
+
+    def check_for_update(self) -> bool:
+        """Load and warm a newly published version, then swap it in. Returns True on a swap."""
+        if not self._loaded:
+            return False  # nothing served yet; the first get() loads the latest version
+        signature = source_signature(self.source_path)
+        if signature is not None and signature == self._failed_signature:
+            return False  # same broken artifact as last time
+        with self._lock:
+            started = time.perf_counter()
+            try:
+                current = self._resolve()
+                active = self._active
+                if current is None or (active is not None and current['version'] == active.version):
+                    return False
+                candidate = self._open(current, started)
+                _warm(candidate.model_data)
+                candidate.load_seconds = time.perf_counter() - started
+            except Exception as e:
+                self._failed_signature = signature
+                self._last_error = f"{type(e).__name__}: {e}"
+                self._metrics['failed_reloads'] += 1
+                logger.warning(f"Model reload from {self.source_path} failed: {self._last_error}")
+                return False
+            self._active = candidate
+            self._failed_signature = self._last_error = None
+            self._metrics['reloads'] += 1
+        logger.info(f"Serving model version {candidate.version} (was {active.version if active else None}, "
+                    f"loaded in {candidate.load_seconds:.2f}s)")
+        return True
+
+    def start_watching(self, interval: float = 5.0) -> None:
+        """Check for new versions every interval seconds in the background."""
+        if self._watcher is None:
+            self._watch_stop.clear()
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True, name='model-watcher')
+            self._watcher.start()
+
+    def stop_watching(self) -> None:
+        self._watch_stop.set()
+        self._watcher = None
+
+    def info(self) -> Dict:
+        """Active version, when it was published and loaded, and reload counters for this process."""
+        active = self._active
+        return {
+            'version': active.version if active else None,
+            'source_path': self.source_path,
+            'published_at': datetime.fromtimestamp(active.published_at).isoformat() if active else None,
+            'loaded_at': datetime.fromtimestamp(active.loaded_at).isoformat() if active else None,
+            'load_seconds': round(active.load_seconds, 4) if active else None,
+            'pid': os.getpid(),
+            'watching': self._watcher is not None,
+            **self._metrics,
+            'last_error': self._last_error,
+        }
+
+    def _watch(self, interval: float) -> None:
+        while not self._watch_stop.wait(interval):
+            self.check_for_update()
+
+    def _load(self) -> Optional[LoadedModel]:
+        started = time.perf_counter()
+        if not os.path.exists(self.source_path) and read_current(self.store_dir) is not None:
+            logger.warning(f"{self.source_path} not found, serving existing model store")
+        current = self._resolve()
+        return self._open(current, started) if current is not None else None
+
+    def _resolve(self) -> Optional[Dict]:
+        """The CURRENT record to serve, building a version first if models.pkl is newer."""
+        current = read_current(self.store_dir)
+        if current is None or not self._is_fresh(current):
+            if not os.path.exists(self.source_path):
+                return current
+            logger.info(f"Building model store in {self.store_dir} from {self.source_path}")
+            current = build_store(self.source_path, self.store_dir)
+        return current
+
+    def _is_fresh(self, current: Dict) -> bool:
+        return source_signature(self.source_path) == (current['source_mtime_ns'], current['source_size'])
+
+    def _open(self, current: Dict, started: float) -> LoadedModel:
+        version_dir = os.path.join(self.store_dir, current['version'])
+        with open(os.path.join(version_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+        arrays = {}
+        for name in ENGINE_ARRAYS:
+            # Plain ndarray view of the memmap keeps indexing on the fast path
+            mapped = np.load(os.path.join(version_dir, f'{name}.npy'), mmap_mode='r')
+            arrays[name] = mapped.view(np.ndarray)
+        model_data = {
+            'encoder': utils.FeatureEncoder(manifest['loyalty_classes'], manifest['purpose_classes']),
+            'engine': InferenceEngine(arrays),
+            'segment_labels': {int(k): v for k, v in manifest['segment_labels'].items()},
+        }
+        return LoadedModel(model_data, current['version'], current['published_at'], time.time(),
+                           time.perf_counter() - started)
+
+
+def source_signature(source_path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(source_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_current(store_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(store_dir, CURRENT_NAME)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def build_store(source_path: str, store_dir: str, keep_versions: int = KEEP_VERSIONS) -> Dict:
+    """Build the version for source_path (once) and publish it as CURRENT. Returns the CURRENT record."""
+    os.makedirs(store_dir, exist_ok=True)
+    with _build_lock(store_dir):
+        signature = source_signature(source_path)
+        current = read_current(store_dir)
+        # Another worker may have published this artifact while we waited for the lock
+        if current is not None and (current['source_mtime_ns'], current['source_size']) == signature:
+            return current
+
+        version = _file_digest(source_path)[:12]
+        version_dir = os.path.join(store_dir, version)
+        if not os.path.exists(os.path.join(version_dir, MANIFEST_NAME)):
+            _build_version(source_path, version, version_dir)
+        current = {
+            'version': version,
+            'source_path': source_path,
+            'source_mtime_ns': signature[0],
+            'source_size': signature[1],
+            'published_at': time.time(),
+        }
+        # Renamed into place so concurrent workers never read a partial record
+        _atomic_write(os.path.join(store_dir, CURRENT_NAME), lambda f: f.write(json.dumps(current, indent=2).encode()))
+        _prune(store_dir, version, keep_versions)
+    return current
+
+
+def _build_version(source_path: str, version: str, version_dir: str) -> None:
+    model_data = utils.load_models(source_path)
+    # Built in a scratch directory and renamed, so a version directory is always complete
+    tmp_dir = f'{version_dir}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for name, array in compile_arrays(model_data).items():
+        np.save(os.path.join(tmp_dir, f'{name}.npy'), array)
+    manifest = {
+        'version': version,
+        'built_at': time.time(),
+        'loyalty_classes': [str(c) for c in model_data['le_loyalty'].classes_],
+        'purpose_classes': [str(c) for c in model_data['le_purpose'].classes_],
+        'segment_labels': {str(int(k)): v for k, v in model_data['segment_labels'].items()},
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(version_dir, ignore_errors=True)  # leftovers without a manifest
+    os.rename(tmp_dir, version_dir)
+
+
+def _prune(store_dir: str, current_version: str, keep_versions: int) -> None:
+    """Remove all but the newest keep_versions old versions. Open mappings survive the unlink."""
+    entries = list(os.scandir(store_dir))
+    for entry in entries:
+        # Arrays and manifest from the unversioned layout
+        if entry.is_file() and (entry.name.endswith('.npy') or entry.name == MANIFEST_NAME):
+            os.remove(entry.path)
+    old = [entry for entry in entries
+           if entry.is_dir() and entry.name != current_version and not entry.name.endswith('.tmp')]
+    old.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in old[keep_versions:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+@contextmanager
+def _build_lock(store_dir: str):
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(store_dir, LOCK_NAME), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _warm(model_data: Dict) -> None:
+    """Score a sample profile so the arrays' pages are faulted in."""
+    profile = {
+        'age': 40, 'loyalty_tier': '', 'avg_spend': 0.0,
+        'last_stay_days_ago': 0, 'travel_purpose': ''
+    }
+    _, segment_id = utils.predict_traveler_segment(model_data, profile)
+    utils.predict_booking_prob(model_data, profile, segment_id)
+
+
+def _atomic_write(path: str, write) -> None:
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
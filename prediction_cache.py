@@ -0,0 +1,204 @@
+"""LRU/TTL cache of traveler predictions keyed on encoded features.
+
+The same profile combinations reach /predict over and over, so segment and
+booking probability are cached per encoded feature row. avg_spend and
+last_stay_days_ago can be quantized to buckets so near-identical profiles
+share an entry; each bucket is scored at its representative value, so a
+profile's result does not depend on which bucket member was scored first.
+The cache empties itself when models.pkl changes or a different model is
+passed in.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import utils
+
+# Encoded feature columns (see FeatureEncoder.encode_profile)
+SPEND_COLUMN = 1
+RECENCY_COLUMN = 2
+
+
+class PredictionCache:
+    """
+    Bounded LRU with per-entry TTL in front of predict_traveler_segment and
+    predict_booking_prob. spend_bucket / recency_bucket of 0 keep exact values.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 3600, spend_bucket: float = 0,
+                 recency_bucket: float = 0, source_path: Optional[str] = 'models.pkl',
+                 check_interval: float = 1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.spend_bucket = spend_bucket
+        self.recency_bucket = recency_bucket
+        self._buckets = [(column, width) for column, width in
+                         ((SPEND_COLUMN, spend_bucket), (RECENCY_COLUMN, recency_bucket)) if width]
+        self.source_path = source_path
+        self.check_interval = check_interval
+        self._entries: "OrderedDict[bytes, Tuple[int, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._model_data: Optional[Dict] = None
+        self._source_signature = self._stat_source()
+        self._next_check = time.time() + check_interval
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0,
+                         'hit_seconds': 0.0, 'miss_seconds': 0.0}
+
+    @classmethod
+    def from_env(cls, source_path: str = 'models.pkl') -> 'PredictionCache':
+        return cls(
+            max_entries=int(os.getenv('PREDICTION_CACHE_SIZE', 10000)),
+            ttl=float(os.getenv('PREDICTION_CACHE_TTL', 3600)),
+            spend_bucket=float(os.getenv('PREDICTION_CACHE_SPEND_BUCKET', 0)),
+            recency_bucket=float(os.getenv('PREDICTION_CACHE_RECENCY_BUCKET', 0)),
+            source_path=source_path,
+        )
+
+    def quantize(self, features: np.ndarray) -> np.ndarray:
+        """Round spend and recency columns to the nearest bucket (in place)."""
+        for column, width in self._buckets:
+            if len(features) == 1:
+                # Scalar path: a ufunc call costs more than the lookup it saves
+                features[0, column] = round(features[0, column] / width) * width
+            else:
+                features[:, column] = np.rint(features[:, column] / width) * width
+        return features
+
+    def predict(self, model_data: Dict, profile: Dict) -> Tuple[str, int, float]:
+        """(segment_label, segment_id, booking_probability) for one profile."""
+        started = time.perf_counter()
+        features = self.quantize(utils.encode_profile(model_data, profile))
+        key = features.tobytes()
+        self._check_model(model_data)
+        cached = self._get(key)
+        if cached is not None:
+            segment_id, prob = cached
+            self._record('hits', 'hit_seconds', started)
+        else:
+            _, segment_id = utils.predict_traveler_segment(model_data, profile, features=features)
+            prob = float(utils.predict_booking_prob(model_data, profile, segment_id, features=features))
+            segment_id = int(segment_id)
+            self._put(model_data, key, segment_id, prob)
+            self._record('misses', 'miss_seconds', started)
+        return model_data['segment_labels'][segment_id], segment_id, prob
+
+    def predict_batch(self, model_data: Dict, profiles: List[Dict]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """Batch version of predict(); only uncached rows are scored, as one matrix."""
+        started = time.perf_counter()
+        features = self.quantize(utils.encode_profiles(model_data, profiles))
+        self._check_model(model_data)
+        segment_ids = np.empty(len(profiles), dtype=np.int64)
+        probs = np.empty(len(profiles), dtype=np.float64)
+        keys = [row.tobytes() for row in features]
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self._get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                segment_ids[i], probs[i] = cached
+        if missing:
+            missing_profiles = [profiles[i] for i in missing]
+            _, missing_ids = utils.predict_traveler_segments_batch(model_data, missing_profiles, features=features[missing])
+            probs[missing] = utils.predict_booking_probs_batch(model_data, missing_profiles, missing_ids, features=features[missing])
+            segment_ids[missing] = missing_ids
+            for i in missing:
+                self._put(model_data, keys[i], int(segment_ids[i]), float(probs[i]))
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            hits = len(profiles) - len(missing)
+            self._metrics['hits'] += hits
+            self._metrics['misses'] += len(missing)
+            # Apportion the call's time across its rows
+            if profiles:
+                self._metrics['hit_seconds'] += elapsed * hits / len(profiles)
+                self._metrics['miss_seconds'] += elapsed * len(missing) / len(profiles)
+        labels = [model_data['segment_labels'][segment_id] for segment_id in segment_ids]
+        return labels, segment_ids, probs
+
+    def stats(self) -> Dict:
+        """Hit rate plus mean latency of hits and misses and the time hits saved."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            entries = len(self._entries)
+        hits, misses = metrics.pop('hits'), metrics.pop('misses')
+        hit_seconds, miss_seconds = metrics.pop('hit_seconds'), metrics.pop('miss_seconds')
+        avg_hit = hit_seconds / hits if hits else None
+        avg_miss = miss_seconds / misses if misses else None
+        return {
+            **metrics,
+            'hits': hits,
+            'misses': misses,
+            'entries': entries,
+            'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+            'avg_hit_us': round(avg_hit * 1e6, 1) if avg_hit is not None else None,
+            'avg_miss_us': round(avg_miss * 1e6, 1) if avg_miss is not None else None,
+            'saved_seconds': round(hits * (avg_miss - avg_hit), 3) if avg_hit is not None and avg_miss is not None else None,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._metrics['invalidations'] += 1
+
+    def _check_model(self, model_data: Dict) -> None:
+        """Drop every entry when the model object or models.pkl changes."""
+        if model_data is not self._model_data:
+            with self._lock:
+                if self._model_data is not None:
+                    self._entries.clear()
+                    self._metrics['invalidations'] += 1
+                self._model_data = model_data
+        now = time.time()
+        if now >= self._next_check:
+            self._next_check = now + self.check_interval
+            signature = self._stat_source()
+            if signature != self._source_signature:
+                self._source_signature = signature
+                self.clear()
+
+    def _stat_source(self) -> Optional[Tuple[int, int]]:
+        if not self.source_path:
+            return None
+        try:
+            stat = os.stat(self.source_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _get(self, key: bytes) -> Optional[Tuple[int, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            segment_id, prob, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self._metrics['expirations'] += 1
+                return None
+            self._entries.move_to_end(key)
+            return segment_id, prob
+
+    def _put(self, model_data: Dict, key: bytes, segment_id: int, prob: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if model_data is not self._model_data:
+                return  # scored by a model that was swapped out meanwhile
+            self._entries[key] = (segment_id, prob, time.time() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+
+    def _record(self, counter: str, timer: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._metrics[counter] += 1
+            self._metrics[timer] += elapsed
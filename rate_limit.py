@@ -0,0 +1,29 @@
+"""Rate limiting shared by outbound clients (email delivery, event prefetching)."""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing rate_per_second tokens, bursting up to capacity."""
+
+    def __init__(self, rate_per_second, capacity=None):
+        self.rate = float(rate_per_second)
+        self.capacity = float(capacity or rate_per_second)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` tokens are available, then take them."""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_seconds = (tokens - self._tokens) / self.rate
+            time.sleep(wait_seconds)
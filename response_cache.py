@@ -0,0 +1,82 @@
+"""Serialized-response cache with strong ETags for read-heavy GET endpoints.
+
+Bodies are serialized once and stored as bytes, keyed by normalized request
+parameters and tagged with the version of the data they were built from. A
+lookup with a different data version is a miss, so entries never outlive the
+data behind them.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Optional
+
+
+def make_etag(data: bytes) -> str:
+    return '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison (weak, per RFC 9110), including '*' and lists."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in (tag[2:] if tag.startswith('W/') else tag for tag in candidates)
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    etag: str
+    media_type: str
+    version: Any
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class ResponseCache:
+    """LRU of serialized responses bounded by total body bytes."""
+
+    def __init__(self, max_bytes: int = 64 * 2**20):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key: Hashable, version: Any) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.version != version:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self._metrics['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._metrics['hits'] += 1
+            return entry
+
+    def put(self, key: Hashable, version: Any, body: bytes, media_type: str = 'application/json',
+            headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        """Store a body (if it fits) and return it with its ETag."""
+        entry = CachedResponse(body, make_etag(body), media_type, version, dict(headers or {}))
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._metrics['evictions'] += 1
+        return entry
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._metrics, entries=len(self._entries), bytes=self._bytes)
+
+    def _remove(self, key: Hashable) -> None:
+        # Caller holds self._lock
+        self._bytes -= len(self._entries.pop(key).body)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Bulk scoring of traveler files.
+
+Streams a traveler_data.csv-shaped CSV or Parquet file in chunks through the
+segmentation and booking models and appends segment, booking probability
+and estimated LTV for every row to the output, in input order, as chunks
+finish. Chunks are scored on a process pool whose workers open the
+memory-mapped model store, so the models are shared rather than copied per
+process. At most two chunks per worker are in flight, which bounds memory
+whatever the input size.
+
+    python3 score_travelers.py traveler_data.csv scores.csv
+    python3 score_travelers.py guests.parquet scores.parquet --workers 8 --chunk-size 100000
+
+Parquet input and output need pyarrow.
+"""
+
+import argparse
+import logging
+import os
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import utils
+from model_store import ModelStore
+
+logger = logging.getLogger(__name__)
+
+# Input columns the models read
+FEATURE_COLUMNS = ['age', 'loyalty_tier', 'avg_spend', 'last_stay_days_ago', 'travel_purpose']
+SCORE_COLUMNS = ['segment_label', 'segment_id', 'booking_probability', 'estimated_ltv']
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Set in each pool worker by _init_worker
+_model_data: Optional[Dict] = None
+
+
+def is_parquet(path: str) -> bool:
+    return path.lower().endswith(('.parquet', '.pq'))
+
+
+def read_chunks(path: str, chunk_size: int, columns: List[str]) -> Iterator[pd.DataFrame]:
+    """Yield DataFrames of up to chunk_size rows holding only the given columns."""
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        # Categorical columns are read as-is; the encoder maps labels to codes
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+
+
+class ChunkWriter:
+    """Appends scored chunks to a CSV or Parquet file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+        self._parquet_writer = None
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if is_parquet(self.path):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            header = self._file is None
+            if header:
+                self._file = open(self.path, 'w', newline='')
+            frame.to_csv(self._file, header=header, index=False)
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def score_frame(model_data: Dict, frame: pd.DataFrame) -> pd.DataFrame:
+    """Segment, booking probability and estimated LTV for each row of frame."""
+    features = utils.encode_frame(model_data, frame)
+    engine = utils.get_engine(model_data)
+    segment_ids = engine.predict_segment(features)
+    probs = np.empty(len(frame), dtype=np.float64)
+    # The forest's working set grows with rows x trees, so score in bounded slices
+    for start in range(0, len(frame), utils.BATCH_CHUNK_SIZE):
+        end = start + utils.BATCH_CHUNK_SIZE
+        probs[start:end] = engine.predict_proba(np.column_stack([features[start:end], segment_ids[start:end]]))[:, 1]
+    labels = [model_data['segment_labels'][segment_id] for segment_id in segment_ids]
+    return pd.DataFrame({
+        'segment_label': labels,
+        'segment_id': segment_ids,
+        'booking_probability': probs,
+        'estimated_ltv': utils.estimate_ltvs(frame['avg_spend'].to_numpy(), labels),
+    })
+
+
+def _init_worker(source_path: str, store_dir: str) -> None:
+    global _model_data
+    _model_data = ModelStore(source_path, store_dir).get()
+
+
+def _score_chunk(frame: pd.DataFrame) -> pd.DataFrame:
+    return score_frame(_model_data, frame)
+
+
+def score_file(input_path: str, output_path: str, workers: Optional[int] = None,
+               chunk_size: int = DEFAULT_CHUNK_SIZE, keep_columns: Optional[List[str]] = None,
+               source_path: str = 'models.pkl', store_dir: str = 'model_store') -> Dict:
+    """
+    Score input_path into output_path. keep_columns are copied from the input
+    ahead of the scores (default: email, if the file has it). Returns run stats.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Build or refresh the model store once, before any worker opens it
+    model_data = ModelStore(source_path, store_dir).get()
+    if model_data is None:
+        raise FileNotFoundError(f"No models at {source_path} or {store_dir}")
+    if keep_columns is None:
+        keep_columns = ['email'] if 'email' in _input_columns(input_path) else []
+    columns = list(dict.fromkeys(keep_columns + FEATURE_COLUMNS))
+
+    started = time.perf_counter()
+    rows = chunks = 0
+    writer = ChunkWriter(output_path)
+
+    def write(kept: pd.DataFrame, scores: pd.DataFrame) -> None:
+        nonlocal rows, chunks
+        writer.write(pd.concat([kept.reset_index(drop=True), scores], axis=1))
+        rows += len(scores)
+        chunks += 1
+
+    try:
+        if workers == 1:
+            for frame in read_chunks(input_path, chunk_size, columns):
+                write(frame[keep_columns], score_frame(model_data, frame))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(source_path, store_dir)) as pool:
+                in_flight = deque()
+                for frame in read_chunks(input_path, chunk_size, columns):
+                    in_flight.append((frame[keep_columns], pool.submit(_score_chunk, frame[FEATURE_COLUMNS])))
+                    # Backpressure: stop reading until the oldest chunk is written
+                    if len(in_flight) >= 2 * workers:
+                        kept, future = in_flight.popleft()
+                        write(kept, future.result())
+                while in_flight:
+                    kept, future = in_flight.popleft()
+                    write(kept, future.result())
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'chunks': chunks,
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed) if elapsed else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+
+
+def _input_columns(path: str) -> List[str]:
+    if is_parquet(path):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).schema_arrow.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident memory of this process and its largest finished worker."""
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 2**20 if sys.platform == 'darwin' else 2**10
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / scale
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="Traveler CSV or Parquet file")
+    parser.add_argument("output", help="Scores file (.csv or .parquet)")
+    parser.add_argument("--workers", type=int, default=None, help="Scoring processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--keep", nargs="*", default=None, help="Input columns to copy to the output (default: email)")
+    parser.add_argument("--models", default='models.pkl')
+    parser.add_argument("--model-store", default='model_store')
+    args = parser.parse_args()
+
+    stats = score_file(args.input, args.output, args.workers, args.chunk_size, args.keep,
+                       args.models, args.model_store)
+    logger.info(f"Scored {stats['rows']:,} rows in {stats['seconds']}s ({stats['rows_per_second']:,} rows/s, "
+                f"{stats['workers']} workers, peak RSS {stats['peak_rss_mb']}MB)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,91 @@
+"""Request coalescing: concurrent callers for the same key share one computation."""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Iterable, List, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    The first caller for a key runs the computation; callers arriving while it
+    is in flight wait for and share its result (or exception). Nothing is
+    cached once the call finishes. With enabled=False every caller computes.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._metrics = {'leaders': 0, 'followers': 0}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            self._metrics['leaders' if leader else 'followers'] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def do_many(self, keys: Iterable[Hashable], fn: Callable[[List[Hashable]], Dict[Hashable, T]]) -> Dict[Hashable, T]:
+        """
+        Like do() for a batch: fn(owned_keys) computes the keys nobody else has
+        in flight and returns {key: value}; the other keys are awaited. fn runs
+        before waiting, so overlapping batches cannot deadlock.
+        """
+        keys = list(keys)
+        if not self.enabled:
+            return fn(keys)
+        owned, waiting = [], {}
+        with self._lock:
+            for key in keys:
+                future = self._calls.get(key)
+                if future is None:
+                    self._calls[key] = Future()
+                    owned.append(key)
+                else:
+                    waiting[key] = future
+            self._metrics['leaders'] += len(owned)
+            self._metrics['followers'] += len(waiting)
+
+        results = {}
+        if owned:
+            try:
+                results = fn(owned)
+                for key in owned:
+                    if key in results:
+                        self._calls[key].set_result(results[key])
+                    else:
+                        self._calls[key].set_exception(KeyError(key))
+            except BaseException as e:
+                for key in owned:
+                    if not self._calls[key].done():
+                        self._calls[key].set_exception(e)
+                raise
+            finally:
+                with self._lock:
+                    for key in owned:
+                        del self._calls[key]
+        for key, future in waiting.items():
+            results[key] = future.result()
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._metrics, in_flight=len(self._calls))
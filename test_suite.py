@@ -1,9 +1,42 @@
 import unittest
+import json
+import time
+import threading
 import utils
 import os
+import tempfile
 import joblib
-from cdp_service import CDPService
-from email_service import EmailService
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+import inference_engine
+from inference_engine import InferenceEngine
+from model_store import ModelStore, read_current
+from prediction_cache import PredictionCache
+from score_travelers import score_file
+from train_model import StageReport, load_compact, train_scalable
+from cdp_service import SnapshotNotFound, SnapshotStore
+from cdp_service import AUDIENCE_COLUMNS, CDPService
+from email_service import DeliveryEngine, EmailService, HttpEmailProvider
+from rate_limit import TokenBucket
+from datetime import date, datetime, timedelta
+from event_cache import FRESH, STALE, EventCache
+from event_service import IMPACT_WEIGHTS, EventImpact, EventService
+from event_prefetch import PrefetchScheduler
+from single_flight import SingleFlight
+from response_cache import ResponseCache, etag_matches
+import fast_json
+import asyncio
+import subprocess
+import sys
+import textwrap
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+import api
+from executors import BoundedExecutor, ExecutorSaturated
+from micro_batcher import MicroBatcher
+from fake_servers import EmailSinkServer, EventProviderServer
+from campaign_jobs import CampaignJobManager
 
 class TestHarriotAI(unittest.TestCase):
     def setUp(self):
@@ -36,6 +69,251 @@ class TestHarriotAI(unittest.TestCase):
         print(f"Test 1 Probability: {prob}")
         self.assertTrue(0 <= prob <= 1, "Probability must be between 0 and 1")
 
+    def test_batch_prediction_matches_single(self):
+        profiles = [
+            {'age': 55, 'loyalty_tier': 'Titanium', 'avg_spend': 2000, 'last_stay_days_ago': 5,
+             'travel_purpose': 'Leisure', 'preferred_amenities': 'Spa'},
+            {'age': 34, 'loyalty_tier': 'Silver', 'avg_spend': 450.5, 'last_stay_days_ago': 45,
+             'travel_purpose': 'Business', 'preferred_amenities': 'Gym'},
+            {'age': 28, 'loyalty_tier': 'Unobtainium', 'avg_spend': 200, 'last_stay_days_ago': 120,
+             'travel_purpose': 'Bleisure', 'preferred_amenities': 'Pool'},
+        ]
+        # Small chunk size so the chunking path is exercised too
+        labels, seg_ids = utils.predict_traveler_segments_batch(self.model_data, profiles, chunk_size=2)
+        probs = utils.predict_booking_probs_batch(self.model_data, profiles, seg_ids, chunk_size=2)
+
+        for i, profile in enumerate(profiles):
+            segment, seg_id = utils.predict_traveler_segment(self.model_data, profile)
+            prob = utils.predict_booking_prob(self.model_data, profile, seg_id)
+            self.assertEqual(labels[i], segment)
+            self.assertEqual(seg_ids[i], seg_id)
+            self.assertEqual(probs[i], prob)
+
+    def test_feature_encoder_matches_label_encoders(self):
+        encoder = self.model_data['encoder']
+        for tier in self.model_data['le_loyalty'].classes_:
+            expected = self.model_data['le_loyalty'].transform([tier])[0]
+            self.assertEqual(encoder.loyalty_codes[tier], expected)
+
+        # Unknown labels fall back to 0, scalar and vectorized
+        tiers = list(self.model_data['le_loyalty'].classes_) + ['Unobtainium', 'Zzz']
+        codes = encoder.encode_loyalty(tiers)
+        self.assertEqual(list(codes[:-2]), list(self.model_data['le_loyalty'].transform(tiers[:-2])))
+        self.assertEqual(list(codes[-2:]), [0, 0])
+        self.assertEqual(list(encoder.encode_purpose(['Business', 'Leisure', 'Bleisure'])), [0, 1, 0])
+
+    def test_inference_engine_matches_sklearn(self):
+        engine = self.model_data['engine']
+        rng = np.random.default_rng(42)
+        n = 5000
+        X = np.column_stack([
+            rng.integers(18, 80, n),
+            rng.uniform(0, 3000, n),
+            rng.integers(0, 400, n),
+            rng.integers(0, len(self.model_data['le_loyalty'].classes_), n),
+            rng.integers(0, len(self.model_data['le_purpose'].classes_), n),
+        ]).astype(float)
+        # Include the training rows themselves
+        df = pd.read_csv('traveler_data.csv')
+        X = np.vstack([X, utils.encode_profiles(self.model_data, df.to_dict('records'))])
+
+        expected_segments = self.model_data['kmeans'].predict(self.model_data['scaler'].transform(X))
+        np.testing.assert_array_equal(engine.predict_segment(X), expected_segments)
+
+        X6 = np.column_stack([X, expected_segments])
+        np.testing.assert_array_equal(engine.predict_proba(X6), self.model_data['rf_model'].predict_proba(X6))
+
+    def test_inference_engine_single_row_paths_match_matrix_path(self):
+        engine = self.model_data['engine']
+        X6 = np.array([[55, 2000, 5, 4, 1, 1], [34, 450, 45, 3, 0, 0], [28, 200.5, 120, 0, 1, 2]], dtype=float)
+        batched = engine.predict_proba(X6)
+        # Dense (all-node) and per-level single-row traversals
+        for nodes_per_level in (inference_engine.DENSE_ROW_NODES_PER_LEVEL, 0):
+            with patch.object(inference_engine, 'DENSE_ROW_NODES_PER_LEVEL', nodes_per_level):
+                for i in range(len(X6)):
+                    np.testing.assert_array_equal(engine.predict_proba(X6[i:i + 1]), batched[i:i + 1])
+
+    def test_model_store_matches_eager_load(self):
+        profile = {'age': 41, 'loyalty_tier': 'Gold', 'avg_spend': 800, 'last_stay_days_ago': 30,
+                   'travel_purpose': 'Business', 'preferred_amenities': 'Spa'}
+        with tempfile.TemporaryDirectory() as tmp:
+            store = ModelStore(store_dir=os.path.join(tmp, 'store'))
+            self.assertFalse(os.path.exists(store.store_dir), "Store should load lazily")
+            self.assertTrue(store.warm_up())
+            self.assertTrue(os.path.exists(os.path.join(store.store_dir, 'CURRENT')))
+
+            served = store.get()
+            segment, seg_id = utils.predict_traveler_segment(served, profile)
+            expected_segment, expected_id = utils.predict_traveler_segment(self.model_data, profile)
+            self.assertEqual((segment, seg_id), (expected_segment, expected_id))
+            self.assertEqual(utils.predict_booking_prob(served, profile, seg_id),
+                             utils.predict_booking_prob(self.model_data, profile, expected_id))
+
+            # A second store reuses the files on disk
+            reopened = ModelStore(store_dir=store.store_dir).get()
+            self.assertIsInstance(reopened['engine'], InferenceEngine)
+
+    def test_model_store_hot_reload(self):
+        profile = {'age': 41, 'loyalty_tier': 'Gold', 'avg_spend': 800, 'last_stay_days_ago': 30,
+                   'travel_purpose': 'Business'}
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'models.pkl')
+            joblib.dump(utils.load_models(), source)
+            store_dir = os.path.join(tmp, 'store')
+            # Two stores on one directory stand in for two uvicorn workers
+            worker_a, worker_b = ModelStore(source, store_dir), ModelStore(source, store_dir)
+            old = worker_a.get()
+            worker_b.get()
+            first_version = worker_a.info()['version']
+            self.assertEqual(worker_b.info()['version'], first_version)
+            self.assertFalse(worker_a.check_for_update())
+
+            retrained = utils.load_models(source)
+            retrained['segment_labels'] = {k: v.upper() for k, v in retrained['segment_labels'].items()}
+            joblib.dump(retrained, source)
+            self.assertTrue(worker_a.check_for_update())
+            new = worker_a.get()
+            self.assertIsNot(new, old)
+            self.assertNotEqual(worker_a.info()['version'], first_version)
+            self.assertEqual(utils.predict_traveler_segment(new, profile)[0],
+                             utils.predict_traveler_segment(old, profile)[0].upper())
+            # In-flight holders of the old model keep scoring on it
+            self.assertIn(utils.predict_traveler_segment(old, profile)[0], old['segment_labels'].values())
+
+            # The other worker opens the published version instead of rebuilding it
+            published = read_current(store_dir)
+            self.assertTrue(worker_b.check_for_update())
+            self.assertEqual(read_current(store_dir), published)
+            self.assertEqual(worker_b.info()['version'], worker_a.info()['version'])
+
+            # A broken artifact leaves the active version serving
+            with open(source, 'wb') as f:
+                f.write(b'not a pickle')
+            self.assertFalse(worker_a.check_for_update())
+            self.assertIs(worker_a.get(), new)
+            self.assertEqual(worker_a.info()['failed_reloads'], 1)
+            self.assertIsNotNone(worker_a.info()['last_error'])
+
+    def test_prediction_cache(self):
+        profile = {'age': 34, 'loyalty_tier': 'Silver', 'avg_spend': 450.5, 'last_stay_days_ago': 45,
+                   'travel_purpose': 'Business', 'preferred_amenities': 'Gym'}
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, 'models.pkl')
+            with open(source, 'wb') as f:
+                f.write(b'v1')
+            cache = PredictionCache(source_path=source, check_interval=0)
+            segment, seg_id = utils.predict_traveler_segment(self.model_data, profile)
+            prob = utils.predict_booking_prob(self.model_data, profile, seg_id)
+            for _ in range(2):
+                self.assertEqual(cache.predict(self.model_data, profile), (segment, seg_id, prob))
+            labels, seg_ids, probs = cache.predict_batch(self.model_data, [profile, {**profile, 'age': 60}])
+            self.assertEqual((labels[0], seg_ids[0], probs[0]), (segment, seg_id, prob))
+            stats = cache.stats()
+            self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 2, 2))
+
+            # Rewriting the model file empties the cache
+            with open(source, 'wb') as f:
+                f.write(b'v2-retrained')
+            cache.predict(self.model_data, profile)
+            self.assertEqual(cache.stats()['invalidations'], 1)
+            self.assertEqual(cache.stats()['entries'], 1)
+
+        # Buckets share one entry, scored at the bucket's representative value
+        cache = PredictionCache(spend_bucket=100, recency_bucket=10, source_path=None)
+        first = cache.predict(self.model_data, {**profile, 'avg_spend': 470, 'last_stay_days_ago': 41})
+        second = cache.predict(self.model_data, {**profile, 'avg_spend': 520, 'last_stay_days_ago': 38})
+        rounded = {**profile, 'avg_spend': 500, 'last_stay_days_ago': 40}
+        segment, seg_id = utils.predict_traveler_segment(self.model_data, rounded)
+        self.assertEqual(first, second)
+        self.assertEqual(first, (segment, seg_id, utils.predict_booking_prob(self.model_data, rounded, seg_id)))
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_micro_batcher_scores_concurrent_rows_together(self):
+        def score_rows(profiles):
+            labels, seg_ids, probs = PredictionCache(max_entries=0, source_path=None).predict_batch(self.model_data, profiles)
+            return list(zip(labels, seg_ids.tolist(), probs.tolist()))
+
+        batcher = MicroBatcher(score_rows, max_batch_size=8, max_wait_ms=50)
+        profiles = [{'age': 20 + i, 'loyalty_tier': 'Gold', 'avg_spend': 300.0 + 50 * i, 'last_stay_days_ago': i,
+                     'travel_purpose': 'Business'} for i in range(20)]
+        try:
+            futures = [batcher.submit(profile) for profile in profiles]
+            for profile, future in zip(profiles, futures):
+                segment, seg_id = utils.predict_traveler_segment(self.model_data, profile)
+                label, batched_id, prob = future.result(timeout=5)
+                self.assertEqual((label, batched_id), (segment, seg_id))
+                self.assertAlmostEqual(prob, utils.predict_booking_prob(self.model_data, profile, seg_id))
+            stats = batcher.stats()
+            self.assertEqual(stats['items'], 20)
+            self.assertEqual(stats['max_batch'], 8)
+            self.assertLessEqual(stats['batches'], 4)
+
+            # A failing batch fails every caller in it
+            failing = MicroBatcher(lambda items: 1 / 0, max_wait_ms=1)
+            with self.assertRaises(ZeroDivisionError):
+                failing.submit(profiles[0]).result(timeout=5)
+            failing.stop()
+        finally:
+            batcher.stop()
+
+    def test_micro_batcher_survives_cancelled_callers(self):
+        release = threading.Event()
+        def score_rows(items):
+            release.wait(5)
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(score_rows, max_batch_size=8)
+        try:
+            first = batcher.submit(1)  # taken by the loop, which then blocks
+            time.sleep(0.05)
+            abandoned, kept = batcher.submit(2), batcher.submit(3)
+            # What asyncio.wrap_future does when the awaiting request is cancelled
+            self.assertTrue(abandoned.cancel())
+            release.set()
+            self.assertEqual(first.result(timeout=5), 2)
+            self.assertEqual(kept.result(timeout=5), 6)
+            self.assertEqual(batcher.submit(4).result(timeout=5), 8)
+            self.assertTrue(batcher._thread.is_alive())
+        finally:
+            release.set()
+            batcher.stop()
+
+    def test_bulk_scoring_matches_single_predictions(self):
+        source = pd.read_csv('traveler_data.csv')
+        with tempfile.TemporaryDirectory() as tmp:
+            # Several chunks across two processes, written back in input order
+            output = os.path.join(tmp, 'scores.csv')
+            stats = score_file('traveler_data.csv', output, workers=2, chunk_size=7)
+            scores = pd.read_csv(output)
+        self.assertEqual((stats['rows'], stats['chunks']), (len(source), 5))
+        self.assertEqual(list(scores['email']), list(source['email']))
+        for profile, row in zip(source.to_dict('records'), scores.itertuples()):
+            segment, seg_id = utils.predict_traveler_segment(self.model_data, profile)
+            self.assertEqual((row.segment_label, row.segment_id), (segment, seg_id))
+            self.assertAlmostEqual(row.booking_probability, utils.predict_booking_prob(self.model_data, profile, seg_id))
+            self.assertAlmostEqual(row.estimated_ltv, utils.estimate_ltv(profile['avg_spend'], segment))
+
+    def test_scalable_training_artifacts_load_and_score(self):
+        # Tiny chunks so categories are unified across chunks
+        compact = load_compact('traveler_data.csv', chunk_size=7)
+        source = pd.read_csv('traveler_data.csv')
+        self.assertEqual(str(compact['loyalty_tier'].dtype), 'category')
+        self.assertEqual(list(compact['loyalty_tier'].astype(str)), list(source['loyalty_tier']))
+
+        report = StageReport()
+        model_data = train_scalable('traveler_data.csv', report, chunk_size=7, n_jobs=2)
+        self.assertEqual(len(report.stages), 4)
+        self.assertEqual(sorted(model_data['segment_labels'].values()),
+                         ['Budget Explorer', 'Luxury Elite', 'Standard Business'])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'models.pkl')
+            joblib.dump(model_data, path)
+            loaded = utils.load_models(path)
+        profile = source.iloc[0].to_dict()
+        segment, seg_id = utils.predict_traveler_segment(loaded, profile)
+        self.assertEqual(segment, model_data['segment_labels'][seg_id])
+        self.assertTrue(0 <= utils.predict_booking_prob(loaded, profile, seg_id) <= 1)
+
     def test_genai_mock(self):
         copy, offer = utils.generate_personalized_copy("Luxury Elite", "Business")
         self.assertIn("Private Villa", copy) # Should reference the luxury offer
@@ -60,6 +338,140 @@ class TestHarriotAI(unittest.TestCase):
         except Exception as e:
             self.fail(f"CDP Service failed: {e}")
 
+    def test_cdp_store_matches_dataframe_filter(self):
+        df = pd.read_csv('traveler_data.csv')
+        expected = df[(df['travel_purpose'] == 'Business') & (df['distance_miles'] < 200) & (df['has_q2_booking'] == 0)]
+
+        cdp = CDPService()
+        audience = cdp.get_at_risk_business_travelers()
+        self.assertEqual([p['email'] for p in audience], expected['email'].tolist())
+        stats = cdp.get_audience_stats()
+        self.assertEqual(stats['audience_count'], len(expected))
+        self.assertEqual(stats['potential_revenue'], expected['avg_spend'].sum())
+
+        table = cdp.store.get()
+        cities = df['home_city'].unique()[:2].tolist()
+        self.assertEqual(table.category_mask('home_city', cities + ['Atlantis']).sum(), df['home_city'].isin(cities).sum())
+        self.assertFalse(table.category_mask('home_city', ['Atlantis']).any())
+
+    def test_cdp_store_reloads_only_on_change(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'travelers.csv')
+            df = pd.read_csv('traveler_data.csv')
+            df.to_csv(path, index=False)
+
+            cdp = CDPService(path)
+            table = cdp.store.get()
+            cdp.get_audience_stats()
+            self.assertIs(cdp.store.get(), table, "Unchanged file should not be re-read")
+
+            df.loc[:, 'has_q2_booking'] = 0
+            df.to_csv(path, index=False)
+            os.utime(path, ns=(table.version[0] + 10**9, table.version[0] + 10**9))
+            self.assertIsNot(cdp.store.get(), table)
+            expected = ((df['travel_purpose'] == 'Business') & (df['distance_miles'] < 200)).sum()
+            self.assertEqual(cdp.get_audience_stats()['audience_count'], expected)
+
+    def test_audience_query_engine(self):
+        df = pd.read_csv('traveler_data.csv')
+        cdp = CDPService()
+        definition = {'all': [
+            {'column': 'travel_purpose', 'op': 'in', 'value': ['Business']},
+            {'column': 'loyalty_tier', 'op': 'gte', 'value': 'Gold'},
+            {'column': 'last_stay_days_ago', 'op': 'between', 'value': [5, 30]},
+            {'not': {'column': 'home_city', 'op': 'eq', 'value': 'Boston'}},
+        ]}
+        expected = df[
+            (df['travel_purpose'] == 'Business') &
+            df['loyalty_tier'].isin(['Gold', 'Platinum', 'Titanium']) &
+            df['last_stay_days_ago'].between(5, 30) &
+            (df['home_city'] != 'Boston')
+        ]
+        result = cdp.query_audience(definition)
+        self.assertEqual([p['email'] for p in result.records()], expected['email'].tolist())
+        self.assertEqual(result.audience_count, len(expected))
+        self.assertEqual(result.potential_revenue, expected['avg_spend'].sum())
+
+        # Equivalent definitions share one cached result
+        reordered = {'all': list(reversed(definition['all']))}
+        self.assertIs(cdp.query_audience(reordered), result)
+
+        for bad in [{'column': 'nope', 'op': 'eq', 'value': 1},
+                    {'column': 'age', 'op': 'like', 'value': 1},
+                    {'column': 'age', 'op': 'lt', 'value': 'old'},
+                    {'column': 'home_city', 'op': 'gt', 'value': 'Boston'},
+                    # Value types that would otherwise reach NumPy as str/int comparisons
+                    {'column': 'loyalty_tier', 'op': 'gt', 'value': 3},
+                    {'column': 'travel_purpose', 'op': 'in', 'value': ['Business', 1]},
+                    {'column': 'email', 'op': 'eq', 'value': 5},
+                    {'column': 'age', 'op': 'gte', 'value': True},
+                    {'column': 'age', 'op': 'between', 'value': [False, 40]},
+                    {'any': []}]:
+            with self.assertRaises(ValueError):
+                cdp.query_audience(bad)
+
+        # The result cache is bounded by the bytes of the index arrays it holds
+        small = CDPService(audience_cache_bytes=result.indices.nbytes)
+        first = small.query_audience(definition)
+        self.assertIs(small.query_audience(definition), first)
+        small.query_audience({'column': 'age', 'op': 'gte', 'value': 0})  # larger than the whole budget
+        self.assertIs(small.query_audience(definition), first)
+        small.query_audience({'column': 'email', 'op': 'eq', 'value': df['email'][0]})
+        self.assertIsNot(small.query_audience(definition), first)
+        self.assertLessEqual(small._audience_cache_used, small.audience_cache_bytes)
+
+    def test_audience_json_writers(self):
+        cdp = CDPService()
+        result = cdp.query_audience({'column': 'distance_miles', 'op': 'lt', 'value': 200})
+        expected = result.records()
+        self.assertGreater(len(expected), 3)
+
+        # Small chunks so rows span several writer chunks; both encoders agree
+        for writer in (result.table.iter_json, result.table._iter_json_pandas):
+            def render(fmt):
+                return ''.join(writer(result.indices, AUDIENCE_COLUMNS, fmt, 3))
+
+            self.assertEqual(json.loads(render('records')), expected)
+            self.assertEqual([json.loads(line) for line in render('ndjson').splitlines()], expected)
+            columnar = json.loads(render('columnar'))
+            for column, values in columnar.items():
+                self.assertEqual(values, [row[column] for row in expected])
+
+    def test_audience_snapshot_pages_are_consistent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'travelers.csv')
+            df = pd.read_csv('traveler_data.csv')
+            df.to_csv(path, index=False)
+            cdp = CDPService(path)
+
+            snapshot = cdp.create_audience_snapshot()
+            page = cdp.get_audience_page(snapshot, 0, 4)
+            emails = page.snapshot.result.table.column_values('email', page.indices)
+
+            # Changing the file must not shift later pages of an existing snapshot
+            df.iloc[::-1].to_csv(path, index=False)
+            os.utime(path, ns=(snapshot.result.table.version[0] + 10**9,) * 2)
+            while page.next_cursor:
+                page = cdp.get_audience_page_by_cursor(page.next_cursor, 4)
+                emails += page.snapshot.result.table.column_values('email', page.indices)
+
+            expected = df[(df['travel_purpose'] == 'Business') & (df['distance_miles'] < 200) & (df['has_q2_booking'] == 0)]
+            self.assertEqual(emails, expected['email'].tolist())
+            self.assertEqual(snapshot.stats['audience_count'], len(expected))
+
+    def test_snapshot_store_ttl_and_lru(self):
+        store = SnapshotStore(ttl_seconds=60, max_snapshots=2)
+        first = store.create(None, {})
+        second = store.create(None, {})
+        store.get(first.snapshot_id)  # first is now most recently used
+        store.create(None, {})
+        with self.assertRaises(SnapshotNotFound):
+            store.get(second.snapshot_id)
+
+        first.expires_at = 0
+        with self.assertRaises(SnapshotNotFound):
+            store.get(first.snapshot_id)
+
     def test_email_service(self):
         email_svc = EmailService()
         recipients = [{'email': 'test@example.com', 'name': 'Tester'}]
@@ -69,5 +481,675 @@ class TestHarriotAI(unittest.TestCase):
         self.assertEqual(result['sent_count'], 1)
         self.assertEqual(result['details'][0]['email'], 'test@example.com')
 
+    def test_delivery_engine_retries_failed_recipients(self):
+        class FlakyProvider:
+            def __init__(self):
+                self.calls = []
+            def send_batch(self, messages):
+                self.calls.append([m['email'] for m in messages])
+                if len(self.calls) == 1:
+                    raise ConnectionError("provider down")
+                # Odd recipients fail once more before succeeding
+                return [{'email': m['email'],
+                         'status': 'failed' if len(self.calls) == 2 and m['email'].startswith('odd') else 'sent'}
+                        for m in messages]
+
+        provider = FlakyProvider()
+        engine = DeliveryEngine(provider, max_workers=1, batch_size=10, backoff_seconds=0)
+        recipients = [{'email': f'{"odd" if i % 2 else "even"}{i}@example.com'} for i in range(4)]
+        results = []
+        sent, failed = engine.deliver(recipients, "Subject", "Body", on_result=results.append)
+
+        self.assertEqual((sent, failed), (4, 0))
+        self.assertEqual(len(provider.calls), 3)
+        self.assertEqual(provider.calls[2], ['odd1@example.com', 'odd3@example.com'])
+        self.assertEqual(sorted(r['attempts'] for r in results), [2, 2, 3, 3])
+
+    def test_email_service_with_local_sink(self):
+        with EmailSinkServer() as sink:
+            service = EmailService(HttpEmailProvider(sink.url), max_workers=4, batch_size=50)
+            recipients = [{'email': f'user{i}@example.com'} for i in range(500)]
+            result = service.send_campaign(recipients, "Subject", "Body", include_details=False)
+
+        self.assertEqual(result['sent_count'], 500)
+        self.assertEqual(result['failures'], [])
+        self.assertNotIn('details', result)
+        self.assertEqual(sink.received, 500)
+        self.assertEqual(sink.requests, 10)
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate_per_second=200, capacity=10)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire(10)
+        # First 10 tokens are free, the other 40 take ~0.2s at 200/s
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+
+    def _wait_for_job(self, manager, job_id, statuses, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = manager.get(job_id)
+            if job['status'] in statuses:
+                return job
+            time.sleep(0.01)
+        self.fail(f"Job stuck in {job['status']}")
+
+    def test_campaign_job_runs_in_background(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = CampaignJobManager(EmailService(max_workers=2, batch_size=10),
+                                         db_path=os.path.join(tmp, 'jobs.db'), chunk_size=25)
+            recipients = [{'email': f'user{i}@example.com'} for i in range(100)]
+            job = manager.submit(recipients, "Subject", "Body")
+            job = self._wait_for_job(manager, job['job_id'], ('completed',))
+            self.assertEqual((job['sent'], job['failed'], job['pending']), (100, 0, 0))
+            self.assertEqual(job['checkpoint'], 100)
+            manager.shutdown()
+
+    def test_campaign_job_cancel_and_resume(self):
+        class SlowProvider:
+            def __init__(self):
+                self.delivered = []
+            def send_batch(self, messages):
+                time.sleep(0.02)
+                self.delivered.extend(m['email'] for m in messages)
+                return [{'email': m['email'], 'status': 'sent'} for m in messages]
+
+        provider = SlowProvider()
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = CampaignJobManager(EmailService(provider, max_workers=1, batch_size=10),
+                                         db_path=os.path.join(tmp, 'jobs.db'), chunk_size=10)
+            recipients = [{'email': f'user{i}@example.com'} for i in range(200)]
+            job_id = manager.submit(recipients, "Subject", "Body")['job_id']
+            self._wait_for_job(manager, job_id, ('running',))
+            manager.cancel(job_id)
+            job = self._wait_for_job(manager, job_id, ('cancelled',))
+            self.assertLess(job['sent'], 200)
+            self.assertEqual(job['sent'], job['checkpoint'])
+
+            job = manager.resume(job_id)
+            job = self._wait_for_job(manager, job_id, ('completed',))
+            self.assertEqual(job['sent'], 200)
+            # Resuming from the checkpoint sends nobody twice
+            self.assertEqual(sorted(provider.delivered), sorted(r['email'] for r in recipients))
+            manager.shutdown()
+
+    def test_campaign_job_recovery_leaves_live_jobs_alone(self):
+        class StallingProvider:
+            """Blocks its first batch until released; records every delivery."""
+            def __init__(self):
+                self.delivered = []
+                self.stalled = threading.Event()
+                self.release = threading.Event()
+            def send_batch(self, messages):
+                if not self.stalled.is_set():
+                    self.stalled.set()
+                    self.release.wait(10)
+                self.delivered.extend(m['email'] for m in messages)
+                return [{'email': m['email'], 'status': 'sent'} for m in messages]
+
+        provider = StallingProvider()
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = CampaignJobManager(EmailService(provider, max_workers=1, batch_size=10),
+                                         db_path=os.path.join(tmp, 'jobs.db'), chunk_size=10,
+                                         heartbeat_interval=0.05)
+            recipients = [{'email': f'user{i}@example.com'} for i in range(50)]
+            job_id = manager.submit(recipients, "Subject", "Body")['job_id']
+            self.assertTrue(provider.stalled.wait(5))
+
+            # A slow chunk keeps heartbeating, so it isn't mistaken for a dead worker
+            time.sleep(0.3)
+            self.assertEqual(manager.recover_interrupted(stale_after=0.2), 0)
+            self.assertEqual(manager.get(job_id)['status'], 'running')
+
+            # Force the takeover a real stall would cause, then resume while the original is still live
+            self.assertEqual(manager.recover_interrupted(stale_after=-1), 1)
+            manager.resume(job_id)
+            job = self._wait_for_job(manager, job_id, ('completed',))
+            provider.release.set()
+            time.sleep(0.2)
+
+            # The original run loses its checkpoint and stops; only its in-flight chunk went out twice
+            job = manager.get(job_id)
+            self.assertEqual((job['status'], job['sent'], job['checkpoint']), ('completed', 50, 50))
+            self.assertEqual(len(provider.delivered), 60)
+            self.assertEqual(set(provider.delivered), {r['email'] for r in recipients})
+            manager.shutdown()
+
+    def test_campaign_jobs_queued_by_a_dead_worker_can_be_resumed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'jobs.db')
+            release = threading.Event()
+            class BlockingProvider:
+                def send_batch(self, messages):
+                    release.wait(10)
+                    return [{'email': m['email'], 'status': 'sent'} for m in messages]
+
+            # One job runs, one waits in the queue; the queue heartbeat keeps the waiting one alive
+            manager = CampaignJobManager(EmailService(BlockingProvider(), max_workers=1, batch_size=10),
+                                         db_path=db_path, chunk_size=10, max_concurrent_jobs=1,
+                                         heartbeat_interval=0.05)
+            recipients = [{'email': f'user{i}@example.com'} for i in range(20)]
+            running = manager.submit(recipients, "Subject", "Body")['job_id']
+            queued = manager.submit(recipients, "Subject", "Body")['job_id']
+            time.sleep(0.3)
+            self.assertEqual(manager.recover_interrupted(stale_after=0.2), 0)
+            self.assertEqual(manager.get(queued)['status'], 'pending')
+
+            # A job queued by a process that has since died is recovered and resumable
+            with manager._connect() as conn:
+                conn.execute("UPDATE campaign_jobs SET owner = 'dead-worker', updated_at = 0 WHERE job_id = ?",
+                             (queued,))
+            self.assertEqual(manager.recover_interrupted(stale_after=0.2), 1)
+            self.assertEqual(manager.get(queued)['status'], 'interrupted')
+            manager.resume(queued)
+            release.set()
+            for job_id in (running, queued):
+                self.assertEqual(self._wait_for_job(manager, job_id, ('completed',))['sent'], 20)
+            manager.shutdown()
+
+    def test_campaign_jobs_stop_as_interrupted_on_shutdown(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            release = threading.Event()
+            class BlockingProvider:
+                def send_batch(self, messages):
+                    release.wait(10)
+                    return [{'email': m['email'], 'status': 'sent'} for m in messages]
+
+            manager = CampaignJobManager(EmailService(BlockingProvider(), max_workers=1, batch_size=10),
+                                         db_path=os.path.join(tmp, 'jobs.db'), chunk_size=10, max_concurrent_jobs=1)
+            recipients = [{'email': f'user{i}@example.com'} for i in range(30)]
+            running = manager.submit(recipients, "Subject", "Body")['job_id']
+            queued = manager.submit(recipients, "Subject", "Body")['job_id']
+            time.sleep(0.05)
+            threading.Timer(0.1, release.set).start()
+            manager.shutdown()
+            # The chunk in flight is checkpointed, then the job stops at the chunk boundary
+            self.assertEqual(manager.get(running)['status'], 'interrupted')
+            self.assertEqual(manager.get(running)['checkpoint'], 10)
+            self.assertEqual(manager.get(queued)['status'], 'interrupted')
+
+            # Interpreter exit mid-job (no shutdown call) interrupts it too instead of failing it
+            script = textwrap.dedent('''
+                import sys, time
+                from campaign_jobs import CampaignJobManager
+                from email_service import EmailService
+
+                class SlowProvider:
+                    def send_batch(self, messages):
+                        time.sleep(0.05)
+                        return [{'email': m['email'], 'status': 'sent'} for m in messages]
+
+                manager = CampaignJobManager(EmailService(SlowProvider(), max_workers=2, batch_size=5),
+                                             db_path=sys.argv[1], chunk_size=20)
+                print(manager.submit([{'email': f'user{i}@example.com'} for i in range(200)], 'S', 'B')['job_id'])
+                time.sleep(0.2)
+            ''')
+            db_path = os.path.join(tmp, 'exit.db')
+            job_id = subprocess.run([sys.executable, '-c', script, db_path], capture_output=True, text=True,
+                                    check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+            job = CampaignJobManager(EmailService(), db_path=db_path).get(job_id)
+            self.assertEqual(job['status'], 'interrupted')
+            self.assertIsNone(job['error'])
+
+    def _event_service_for(self, provider, **kwargs):
+        service = EventService(**kwargs)
+        service.ticketmaster_api_key = service.eventbrite_api_key = 'test'
+        service.base_url_ticketmaster = provider.ticketmaster_url
+        service.base_url_eventbrite = provider.eventbrite_url
+        return service
+
+    def test_event_fetching_uses_windowed_queries(self):
+        with EventProviderServer(latency_ms=50, events_per_day=4) as provider:
+            service = self._event_service_for(provider, max_concurrency=4)
+            start = datetime(2026, 6, 1)
+            events = service.get_events_for_date_range("Boston", start, start + timedelta(days=29))
+            self.assertEqual(len(events), 30 * 4 * 2)
+            # One Ticketmaster page, three Eventbrite pages of 50, both providers in parallel
+            self.assertEqual(provider.requests, 4)
+            self.assertEqual(provider.max_in_flight, 2)
+            self.assertEqual({e.date.strftime('%Y-%m-%d') for e in events},
+                             {(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(30)})
+
+            # Days are cached individually, so a sub-range needs no provider calls
+            days = service.get_events_for_date_range("Boston", start + timedelta(days=3), start + timedelta(days=4))
+            self.assertEqual(len(days), 2 * 4 * 2)
+            self.assertEqual(provider.requests, 4)
+
+    def test_event_fetching_respects_deadline(self):
+        with EventProviderServer(latency_ms=1000) as provider:
+            service = self._event_service_for(provider, fetch_deadline=0.2)
+            start_time = time.time()
+            events = service.get_events_for_date_range("Boston", datetime(2026, 6, 1), datetime(2026, 6, 2))
+            self.assertLess(time.time() - start_time, 0.9)
+            # Slow providers fall back to mock data like failing ones
+            self.assertTrue(events)
+            self.assertTrue(all(e.id.startswith('mock') for e in events))
+
+    def test_event_cache_ttl_and_sqlite_tier(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'events.db')
+            cache = EventCache(ttl=0.1, stale_ttl=0.1, db_path=db_path)
+            cache.put('boston:2026-06-01', [{'id': 'e1'}])
+            self.assertEqual(cache.get('boston:2026-06-01'), ([{'id': 'e1'}], FRESH))
+
+            # A second worker's cache finds the entry in the shared SQLite tier
+            other = EventCache(ttl=0.1, stale_ttl=0.1, db_path=db_path)
+            self.assertEqual(other.get('boston:2026-06-01'), ([{'id': 'e1'}], FRESH))
+            self.assertEqual(other.stats()['disk_hits'], 1)
+
+            time.sleep(0.12)
+            self.assertEqual(cache.get('boston:2026-06-01')[1], STALE)
+
+            # A fresher entry written by another worker replaces the stale in-memory one
+            other.put('boston:2026-06-01', [{'id': 'e1'}, {'id': 'e3'}])
+            self.assertEqual(cache.get('boston:2026-06-01'), ([{'id': 'e1'}, {'id': 'e3'}], FRESH))
+            self.assertEqual(cache.stats()['disk_hits'], 1)
+
+            time.sleep(0.25)
+            self.assertEqual(cache.get('boston:2026-06-01'), (None, None))
+            self.assertEqual(cache.stats()['misses'], 1)
+
+            # An unusable SQLite tier degrades to the in-memory cache instead of failing the put
+            broken = EventCache(db_path=tmp)
+            broken.put('boston:2026-06-02', [{'id': 'e2'}])
+            self.assertEqual(broken.get('boston:2026-06-02'), ([{'id': 'e2'}], FRESH))
+            self.assertEqual(broken.stats()['disk_errors'], 1)
+
+    def test_event_service_caching(self):
+        # Mock fallbacks only live for the negative TTL
+        service = EventService()
+        service._fetch_days("Boston", datetime(2026, 6, 1), datetime(2026, 6, 1))
+        entry = service.cache._entries['Boston:2026-06-01']
+        self.assertLessEqual(entry.expires_at - time.time(), service._negative_cache_duration)
+
+        with EventProviderServer(events_per_day=2) as provider:
+            service = self._event_service_for(provider)
+            start = datetime(2026, 6, 1)
+            service.get_events_for_date_range("Boston", start, start + timedelta(days=1))
+            self.assertEqual(provider.requests, 2)
+
+            # Stale days are served immediately and refreshed in the background
+            for entry in service.cache._entries.values():
+                entry.expires_at = time.time() - 1
+            events = service.get_events_for_date_range("Boston", start, start + timedelta(days=1))
+            self.assertEqual(len(events), 2 * 2 * 2)
+            service._refresh_executor.shutdown(wait=True)
+            self.assertEqual(provider.requests, 4)
+            self.assertEqual(service.cache.get('Boston:2026-06-01')[1], FRESH)
+            self.assertEqual(service.cache.stats()['stale_hits'], 2)
+
+    def test_impact_calendar_matches_event_scan(self):
+        service = EventService()
+        start = datetime.combine(date.today(), datetime.min.time())
+        service.refresh_calendar("Boston")
+
+        calls = []
+        fetch_days = service._fetch_days
+        service._fetch_days = lambda *args: calls.append(args) or fetch_days(*args)
+        for offset, nights in [(0, 1), (3, 4), (10, 14), (25, 30)]:
+            check_in = start + timedelta(days=offset)
+            check_out = check_in + timedelta(days=nights)
+            adjustment = service.calculate_pricing_adjustment("Boston", check_in, check_out)
+
+            events = service.get_events_for_date_range("Boston", check_in, check_out)
+            weights = [IMPACT_WEIGHTS[e.impact_level] for e in events]
+            peak = events[weights.index(max(weights))]
+            high = sum(e.impact_level in (EventImpact.HIGH, EventImpact.CRITICAL) for e in events)
+            self.assertAlmostEqual(adjustment.base_multiplier, min(1.0 + sum(weights), 3.0))
+            self.assertEqual(adjustment.events_count, len(events))
+            self.assertEqual(adjustment.peak_event_date, peak.date)
+            self.assertEqual(adjustment.reason.startswith("High-impact"), high > 0)
+            if high:
+                self.assertIn(f"{high} major events", adjustment.reason)
+        # Only the reference scans touched the event data; pricing came from the calendar
+        self.assertEqual(len(calls), 4)
+
+    def test_impact_calendar_stays_within_horizon(self):
+        service = EventService()
+        service.max_calendars = 2
+        today = datetime.combine(date.today(), datetime.min.time())
+        calls = []
+        fetch_days = service._fetch_days
+        service._fetch_days = lambda city, start, end: calls.append((end - start).days + 1) or fetch_days(city, start, end)
+
+        # A cold stay reads only its own days; the horizon calendar is built in the background
+        service.calculate_pricing_adjustment("Boston", today + timedelta(days=3), today + timedelta(days=5))
+        deadline = time.time() + 5
+        while "Boston" not in service._calendars:
+            self.assertLess(time.time(), deadline)
+            time.sleep(0.01)
+        self.assertEqual(sorted(calls), [3, service.calendar_horizon_days])
+        self.assertEqual(service._calendars["Boston"].days, service.calendar_horizon_days)
+
+        # Stays beyond the horizon are priced from their own days and leave the calendar alone
+        service.calculate_pricing_adjustment("Boston", datetime(2300, 1, 1), datetime(2300, 1, 3))
+        self.assertEqual(calls[-1], 3)
+        self.assertEqual(service._calendars["Boston"].days, service.calendar_horizon_days)
+
+        # Only the most recently used cities keep a calendar
+        for city in ["Chicago", "Denver"]:
+            service.refresh_calendar(city)
+        self.assertEqual(list(service._calendars), ["Chicago", "Denver"])
+
+    def test_pricing_grid_matches_single_stay_pricing(self):
+        service = EventService()
+        start = datetime(2026, 6, 1)
+        grid = service.price_grid(["Boston", "Chicago"], start.date(), (start + timedelta(days=20)).date(), [1, 3, 7])
+        self.assertEqual(grid.multipliers.shape, (2, 21, 3))
+        for c, city in enumerate(grid.cities):
+            for d in (0, 5, 20):
+                for l, nights in enumerate(grid.lengths_of_stay):
+                    check_in = start + timedelta(days=d)
+                    adjustment = service.calculate_pricing_adjustment(city, check_in, check_in + timedelta(days=nights))
+                    self.assertAlmostEqual(grid.multipliers[c, d, l], adjustment.base_multiplier)
+
+        rates = grid.adjusted_rates([100.0, 250.0])
+        self.assertEqual(rates.shape, (2, 21, 3, 2))
+        self.assertAlmostEqual(rates[1, 5, 2, 1], round(grid.multipliers[1, 5, 2] * 250.0, 2))
+        lines = b"".join(grid.iter_ndjson([100.0])).decode().splitlines()
+        self.assertEqual(len(lines), 2 * 21)
+        self.assertEqual(json.loads(lines[22])["city"], "Chicago")
+
+    def test_prefetch_scheduler_warms_horizon(self):
+        with EventProviderServer(events_per_day=2) as provider:
+            service = self._event_service_for(provider)
+            service.request_counts["Chicago"] = 50
+            scheduler = PrefetchScheduler(service, cities=["Boston"], horizon_days=20, rate_per_second=1000,
+                                          window_days=7)
+            plan = scheduler.plan()
+            # 20 days in 7-day windows for each city; the busier city and nearer dates come first
+            self.assertEqual(len(plan), 6)
+            self.assertEqual([w[1] for w in plan], ["Chicago"] * 3 + ["Boston"] * 3)
+            self.assertEqual([w[2] for w in plan[:3]], sorted(w[2] for w in plan[:3]))
+            self.assertEqual(plan[0][2], datetime.now().date())
+            scheduler.started_at -= 30
+            self.assertGreaterEqual(scheduler.stats()['lag_seconds'], 30)
+
+            self.assertEqual(scheduler.run_once(), 6)
+            self.assertEqual(provider.requests, 12)
+            stats = scheduler.stats()
+            self.assertEqual((stats['coverage'], stats['lag_seconds']), (1.0, 0))
+            # Everything is fresh, so the next sweep and user lookups make no provider calls
+            self.assertEqual(scheduler.run_once(), 0)
+            today = datetime.now()
+            service.get_events_for_date_range("Boston", today, today + timedelta(days=10))
+            self.assertEqual(provider.requests, 12)
+
+    def test_prefetch_refresh_joins_inflight_lookup(self):
+        with EventProviderServer(latency_ms=200) as provider:
+            service = self._event_service_for(provider)
+            check_in = datetime(2026, 6, 1)
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                lookup = executor.submit(service.get_events_for_date_range, "Boston", check_in, check_in + timedelta(days=3))
+                time.sleep(0.05)
+                service.refresh_days("Boston", check_in.date(), (check_in + timedelta(days=3)).date())
+                lookup.result()
+            # One window, one query per provider, shared by the lookup and the refresh
+            self.assertEqual(provider.requests, 2)
+
+        service.max_tracked_cities = 3
+        for city in ["Boston"] * 4 + ["Chicago"] * 2 + ["Denver", "Miami"]:
+            service._record_request(city)
+        # A fourth city halves every count and forgets the cities seen once
+        self.assertEqual(service.most_requested(10), [("Boston", 2), ("Chicago", 1)])
+
+    def test_single_flight_coalesces_identical_lookups(self):
+        with EventProviderServer(latency_ms=100) as provider:
+            service = self._event_service_for(provider, max_concurrency=32)
+            barrier = threading.Barrier(20)
+            check_in = datetime(2026, 6, 1)
+
+            def lookup(i):
+                barrier.wait()
+                # Overlapping ranges share the days they have in common
+                return service.get_events_for_date_range("Boston", check_in, check_in + timedelta(days=3 + i % 2))
+
+            with ThreadPoolExecutor(max_workers=20) as executor:
+                results = list(executor.map(lookup, range(20)))
+            self.assertEqual({len(events) for events in results}, {4 * 3 * 2, 5 * 3 * 2})
+            self.assertLessEqual(provider.requests, 4)
+            self.assertGreater(service.flights.stats()['followers'], 0)
+
+        # Followers share the leader's exception too
+        flights = SingleFlight()
+        started = threading.Event()
+        def failing():
+            started.set()
+            time.sleep(0.1)
+            raise ValueError("provider down")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(flights.do, 'key', failing)
+            started.wait()
+            follower = executor.submit(flights.do, 'key', lambda: 'unused')
+            for future in (leader, follower):
+                with self.assertRaises(ValueError):
+                    future.result()
+        self.assertEqual(flights.stats(), {'leaders': 1, 'followers': 1, 'in_flight': 0})
+
+    def test_response_cache_versions_and_etags(self):
+        cache = ResponseCache(max_bytes=10)
+        entry = cache.put('a', 1, b'12345')
+        self.assertIs(cache.get('a', 1), entry)
+        self.assertTrue(etag_matches(entry.etag, entry.etag))
+        self.assertTrue(etag_matches(f'"other", W/{entry.etag}', entry.etag))
+        self.assertFalse(etag_matches('"other"', entry.etag))
+        # A new data version is a miss and drops the old body
+        self.assertIsNone(cache.get('a', 2))
+        cache.put('a', 2, b'12345')
+        cache.put('b', 2, b'123456')
+        self.assertIsNone(cache.get('a', 2))  # evicted to stay under max_bytes
+        self.assertEqual(cache.stats()['bytes'], 6)
+
+        service = EventService()
+        start = datetime(2026, 6, 1)
+        self.assertIsNone(service.range_version("Boston", start, start + timedelta(days=2)))
+        service.get_events_for_date_range("Boston", start, start + timedelta(days=2))
+        version = service.range_version("Boston", start, start + timedelta(days=2))
+        self.assertEqual(len(version), 3)
+        service.refresh_days("Boston", start.date(), start.date())
+        self.assertNotEqual(service.range_version("Boston", start, start + timedelta(days=2)), version)
+
+    def test_fast_json_matches_stdlib_encoding(self):
+        service = EventService()
+        event = service._to_events(service._get_mock_events("Boston", "2026-06-01"))[0]
+        payload = {"events": [event], "when": datetime(2026, 6, 1, 9, 30), "n": np.int64(3),
+                   "rates": np.array([1.5, 2.0])}
+        fast = json.loads(fast_json.dumps(payload))
+        self.assertEqual(fast["events"][0]["date"], event.date.isoformat())
+        self.assertEqual(fast["events"][0]["impact_level"], event.impact_level.value)
+        self.assertEqual(fast, {**fast, "when": "2026-06-01T09:30:00", "n": 3, "rates": [1.5, 2.0]})
+
+        orjson, fast_json.orjson = fast_json.orjson, None
+        try:
+            self.assertEqual(json.loads(fast_json.dumps(payload)), fast)
+        finally:
+            fast_json.orjson = orjson
+
+    def test_bounded_executors_isolate_slow_work(self):
+        slow = BoundedExecutor('slow', max_workers=2, max_pending=3)
+        fast = BoundedExecutor('fast', max_workers=1)
+        release = threading.Event()
+
+        async def scenario():
+            blocked = [asyncio.ensure_future(slow.run(release.wait, 5)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            # The slow pool is full, but work on another pool is unaffected
+            with self.assertRaises(ExecutorSaturated):
+                await slow.run(time.sleep, 0)
+            started = time.perf_counter()
+            self.assertEqual(await fast.run(sum, [1, 2]), 3)
+            fast_seconds = time.perf_counter() - started
+            stats = slow.stats()
+            release.set()
+            await asyncio.gather(*blocked)
+            return fast_seconds, stats
+
+        fast_seconds, stats = asyncio.run(scenario())
+        self.assertLess(fast_seconds, 0.5)
+        self.assertEqual((stats['running'], stats['queued'], stats['rejected']), (2, 1, 1))
+        self.assertEqual(slow.stats()['completed'], 3)
+
+    def test_bounded_executor_counts_cancelled_work_until_it_finishes(self):
+        pool = BoundedExecutor('pool', max_workers=1, max_pending=2)
+        release = threading.Event()
+
+        async def scenario():
+            running = asyncio.ensure_future(pool.run(release.wait, 5))
+            queued = asyncio.ensure_future(pool.run(time.sleep, 0))
+            await asyncio.sleep(0.05)
+            running.cancel()
+            queued.cancel()
+            await asyncio.sleep(0.05)
+            # The queued call never starts and frees its slot; the running one keeps its slot
+            stats = pool.stats()
+            release.set()
+            await asyncio.sleep(0.05)
+            return stats
+
+        stats = asyncio.run(scenario())
+        self.assertEqual((stats['running'], stats['queued'], stats['cancelled']), (1, 0, 1))
+        self.assertEqual(pool.stats()['completed'], 1)
+        pool.shutdown()
+
+
+class TestAPI(unittest.TestCase):
+    """Endpoint behaviour through FastAPI's TestClient (no lifespan: background tasks stay off)."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.client = TestClient(api.app)
+
+    def test_today_events_roll_over_at_midnight(self):
+        clock = [datetime(2026, 6, 1, 23, 59)]
+        class Clock(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock[0]
+
+        with patch.object(api, 'datetime', Clock):
+            first = self.client.get('/events/Boston')
+            again = self.client.get('/events/Boston', headers={'If-None-Match': first.headers['etag']})
+            clock[0] = datetime(2026, 6, 2, 0, 1)
+            after = self.client.get('/events/Boston')
+        self.assertEqual(first.json()['date_range']['start'], '2026-06-01T00:00:00')
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(after.status_code, 200)
+        self.assertEqual(after.json()['date_range']['start'], '2026-06-02T00:00:00')
+
+    def test_predict_batch_and_inference_stats(self):
+        profiles = [
+            {"age": 35, "loyalty_tier": "Gold", "avg_spend": 450.0, "last_stay_days_ago": 30,
+             "travel_purpose": "Business", "preferred_amenities": "Gym"},
+            {"age": 62, "loyalty_tier": "Silver", "avg_spend": 220.0, "last_stay_days_ago": 400,
+             "travel_purpose": "Leisure", "preferred_amenities": "Spa"},
+        ]
+        batch = self.client.post('/predict/batch', json={"profiles": profiles})
+        self.assertEqual(batch.status_code, 200)
+        predictions = batch.json()['predictions']
+        self.assertEqual(len(predictions), 2)
+        # Batch rows score the same as single /predict calls
+        single = self.client.post('/predict', json=profiles[1]).json()
+        self.assertEqual(predictions[1], single)
+
+        self.assertIn('hits', self.client.get('/predict/cache/stats').json())
+        self.assertIn('batches', self.client.get('/predict/batcher/stats').json())
+        executors = self.client.get('/executors/stats').json()
+        self.assertGreaterEqual(executors['inference']['completed'], 1)
+        self.assertIn('campaign-jobs', executors)
+
+    def test_model_version_and_reload(self):
+        self.client.post('/predict/batch', json={"profiles": []})
+        version = self.client.get('/models/version').json()
+        reload = self.client.post('/models/reload').json()
+        # models.pkl is unchanged, so the served version stays put
+        self.assertFalse(reload['swapped'])
+        self.assertEqual(reload['version'], version['version'])
+
+    def test_audience_endpoints(self):
+        q2 = self.client.get('/campaigns/audiences/q2-business-local', params={'format': 'columnar'})
+        self.assertEqual(q2.status_code, 200)
+        audience_count = q2.json()['stats']['audience_count']
+        self.assertEqual(self.client.get('/campaigns/audiences/q2-business-local',
+                                         headers={'If-None-Match': q2.headers['etag']},
+                                         params={'format': 'columnar'}).status_code, 304)
+
+        definition = {"all": [{"column": "travel_purpose", "op": "in", "value": ["Business"]}]}
+        query = self.client.post('/campaigns/audiences/query', json={"definition": definition, "format": "ndjson"})
+        self.assertEqual(query.status_code, 200)
+        self.assertEqual(len(query.text.splitlines()), int(query.headers['x-audience-count']))
+        bad = self.client.post('/campaigns/audiences/query',
+                               json={"definition": {"column": "age", "op": "gte", "value": "old"}})
+        self.assertEqual(bad.status_code, 400)
+
+        # A snapshot pages through the Q2 audience by cursor without repeating anyone
+        page = self.client.post('/campaigns/audiences/snapshots', json={"limit": 50}).json()
+        seen = [traveler['email'] for traveler in page['audience']]
+        while page['next_cursor']:
+            page = self.client.get('/campaigns/audiences/pages', params={'cursor': page['next_cursor'], 'limit': 50}).json()
+            seen += [traveler['email'] for traveler in page['audience']]
+        self.assertEqual(len(seen), audience_count)
+        self.assertEqual(len(set(seen)), audience_count)
+        self.assertEqual(self.client.get('/campaigns/audiences/pages', params={'cursor': 'missing'}).status_code, 400)
+
+    def test_event_pricing_rejects_check_ins_outside_horizon(self):
+        today = datetime.now().date()
+        def price(check_in):
+            return self.client.post('/event-pricing', json={
+                "city": "Boston", "check_in_date": check_in.isoformat(),
+                "check_out_date": (check_in + timedelta(days=2)).isoformat(), "base_room_rate": 200.0})
+
+        self.assertEqual(price(today + timedelta(days=3)).status_code, 200)
+        for check_in in (date(2300, 1, 1), today + timedelta(days=api.event_service.calendar_horizon_days + 1),
+                         today - timedelta(days=1)):
+            response = price(check_in)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("Check-in date must be between", response.json()['detail'])
+
+    def test_event_grid_and_event_stats(self):
+        today = datetime.now().date()
+        request = {"cities": ["Boston", "Chicago"], "start_date": today.isoformat(),
+                   "end_date": (today + timedelta(days=6)).isoformat(), "lengths_of_stay": [1, 3], "base_rates": [200.0]}
+        grid = self.client.post('/event-pricing/grid', json=request).json()
+        self.assertEqual(len(grid['multipliers']), 2)
+        self.assertEqual(len(grid['adjusted_rates'][1]), 7)
+        lines = self.client.post('/event-pricing/grid', json={**request, "format": "ndjson"}).text.splitlines()
+        self.assertEqual(len(lines), 2 * 7)
+        self.assertEqual(json.loads(lines[7])['city'], 'Chicago')
+        self.assertEqual(self.client.post('/event-pricing/grid', json={**request, "end_date": "2026-05-01"}).status_code, 400)
+        # Both ends must fall between today and the event horizon
+        horizon = today + timedelta(days=api.event_service.calendar_horizon_days)
+        for start, end in [(today - timedelta(days=1), today), (horizon, horizon + timedelta(days=1)),
+                           (date(2300, 1, 1), date(2300, 1, 7))]:
+            response = self.client.post('/event-pricing/grid',
+                                        json={**request, "start_date": start.isoformat(), "end_date": end.isoformat()})
+            self.assertEqual(response.status_code, 400)
+
+        self.assertIn('response_cache', self.client.get('/events/cache/stats').json())
+        self.assertIn('coverage', self.client.get('/events/prefetch/stats').json())
+
+    def test_campaign_job_endpoints(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = CampaignJobManager(EmailService(max_workers=1, batch_size=10),
+                                         db_path=os.path.join(tmp, 'jobs.db'), chunk_size=10)
+            with patch.object(api, 'campaign_jobs', manager):
+                recipients = [{'email': f'user{i}@example.com'} for i in range(30)]
+                submitted = self.client.post('/campaigns/jobs', json={"subject": "S", "body": "B", "recipients": recipients})
+                self.assertEqual(submitted.status_code, 202)
+                job_id = submitted.json()['job_id']
+                deadline = time.time() + 5
+                while self.client.get(f'/campaigns/jobs/{job_id}').json()['status'] != 'completed':
+                    self.assertLess(time.time(), deadline)
+                    time.sleep(0.01)
+                self.assertEqual(self.client.get(f'/campaigns/jobs/{job_id}').json()['sent'], 30)
+
+                # A finished job stays finished
+                self.assertEqual(self.client.post(f'/campaigns/jobs/{job_id}/cancel').json()['status'], 'completed')
+                self.assertEqual(self.client.post(f'/campaigns/jobs/{job_id}/resume').status_code, 409)
+                self.assertEqual(self.client.get('/campaigns/jobs/missing').status_code, 404)
+                self.assertEqual(self.client.post('/campaigns/jobs/missing/cancel').status_code, 404)
+                bad = self.client.post('/campaigns/jobs', json={"subject": "S", "body": "B", "recipients": [{}]})
+                self.assertEqual(bad.status_code, 400)
+            manager.shutdown()
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,70 +1,292 @@
+"""Train the segmentation and booking models.
+
+    python3 train_model.py                       # in-memory pipeline for traveler_data.csv
+    python3 train_model.py --scalable --data guests.csv --chunk-size 500000
+
+--scalable streams the CSV in chunks into compact dtypes (categoricals as
+int8 codes), clusters with MiniBatchKMeans and trains the forest on all
+cores. Both modes write the same models.pkl layout and print per-stage
+wall time and peak memory.
+"""
+
+import argparse
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 import joblib
 
-# 1. Load Data
-print("Loading data...")
-df = pd.read_csv('traveler_data.csv')
-
-# 2. Preprocess Data
-print("Preprocessing data...")
-# Encode categorical variables
-le_loyalty = LabelEncoder()
-df['loyalty_code'] = le_loyalty.fit_transform(df['loyalty_tier'])
-
-le_purpose = LabelEncoder()
-df['purpose_code'] = le_purpose.fit_transform(df['travel_purpose'])
-
-# Features for Segmentation (Unsupervised)
-X_seg = df[['age', 'avg_spend', 'last_stay_days_ago', 'loyalty_code', 'purpose_code']]
-scaler = StandardScaler()
-X_seg_scaled = scaler.fit_transform(X_seg)
-
-# 3. Train Segmentation Model (K-Means)
-print("Training Segmentation Model (K-Means)...")
-kmeans = KMeans(n_clusters=3, random_state=42)
-df['segment'] = kmeans.fit_predict(X_seg_scaled)
-
-# Map clusters to meaningful names (Basic heuristic for demo)
-# We analyze centroids or just map arbitrarily for MVP speed:
-# 0 -> 'Budget/Infrequent', 1 -> 'High Value/Frequent', 2 -> 'Mid-Tier'
-# Real implementation would analyze centroids.
-segment_map = {0: 'Budget Explorer', 1: 'Luxury Elite', 2: 'Business Regular'}
-# Note: In a real run, we'd check means max/min to assign labels correctly.
-# For stability in this demo, we'll just use the cluster ID in the app or do a quick check:
-cluster_means = df.groupby('segment')['avg_spend'].mean()
-sorted_clusters = cluster_means.sort_values().index
-segment_labels = {}
-segment_labels[sorted_clusters[0]] = 'Budget Explorer'
-segment_labels[sorted_clusters[1]] = 'Standard Business'
-segment_labels[sorted_clusters[2]] = 'Luxury Elite'
-
-df['segment_label'] = df['segment'].map(segment_labels)
-print("Segments identified:", df['segment_label'].unique())
-
-# 4. Train Prediction Model (Random Forest)
-# Predict 'outcome_label' (Booking Conversion) based on profile
-X_pred = df[['age', 'avg_spend', 'last_stay_days_ago', 'loyalty_code', 'purpose_code', 'segment']]
-y_pred = df['outcome_label']
-
-print("Training Prediction Model (Random Forest)...")
-rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
-rf_model.fit(X_pred, y_pred)
-
-# 5. Save Artifacts
-print("Saving models...")
-model_data = {
-    'kmeans': kmeans,
-    'scaler': scaler,
-    'rf_model': rf_model,
-    'le_loyalty': le_loyalty,
-    'le_purpose': le_purpose,
-    'segment_labels': segment_labels
+SEGMENT_FEATURES = ['age', 'avg_spend', 'last_stay_days_ago', 'loyalty_code', 'purpose_code']
+PREDICTION_FEATURES = SEGMENT_FEATURES + ['segment']
+
+# Compact dtypes for the columns training reads
+TRAINING_DTYPES = {
+    'age': 'int16',
+    'loyalty_tier': 'category',
+    'avg_spend': 'float32',
+    'last_stay_days_ago': 'int16',
+    'travel_purpose': 'category',
+    'outcome_label': 'int8',
 }
 
-joblib.dump(model_data, 'models.pkl')
-print("Done! Models saved to models.pkl")
+
+class StageReport:
+    """Wall time and peak resident memory for each training stage."""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        print(f"{name}...")
+        sampler = _PeakRSSSampler()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            peak = sampler.stop()
+            self.stages.append((name, time.perf_counter() - started, peak))
+
+    def print(self):
+        print(f"\n{'stage':<28} {'seconds':>8} {'peak RSS':>10}")
+        for name, seconds, peak in self.stages:
+            print(f"{name:<28} {seconds:8.2f} {peak / 2**20:8.1f}MB")
+
+
+class _PeakRSSSampler:
+    """Polls resident memory on Linux; elsewhere falls back to the process-lifetime peak."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = _current_rss()
+        self._stop = threading.Event()
+        self._thread = None
+        if self.peak is not None:
+            self._thread = threading.Thread(target=self._poll, daemon=True)
+            self._thread.start()
+
+    def _poll(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss())
+
+    def stop(self):
+        if self._thread is None:
+            scale = 1 if sys.platform == 'darwin' else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        self._stop.set()
+        self._thread.join()
+        return max(self.peak, _current_rss())
+
+
+def _current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+
+def label_segments(segments, avg_spend):
+    """Name clusters by mean spend: lowest Budget Explorer, highest Luxury Elite."""
+    n_clusters = int(segments.max()) + 1
+    mean_spend = np.bincount(segments, weights=avg_spend, minlength=n_clusters) / np.maximum(
+        np.bincount(segments, minlength=n_clusters), 1)
+    sorted_clusters = np.argsort(mean_spend, kind='stable')
+    names = ['Budget Explorer', 'Standard Business', 'Luxury Elite']
+    return {int(cluster): name for cluster, name in zip(sorted_clusters, names)}
+
+
+def train_in_memory(data_path, report):
+    """The original pipeline: full-batch K-Means and a single-threaded forest."""
+    with report.stage("Loading data"):
+        df = pd.read_csv(data_path)
+
+    with report.stage("Preprocessing data"):
+        # Encode categorical variables
+        le_loyalty = LabelEncoder()
+        df['loyalty_code'] = le_loyalty.fit_transform(df['loyalty_tier'])
+
+        le_purpose = LabelEncoder()
+        df['purpose_code'] = le_purpose.fit_transform(df['travel_purpose'])
+
+        # Features for Segmentation (Unsupervised)
+        X_seg = df[SEGMENT_FEATURES]
+        scaler = StandardScaler()
+        X_seg_scaled = scaler.fit_transform(X_seg)
+
+    with report.stage("Training K-Means"):
+        kmeans = KMeans(n_clusters=3, random_state=42)
+        df['segment'] = kmeans.fit_predict(X_seg_scaled)
+
+    # Map clusters to names by mean spend (lowest: Budget Explorer, highest: Luxury Elite)
+    cluster_means = df.groupby('segment')['avg_spend'].mean()
+    sorted_clusters = cluster_means.sort_values().index
+    segment_labels = {}
+    segment_labels[sorted_clusters[0]] = 'Budget Explorer'
+    segment_labels[sorted_clusters[1]] = 'Standard Business'
+    segment_labels[sorted_clusters[2]] = 'Luxury Elite'
+
+    df['segment_label'] = df['segment'].map(segment_labels)
+    print("Segments identified:", df['segment_label'].unique())
+
+    # Predict 'outcome_label' (Booking Conversion) based on profile
+    with report.stage("Training Random Forest"):
+        rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
+        rf_model.fit(df[PREDICTION_FEATURES], df['outcome_label'])
+
+    return {
+        'kmeans': kmeans,
+        'scaler': scaler,
+        'rf_model': rf_model,
+        'le_loyalty': le_loyalty,
+        'le_purpose': le_purpose,
+        'segment_labels': segment_labels
+    }
+
+
+def load_compact(data_path, chunk_size):
+    """
+    Read the training columns chunk by chunk into compact dtypes. Columns are
+    preallocated from the file's line count and filled as chunks arrive, so
+    peak memory is the result plus one chunk rather than every chunk plus a
+    concatenated copy.
+    """
+    capacity = _count_data_lines(data_path)
+    columns = {
+        column: np.empty(capacity, dtype=np.int8 if dtype == 'category' else dtype)
+        for column, dtype in TRAINING_DTYPES.items()
+    }
+    # Category -> code in first-seen order; each chunk infers its own categories
+    seen = {column: {} for column, dtype in TRAINING_DTYPES.items() if dtype == 'category'}
+    rows = 0
+    for chunk in pd.read_csv(data_path, usecols=list(TRAINING_DTYPES), dtype=TRAINING_DTYPES, chunksize=chunk_size):
+        end = rows + len(chunk)
+        for column, values in columns.items():
+            if column in seen:
+                categorical = chunk[column].cat
+                # Trailing -1 keeps pandas' missing-value code (-1) missing
+                to_global = np.array([seen[column].setdefault(value, len(seen[column]))
+                                      for value in categorical.categories] + [-1])
+                if len(seen[column]) > np.iinfo(values.dtype).max:
+                    values = columns[column] = values.astype(np.int16)
+                values[rows:end] = to_global[categorical.codes.to_numpy()]
+            else:
+                values[rows:end] = chunk[column].to_numpy()
+        rows = end
+
+    data = {column: values[:rows] for column, values in columns.items()}
+    for column, codes in seen.items():
+        # Sorted categories make the codes equal to LabelEncoder codes
+        categories = sorted(codes)
+        to_sorted = np.full(len(codes) + 1, -1, dtype=data[column].dtype)
+        to_sorted[[codes[value] for value in categories]] = np.arange(len(categories))
+        # Remapped in place a chunk at a time, so the index temporaries stay chunk-sized
+        for start in range(0, rows, chunk_size):
+            block = data[column][start:start + chunk_size]
+            block[:] = to_sorted[block]
+        data[column] = pd.Categorical.from_codes(data[column], categories=categories)
+    return pd.DataFrame(data, copy=False)
+
+
+def _count_data_lines(data_path):
+    """Lines after the header: an upper bound on the rows read_csv returns (it skips blank lines)."""
+    lines = 0
+    last = b'\n'
+    with open(data_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            lines += block.count(b'\n')
+            last = block[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+
+def train_scalable(data_path, report, chunk_size=500_000, batch_size=4096, n_jobs=-1, max_samples=None):
+    """Chunked loading, MiniBatchKMeans and a parallel forest; same artifacts as train_in_memory."""
+    with report.stage("Loading data (chunked)"):
+        df = load_compact(data_path, chunk_size)
+    print(f"Loaded {len(df):,} rows ({df.memory_usage(deep=True).sum() / 2**20:.1f}MB in memory)")
+
+    with report.stage("Preprocessing data"):
+        le_loyalty = LabelEncoder().fit(df['loyalty_tier'].cat.categories)
+        le_purpose = LabelEncoder().fit(df['travel_purpose'].cat.categories)
+        X = np.empty((len(df), len(PREDICTION_FEATURES)), dtype=np.float32)
+        X[:, 0] = df['age']
+        X[:, 1] = df['avg_spend']
+        X[:, 2] = df['last_stay_days_ago']
+        # Sorted categories make the category codes equal to LabelEncoder codes
+        X[:, 3] = df['loyalty_tier'].cat.codes
+        X[:, 4] = df['travel_purpose'].cat.codes
+        y = df['outcome_label'].to_numpy()
+        avg_spend = df['avg_spend'].to_numpy(dtype=np.float64)
+        del df
+
+        scaler = StandardScaler().fit(X[:, :5])
+
+    with report.stage("Training MiniBatchKMeans"):
+        # float32 in, float32 out: half the memory of the in-memory pipeline's scaled copy
+        X_scaled = scaler.transform(X[:, :5])
+        kmeans = MiniBatchKMeans(n_clusters=3, random_state=42, batch_size=batch_size, n_init=3)
+        segments = kmeans.fit_predict(X_scaled)
+        del X_scaled
+        X[:, 5] = segments
+
+    segment_labels = label_segments(segments, avg_spend)
+    print("Segments identified:", list(segment_labels.values()))
+
+    with report.stage("Training Random Forest"):
+        rf_model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=n_jobs, max_samples=max_samples)
+        rf_model.fit(X, y)
+
+    return {
+        'kmeans': kmeans,
+        'scaler': scaler,
+        'rf_model': rf_model,
+        'le_loyalty': le_loyalty,
+        'le_purpose': le_purpose,
+        'segment_labels': segment_labels
+    }
+
+
+def save_models(model_data, report, output='models.pkl'):
+    with report.stage("Saving models"):
+        # Written then renamed: a running API watching models.pkl never reads a partial file
+        tmp_output = f'{output}.{os.getpid()}.tmp'
+        joblib.dump(model_data, tmp_output)
+        os.replace(tmp_output, output)
+    # The API's model store compiles its serving arrays from this file
+    print(f"Done! Models saved to {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--data", default='traveler_data.csv')
+    parser.add_argument("--output", default='models.pkl')
+    parser.add_argument("--scalable", action="store_true", help="Chunked loading, MiniBatchKMeans, parallel forest")
+    parser.add_argument("--chunk-size", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=4096, help="MiniBatchKMeans batch size")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="Forest training processes (-1: all cores)")
+    parser.add_argument("--max-samples", type=float, default=None,
+                        help="Fraction of rows bootstrapped per tree (default: all)")
+    args = parser.parse_args()
+
+    report = StageReport()
+    if args.scalable:
+        model_data = train_scalable(args.data, report, args.chunk_size, args.batch_size, args.n_jobs, args.max_samples)
+    else:
+        model_data = train_in_memory(args.data, report)
+    save_models(model_data, report, args.output)
+    report.print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,176 @@
 import joblib
 import pandas as pd
 import numpy as np
+from inference_engine import InferenceEngine
 
-def load_models():
+class FeatureEncoder:
+    """
+    Lookup-table replacement for the fitted LabelEncoders.
+    Built once at load time so scoring never calls sklearn's transform.
+    Unknown labels fall back to code 0, matching the original behaviour.
+    """
+
+    def __init__(self, loyalty_classes, purpose_classes):
+        self.loyalty_classes = np.asarray(loyalty_classes).astype(str)
+        self.purpose_classes = np.asarray(purpose_classes).astype(str)
+        self.loyalty_codes = {label: code for code, label in enumerate(self.loyalty_classes)}
+        self.purpose_codes = {label: code for code, label in enumerate(self.purpose_classes)}
+
+    def encode_profile(self, profile):
+        """Encode one profile into a (1, 5) segmentation feature row."""
+        return np.array([[
+            profile['age'],
+            profile['avg_spend'],
+            profile['last_stay_days_ago'],
+            self.loyalty_codes.get(profile['loyalty_tier'], 0),
+            self.purpose_codes.get(profile['travel_purpose'], 0)
+        ]], dtype=np.float64)
+
+    def encode_profiles(self, profiles):
+        """Encode a list of profiles into an (N, 5) segmentation feature matrix."""
+        features = np.empty((len(profiles), 5), dtype=np.float64)
+        features[:, 0] = [p['age'] for p in profiles]
+        features[:, 1] = [p['avg_spend'] for p in profiles]
+        features[:, 2] = [p['last_stay_days_ago'] for p in profiles]
+        features[:, 3] = self.encode_loyalty([p['loyalty_tier'] for p in profiles])
+        features[:, 4] = self.encode_purpose([p['travel_purpose'] for p in profiles])
+        return features
+
+    def encode_frame(self, frame):
+        """Encode a traveler DataFrame (traveler_data.csv columns) into an (N, 5) feature matrix."""
+        features = np.empty((len(frame), 5), dtype=np.float64)
+        features[:, 0] = frame['age']
+        features[:, 1] = frame['avg_spend']
+        features[:, 2] = frame['last_stay_days_ago']
+        features[:, 3] = self.encode_loyalty(frame['loyalty_tier'])
+        features[:, 4] = self.encode_purpose(frame['travel_purpose'])
+        return features
+
+    def encode_loyalty(self, labels):
+        """Vectorized encode for an array of loyalty tiers."""
+        return _lookup_codes(self.loyalty_classes, labels)
+
+    def encode_purpose(self, labels):
+        """Vectorized encode for an array of travel purposes."""
+        return _lookup_codes(self.purpose_classes, labels)
+
+def _lookup_codes(classes, labels):
+    # LabelEncoder.classes_ is sorted, so a binary search gives the code
+    labels = np.asarray(labels).astype(str)
+    positions = np.searchsorted(classes, labels)
+    positions[positions == len(classes)] = 0
+    return np.where(classes[positions] == labels, positions, 0)
+
+def load_models(path='models.pkl'):
     """Load the trained models and encoders."""
     try:
-        model_data = joblib.load('models.pkl')
-        return model_data
+        model_data = joblib.load(path)
     except FileNotFoundError:
         return None
+    model_data['encoder'] = FeatureEncoder(model_data['le_loyalty'].classes_, model_data['le_purpose'].classes_)
+    model_data['engine'] = InferenceEngine.from_model_data(model_data)
+    return model_data
+
+def get_engine(model_data):
+    """Return the compiled NumPy inference engine, building it on first use."""
+    if 'engine' not in model_data:
+        model_data['engine'] = InferenceEngine.from_model_data(model_data)
+    return model_data['engine']
+
+def get_encoder(model_data):
+    """Return the lookup-table encoder, building it for model_data not from load_models()."""
+    if 'encoder' not in model_data:
+        model_data['encoder'] = FeatureEncoder(model_data['le_loyalty'].classes_, model_data['le_purpose'].classes_)
+    return model_data['encoder']
 
-def predict_traveler_segment(model_data, profile):
+def encode_profile(model_data, profile):
+    """
+    Encode a profile once so it can be shared between
+    predict_traveler_segment and predict_booking_prob.
+    """
+    return get_encoder(model_data).encode_profile(profile)
+
+def encode_profiles(model_data, profiles):
+    """Batch version of encode_profile. Returns an (N, 5) feature matrix."""
+    return get_encoder(model_data).encode_profiles(profiles)
+
+def encode_frame(model_data, frame):
+    """encode_profiles for a DataFrame with traveler_data.csv columns."""
+    return get_encoder(model_data).encode_frame(frame)
+
+def estimate_ltv(avg_spend, segment_label):
+    """Simple LTV: a year of average spend, 1.5x for Luxury segments."""
+    return avg_spend * 12 * (1.5 if 'Luxury' in segment_label else 1.0)
+
+def estimate_ltvs(avg_spend, segment_labels):
+    """Vectorized estimate_ltv for arrays of spend and segment labels."""
+    luxury = np.fromiter(('Luxury' in label for label in segment_labels), dtype=bool, count=len(segment_labels))
+    return np.asarray(avg_spend, dtype=np.float64) * 12 * np.where(luxury, 1.5, 1.0)
+
+def predict_traveler_segment(model_data, profile, features=None):
     """
     Predict the segment for a given traveler profile.
     profile: dict with keys ['age', 'avg_spend', 'last_stay_days_ago', 'loyalty_tier', 'travel_purpose']
+    features: optional pre-encoded row from encode_profile
     """
-    # 1. Prepare input
-    # Needs to match training columns: ['age', 'avg_spend', 'last_stay_days_ago', 'loyalty_code', 'purpose_code']
+    # Columns match training: ['age', 'avg_spend', 'last_stay_days_ago', 'loyalty_code', 'purpose_code']
+    if features is None:
+        features = encode_profile(model_data, profile)
     
-    # Handle unknown labels gracefully (fallback to 0)
-    try:
-        loyalty_code = model_data['le_loyalty'].transform([profile['loyalty_tier']])[0]
-    except:
-        loyalty_code = 0
-        
-    try:
-        purpose_code = model_data['le_purpose'].transform([profile['travel_purpose']])[0]
-    except:
-        purpose_code = 0
-        
-    features = np.array([[
-        profile['age'], 
-        profile['avg_spend'], 
-        profile['last_stay_days_ago'],
-        loyalty_code, 
-        purpose_code
-    ]])
-    
-    # Scale numerical features? 
-    # Wait, in training we scaled X_seg which had these 5 columns.
-    # We need to use the SAME scaler.
-    features_scaled = model_data['scaler'].transform(features)
-    
-    segment_id = model_data['kmeans'].predict(features_scaled)[0]
+    # The engine applies the SAME scaler the segmentation model was trained with
+    segment_id = get_engine(model_data).predict_segment(features)[0]
     segment_label = model_data['segment_labels'][segment_id]
     
     return segment_label, segment_id
 
-def predict_booking_prob(model_data, profile, segment_id):
+def predict_booking_prob(model_data, profile, segment_id, features=None):
     """Predict probability of booking."""
     # Training X_pred columns: ['age', 'avg_spend', 'last_stay_days_ago', 'loyalty_code', 'purpose_code', 'segment']
-    
-    try:
-        loyalty_code = model_data['le_loyalty'].transform([profile['loyalty_tier']])[0]
-    except:
-        loyalty_code = 0
-    try:
-        purpose_code = model_data['le_purpose'].transform([profile['travel_purpose']])[0]
-    except:
-        purpose_code = 0
+    if features is None:
+        features = encode_profile(model_data, profile)
         
-    features = np.array([[
-        profile['age'], 
-        profile['avg_spend'], 
-        profile['last_stay_days_ago'],
-        loyalty_code, 
-        purpose_code,
-        segment_id
-    ]])
+    features = np.append(features, [[segment_id]], axis=1)
     
-    prob = model_data['rf_model'].predict_proba(features)[0][1] # Probability of class 1 (Booking)
+    prob = get_engine(model_data).predict_proba(features)[0][1] # Probability of class 1 (Booking)
     return prob
 
+# Rows scored per matrix operation in the batch functions; bounds peak memory
+# when rescoring the whole loyalty base.
+BATCH_CHUNK_SIZE = 10000
+
+def _iter_chunks(items, chunk_size):
+    for start in range(0, len(items), chunk_size):
+        yield start, items[start:start + chunk_size]
+
+def predict_traveler_segments_batch(model_data, profiles, chunk_size=BATCH_CHUNK_SIZE, features=None):
+    """
+    Batch version of predict_traveler_segment.
+    Returns (segment_labels, segment_ids) with one entry per profile.
+    """
+    segment_ids = np.empty(len(profiles), dtype=np.int64)
+    for start, chunk in _iter_chunks(profiles, chunk_size):
+        if features is None:
+            chunk_features = encode_profiles(model_data, chunk)
+        else:
+            chunk_features = features[start:start + len(chunk)]
+        segment_ids[start:start + len(chunk)] = get_engine(model_data).predict_segment(chunk_features)
+
+    segment_labels = [model_data['segment_labels'][segment_id] for segment_id in segment_ids]
+    return segment_labels, segment_ids
+
+def predict_booking_probs_batch(model_data, profiles, segment_ids, chunk_size=BATCH_CHUNK_SIZE, features=None):
+    """Batch version of predict_booking_prob. Returns an array of probabilities."""
+    probs = np.empty(len(profiles), dtype=np.float64)
+    for start, chunk in _iter_chunks(profiles, chunk_size):
+        chunk_features = np.empty((len(chunk), 6), dtype=np.float64)
+        if features is None:
+            chunk_features[:, :5] = encode_profiles(model_data, chunk)
+        else:
+            chunk_features[:, :5] = features[start:start + len(chunk)]
+        chunk_features[:, 5] = segment_ids[start:start + len(chunk)]
+        probs[start:start + len(chunk)] = get_engine(model_data).predict_proba(chunk_features)[:, 1]
+    return probs
+
 def generate_personalized_copy(segment, purpose):
     """
     Simulate GenAI creating personalized marketing copy.